@@ -1,49 +1,18 @@
 from datetime import datetime, timedelta
-import boto3
-import json
-import sys
 import os
 import subprocess
-import paramiko
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from aws_utils.session import LazyProxy, get_client
+from aws_utils.credentials import load_config
+# Paginated, cached AMI catalog shared with the main program
+from aws_utils.menu import list_and_select_ami, list_images
 
-# Load AWS credentials from a file
-def load_credentials():
-    try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        credentials_path = os.path.join(script_dir, "credentials.json")
-        with open(credentials_path, 'r') as file:
-            credentials = json.load(file)
-        return (
-            credentials['aws_access_key_id'], 
-            credentials['aws_secret_access_key'], 
-            credentials.get('region', 'ap-northeast-2')
-        )
-    except FileNotFoundError:
-        print(f"Error: Credentials file not found.")
-        sys.exit(1)
-    except KeyError as e:
-        print(f"Error: Missing key {str(e)} in credentials file.")
-        sys.exit(1)
-    except json.JSONDecodeError:
-        print("Error: Invalid JSON format in credentials file.")
-        sys.exit(1)
-
-# AWS Session Initialization
+# AWS Session Initialization (credentials come from aws_utils.credentials; clients
+# are built on first use by the shared factory in aws_utils.session)
 def init():
-    aws_access_key_id, aws_secret_access_key, region = load_credentials()
-    try:
-        session = boto3.Session(
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=region
-        )
-        ec2 = session.client('ec2')
-        cloudwatch = session.client('cloudwatch')  # Initialize CloudWatch client
-        return ec2, cloudwatch
-    except (NoCredentialsError, PartialCredentialsError) as e:
-        print(f"Error: {str(e)}")
-        sys.exit(1)
+    load_config()
+    ec2 = LazyProxy(lambda: get_client('ec2'))
+    cloudwatch = LazyProxy(lambda: get_client('cloudwatch'))  # Initialize CloudWatch client
+    return ec2, cloudwatch
 
 # List EC2 Instances with detailed information
 def list_instances_with_choice(ec2):
@@ -99,35 +68,6 @@ def select_instance(instances):
         print("Invalid input. Please enter a number.")
         return None
 
-# List available AMIs and let user select one
-def list_and_select_ami(ec2):
-    try:
-        print("Fetching available AMIs...")
-        response = ec2.describe_images(Owners=['self'])
-        amis = [
-            {'ImageId': image['ImageId'], 'Name': image.get('Name', 'N/A')}
-            for image in response['Images']
-        ]
-        if not amis:
-            print("No AMIs found.")
-            return None
-
-        for idx, ami in enumerate(amis, 1):
-            print(f"{idx}. [ImageId] {ami['ImageId']}, [Name] {ami['Name']}")
-        
-        while True:
-            try:
-                choice = int(input("Select an AMI by number: "))
-                if 1 <= choice <= len(amis):
-                    return amis[choice - 1]['ImageId']
-                else:
-                    print("Invalid choice. Please select a valid number.")
-            except ValueError:
-                print("Invalid input. Please enter a number.")
-    except Exception as e:
-        print(f"Error listing AMIs: {str(e)}")
-        return None
-
 # Create a new EC2 instance with a specified security group
 def create_instance(ec2):
     ami_id = list_and_select_ami(ec2)
@@ -237,19 +177,6 @@ def reboot_instance(ec2):
             except Exception as e:
                 print(f"Error rebooting instance {instance_id}: {str(e)}")
 
-def list_images(ec2):
-    print("Listing all images...")
-    try:
-        response = ec2.describe_images(Owners=['self'])
-        if not response['Images']:
-            print("No images found.")
-            return
-
-        for image in response['Images']:
-            print(f"[ImageID] {image['ImageId']}, [Name] {image.get('Name', 'N/A')}, [Owner] {image['OwnerId']}")
-    except Exception as e:
-        print(f"Error listing images: {str(e)}")
-
 def delete_instance(ec2):
     instances = list_instances_with_choice(ec2)
     if instances:
@@ -307,6 +234,7 @@ def ssh_to_instance(ec2):
 
 # Execute condor_status on selected instances
 def execute_condor_status_on_instances(ec2):
+    import paramiko
     instances = list_instances_with_choice(ec2)
     if not instances:
         print("No instances available.")
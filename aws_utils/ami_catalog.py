@@ -0,0 +1,103 @@
+import time
+from bisect import bisect_left
+
+DEFAULT_TTL = 3600  # seconds an on-disk catalog is trusted before describe_images runs again
+
+_catalogs = {}
+
+class AmiCatalog:
+    # Images sorted newest first, with a sorted name index for prefix lookups
+    # and a tag index, so searching hundreds of AMIs needs no API call.
+
+    def __init__(self, images, fetched_at):
+        self.images = sorted(images, key=lambda image: image['CreationDate'], reverse=True)
+        self.fetched_at = fetched_at
+        self._names = [image['Name'].lower() for image in self.images]
+        self._name_index = sorted((name, idx) for idx, name in enumerate(self._names))
+        self._tag_index = {}
+        for idx, image in enumerate(self.images):
+            for key, value in image['Tags'].items():
+                self._tag_index.setdefault((key, value), []).append(idx)
+
+    def __len__(self):
+        return len(self.images)
+
+    def prefix(self, text):
+        text = text.lower()
+        start = bisect_left(self._name_index, (text,))
+        matches = []
+        for name, idx in self._name_index[start:]:
+            if not name.startswith(text):
+                break
+            matches.append(idx)
+        return [self.images[idx] for idx in sorted(matches)]
+
+    def search(self, text):
+        # Prefix matches first, then substring matches; newest first in each group
+        if not text:
+            return list(self.images)
+        prefixed = self.prefix(text)
+        seen = {image['ImageId'] for image in prefixed}
+        text = text.lower()
+        return prefixed + [
+            image for name, image in zip(self._names, self.images)
+            if text in name and image['ImageId'] not in seen
+        ]
+
+    def by_tag(self, key, value):
+        return [self.images[idx] for idx in self._tag_index.get((key, value), [])]
+
+    def newest(self, text=None):
+        matches = self.search(text)
+        return matches[0] if matches else None
+
+def _image_record(image):
+    return {
+        'ImageId': image['ImageId'],
+        'Name': image.get('Name', 'N/A'),
+        'CreationDate': image.get('CreationDate', ''),
+        'OwnerId': image.get('OwnerId', 'N/A'),
+        'State': image.get('State', 'N/A'),
+        'Tags': {tag['Key']: tag['Value'] for tag in image.get('Tags', [])}
+    }
+
+def _fetch_images(ec2, owners):
+    paginator = ec2.get_paginator('describe_images')
+    return [
+        _image_record(image)
+        for page in paginator.paginate(Owners=list(owners))
+        for image in page['Images']
+    ]
+
+def load_catalog(ec2, owners=('self',), ttl=DEFAULT_TTL, refresh=False, snapshot=None):
+    # Memory first, then the inventory snapshot (aws_utils.snapshot, the
+    # shared one unless given, which keeps each account's catalog apart),
+    # then a paginated describe_images. The memory cache lives as long as the
+    # process and its credentials, so region and owners identify it.
+    key = (ec2.meta.region_name, tuple(owners))
+    now = time.time()
+
+    catalog = _catalogs.get(key)
+    if not refresh and catalog and now - catalog.fetched_at <= ttl:
+        return catalog
+
+    if snapshot is None:
+        from aws_utils.snapshot import get_snapshot
+        snapshot = get_snapshot()
+    if not refresh:
+        try:
+            images, fetched_at = snapshot.load_images(key[0], owners)
+        except Exception:
+            images = None  # unreadable snapshot; fall through to a fresh fetch
+        if images is not None and now - fetched_at <= ttl:
+            catalog = AmiCatalog(images, fetched_at)
+            _catalogs[key] = catalog
+            return catalog
+
+    catalog = AmiCatalog(_fetch_images(ec2, owners), now)
+    _catalogs[key] = catalog
+    try:
+        snapshot.save_images(key[0], owners, catalog.images, now)
+    except Exception:
+        pass  # the catalog still works from memory
+    return catalog
@@ -0,0 +1,93 @@
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+DEFAULT_WINDOW = 3  # datapoints, i.e. 15 minutes at the 5-minute period
+DEFAULT_Z_THRESHOLD = 3.0
+
+def to_matrix(history):
+    # Aligns {instance_id: [(epoch, value), ...]} onto the union of all
+    # timestamps. Returns (instance_ids, timestamps, matrix) where the matrix
+    # is instances x timestamps with NaN where an instance has no datapoint.
+    instance_ids = list(history)
+    columns = [np.asarray(history[instance_id], dtype=float).reshape(-1, 2) for instance_id in instance_ids]
+    timestamps = np.unique(np.concatenate([column[:, 0] for column in columns])) if columns else np.empty(0)
+    matrix = np.full((len(instance_ids), len(timestamps)), np.nan)
+    for row, column in enumerate(columns):
+        matrix[row, np.searchsorted(timestamps, column[:, 0])] = column[:, 1]
+    return instance_ids, timestamps, matrix
+
+def percentiles(matrix, q=PERCENTILES):
+    # instances x len(q); rows without data are NaN
+    result = np.full((matrix.shape[0], len(q)), np.nan)
+    has_data = ~np.all(np.isnan(matrix), axis=1)
+    if matrix.shape[1] and has_data.any():
+        result[has_data] = np.nanpercentile(matrix[has_data], q, axis=1).T
+    return result
+
+def rolling_mean(matrix, window=DEFAULT_WINDOW):
+    # NaN-aware moving average over the last axis; output has
+    # T - window + 1 columns, NaN where a window has no datapoints.
+    if matrix.shape[1] < window:
+        return np.full((matrix.shape[0], 0), np.nan)
+    valid = ~np.isnan(matrix)
+    sums = np.cumsum(np.where(valid, matrix, 0.0), axis=1)
+    counts = np.cumsum(valid, axis=1)
+    sums = np.concatenate([np.zeros((matrix.shape[0], 1)), sums], axis=1)
+    counts = np.concatenate([np.zeros((matrix.shape[0], 1)), counts], axis=1)
+    window_sums = sums[:, window:] - sums[:, :-window]
+    window_counts = counts[:, window:] - counts[:, :-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+def peak_windows(matrix, timestamps, window=DEFAULT_WINDOW):
+    # Start timestamp and mean of the busiest rolling window per instance
+    means = rolling_mean(matrix, window)
+    starts = np.full(matrix.shape[0], np.nan)
+    peaks = np.full(matrix.shape[0], np.nan)
+    has_window = ~np.all(np.isnan(means), axis=1) if means.shape[1] else np.zeros(matrix.shape[0], dtype=bool)
+    if has_window.any():
+        best = np.nanargmax(means[has_window], axis=1)
+        starts[has_window] = timestamps[best]
+        peaks[has_window] = means[has_window, best]
+    return starts, peaks
+
+def _fill_empty_rows(matrix):
+    # nan* reductions warn on all-NaN rows; give those rows zeros instead
+    empty = np.isnan(matrix).all(axis=1)
+    return empty, np.where(empty[:, None], 0.0, matrix)
+
+def zscore_anomalies(matrix, threshold=DEFAULT_Z_THRESHOLD):
+    # Boolean matrix flagging datapoints more than `threshold` standard
+    # deviations away from their instance's mean
+    _, filled = _fill_empty_rows(matrix)
+    mean = np.nanmean(filled, axis=1, keepdims=True)
+    std = np.nanstd(filled, axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.abs(matrix - mean) / std
+    return np.nan_to_num(z, nan=0.0, posinf=0.0) > threshold
+
+def summarize(history, window=DEFAULT_WINDOW, threshold=DEFAULT_Z_THRESHOLD):
+    # One vectorized pass over the whole fleet. Returns per-instance summary
+    # rows ranked by p95, hottest first.
+    instance_ids, timestamps, matrix = to_matrix(history)
+    pcts = percentiles(matrix)
+    empty, filled = _fill_empty_rows(matrix)
+    maxima = np.where(empty, np.nan, np.nanmax(filled, axis=1, initial=-np.inf))
+    starts, peaks = peak_windows(matrix, timestamps, window)
+    anomalies = zscore_anomalies(matrix, threshold)
+
+    order = np.argsort(np.nan_to_num(-pcts[:, 1], nan=np.inf), kind='stable')
+    return [
+        {
+            'InstanceId': instance_ids[row],
+            'P50': pcts[row, 0],
+            'P95': pcts[row, 1],
+            'P99': pcts[row, 2],
+            'Max': maxima[row],
+            'PeakStart': starts[row],
+            'PeakMean': peaks[row],
+            'Anomalies': timestamps[anomalies[row]].tolist(),
+            'Points': int(np.count_nonzero(~np.isnan(matrix[row])))
+        }
+        for row in order
+    ]
@@ -0,0 +1,273 @@
+import math
+import os
+from datetime import datetime, timezone
+from aws_utils import inventory, condor
+from aws_utils.errors import InvalidRequestError, NotFoundError, translated
+from aws_utils.records import (
+    NOT_AVAILABLE, InstanceMatch, LifecycleResult, LaunchResult, Zone, Region, Image, CpuSummary,
+    CommandResult, PoolStatus
+)
+from aws_utils.query import parse_query
+from aws_utils.ami_catalog import load_catalog
+from aws_utils.instance_index import DEFAULT_LIMIT
+from aws_utils.ec2_management import (
+    get_instances, get_instances_all_regions, describe_instances_by_id, describe_known_instances,
+    parse_selection, selection_query, launch_instances, run_batched_operation, get_zones, DEFAULT_INSTANCE_TYPE
+)
+from aws_utils.monitoring import fetch_cpu_history, CPU_WINDOWS
+from aws_utils.ssh_utils import run_command_on_instances, SSH_USERNAME, SSH_TIMEOUT
+
+# Core operations for scripts and services. Nothing here prompts or prints:
+# results are the records of aws_utils.records and failures are raised as
+# aws_utils.errors.ApiError subclasses. The interactive menu (aws_utils.menu)
+# and the CLI in main.py are front ends over these functions, and
+# aws_utils.async_api runs them from an asyncio event loop.
+#
+# Queries may be given as an expression string (see aws_utils.query) or as
+# a parsed InstanceQuery.
+
+LIFECYCLE_OPERATIONS = {
+    'start': 'start_instances',
+    'stop': 'stop_instances',
+    'reboot': 'reboot_instances',
+    'terminate': 'terminate_instances'
+}
+
+def _query(query):
+    if isinstance(query, str):
+        return parse_query(query) if query.strip() else None
+    return query
+
+def list_instances(ec2, query=None, refresh=False, on_page=None):
+    # on_page(instances) sees each page of the listing as it arrives
+    with translated():
+        return get_instances(ec2, refresh=refresh, on_page=on_page, query=_query(query))
+
+def list_instances_all_regions(ec2, query=None):
+    # Returns (instances, errors); errors maps region -> message for the
+    # regions that could not be listed
+    with translated():
+        return get_instances_all_regions(ec2, query=_query(query))
+
+def list_saved_instances(region, query=None, snapshot=None):
+    # From the inventory snapshot (aws_utils.snapshot) only, without AWS
+    if snapshot is None:
+        from aws_utils.snapshot import get_snapshot
+        snapshot = get_snapshot()
+    with translated():
+        if snapshot.fetched_at(region) is None:
+            raise NotFoundError(f"No saved inventory for {region}")
+        return snapshot.query_instances(region, _query(query))
+
+def get_instance(ec2, instance_id):
+    # Always described live
+    with translated():
+        found = describe_instances_by_id(ec2, [instance_id])
+    if not found:
+        raise NotFoundError(f"Instance {instance_id} not found")
+    return found[0]
+
+def find_instances(ec2, text, limit=DEFAULT_LIMIT):
+    # Name / ID / IP lookup over the inventory, best match first
+    with translated():
+        instances = get_instances(ec2)
+    index = inventory.instance_index(ec2, instances)
+    return [InstanceMatch(inst, kind, score) for inst, kind, score in index.search(text, limit)]
+
+def select_instance_ids(ec2, selection, instances=None):
+    # Row numbers and ranges ("1-3,5") of `instances`, or a query given as an
+    # expression or an InstanceQuery. Without `instances`, rows refer to
+    # list_instances(ec2) and a query is sent to EC2 as filters where
+    # possible. Expressions follow ec2_management.selection_query: every
+    # instance is selected by "all" only and a blank selection is an error.
+    if instances is None:
+        # Never select from a served snapshot: its states may be days old
+        inventory.wait_for_reconcile(ec2)
+    if isinstance(selection, str):
+        with translated():
+            query = selection_query(selection)
+            if query is None:
+                return parse_selection(selection, get_instances(ec2) if instances is None else instances)
+    elif selection is None:
+        raise InvalidRequestError("No selection given (use 'all' for every instance)")
+    else:
+        query = selection
+    with translated():
+        if instances is None:
+            return [inst.instance_id for inst in get_instances(ec2, query=query)]
+        return [inst.instance_id for inst in query.apply(instances)]
+
+def change_state(ec2, action, instance_ids):
+    # action is start, stop, reboot or terminate. Failures of single
+    # instances are reported in their LifecycleResult, not raised.
+    operation = LIFECYCLE_OPERATIONS.get(action)
+    if operation is None:
+        raise InvalidRequestError(f"Unknown action: {action}")
+    if not instance_ids:
+        raise InvalidRequestError("No instances given")
+    with translated():
+        results = run_batched_operation(ec2, operation, instance_ids)
+    return [LifecycleResult(instance_id, action, error) for instance_id, error in results.items()]
+
+def start_instances(ec2, instance_ids):
+    return change_state(ec2, 'start', instance_ids)
+
+def stop_instances(ec2, instance_ids):
+    return change_state(ec2, 'stop', instance_ids)
+
+def reboot_instances(ec2, instance_ids):
+    return change_state(ec2, 'reboot', instance_ids)
+
+def terminate_instances(ec2, instance_ids):
+    return change_state(ec2, 'terminate', instance_ids)
+
+def launch(ec2, count, name, image_id=None, instance_type=None, subnet_ids=None, tags=None, launch_template=None):
+    # See ec2_management.launch_instances. Without a launch template the
+    # type defaults to DEFAULT_INSTANCE_TYPE; with one, to the template's.
+    if count < 1:
+        raise InvalidRequestError("Count must be at least 1")
+    if not name:
+        raise InvalidRequestError("A name is required")
+    if not image_id and not launch_template:
+        raise InvalidRequestError("Either an image or a launch template is required")
+    if instance_type is None and not launch_template:
+        instance_type = DEFAULT_INSTANCE_TYPE
+    with translated():
+        instance_ids, errors = launch_instances(ec2, count, name, image_id=image_id, instance_type=instance_type,
+                                                subnet_ids=subnet_ids, tags=tags, launch_template=launch_template)
+    return LaunchResult(instance_ids, count, name, errors)
+
+def rename_instance(ec2, instance_id, name):
+    if not name:
+        raise InvalidRequestError("A name is required")
+    with translated():
+        ec2.create_tags(Resources=[instance_id], Tags=[{'Key': 'Name', 'Value': name}])
+    inventory.invalidate(ec2, [instance_id])
+
+def list_zones(ec2):
+    with translated():
+        return [Zone.from_zone(zone) for zone in get_zones(ec2)]
+
+def list_saved_zones(region, snapshot=None):
+    if snapshot is None:
+        from aws_utils.snapshot import get_snapshot
+        snapshot = get_snapshot()
+    with translated():
+        zones = snapshot.load_zones(region)
+    if zones is None:
+        raise NotFoundError(f"No saved zones for {region}")
+    return [Zone.from_zone(zone) for zone in zones]
+
+def list_regions(ec2):
+    with translated():
+        regions = ec2.describe_regions()['Regions']
+    return [Region(region['RegionName'], region['Endpoint']) for region in regions]
+
+def list_images(ec2, search=None, refresh=False):
+    # Newest first; a search matches name prefixes first, then substrings
+    with translated():
+        catalog = load_catalog(ec2, refresh=refresh)
+    return [Image.from_catalog(image) for image in catalog.search(search)]
+
+def _number(value):
+    return None if math.isnan(value) else float(value)
+
+def cpu_summaries(ec2, cloudwatch, instance_ids, window='1h', end_time=None):
+    # One CpuSummary per instance over the last `window` (a CPU_WINDOWS
+    # key), hottest p95 first. History comes from the local metric store,
+    # topped up from CloudWatch; names are described for these IDs only.
+    if window not in CPU_WINDOWS:
+        raise InvalidRequestError(f"Unknown window: {window} (choose from {', '.join(CPU_WINDOWS)})")
+    if not instance_ids:
+        raise InvalidRequestError("No instances given")
+    end_time = end_time or datetime.now(timezone.utc)
+    with translated():
+        history = fetch_cpu_history(cloudwatch, list(instance_ids), end_time - CPU_WINDOWS[window], end_time)
+        names = {inst.instance_id: inst.name for inst in describe_known_instances(ec2, instance_ids)}
+
+    from aws_utils import analytics  # NumPy is only loaded when needed
+    return [
+        CpuSummary(
+            row['InstanceId'], names.get(row['InstanceId'], NOT_AVAILABLE),
+            _number(row['P50']), _number(row['P95']), _number(row['P99']), _number(row['Max']),
+            _number(row['PeakStart']), _number(row['PeakMean']),
+            row['Anomalies'], row['Points'], history[row['InstanceId']]
+        )
+        for row in analytics.summarize(history)
+    ]
+
+def run_command(ec2, instance_ids, command, key_path, username=SSH_USERNAME, timeout=SSH_TIMEOUT, on_line=None):
+    # Runs `command` over SSH on every instance concurrently and returns one
+    # CommandResult per instance, in the given order. Instances without a
+    # public IP are not contacted; their result carries the reason. Only the
+    # given instances are described, not the whole inventory.
+    # on_line(instance_id, host, stream, line) sees output as it arrives.
+    if not command:
+        raise InvalidRequestError("No command given")
+    if not os.path.exists(key_path):
+        raise InvalidRequestError(f"Key file {key_path} does not exist")
+    with translated():
+        instances = {inst.instance_id: inst for inst in describe_known_instances(ec2, instance_ids)}
+
+    skipped = {}
+    targets = {}
+    for instance_id in instance_ids:
+        inst = instances.get(instance_id)
+        if inst is None:
+            skipped[instance_id] = CommandResult(instance_id, None, error="Instance not found")
+        elif inst.public_ip == NOT_AVAILABLE:
+            skipped[instance_id] = CommandResult(instance_id, None, error="No public IP address")
+        else:
+            targets[instance_id] = inst.public_ip
+    results = {}
+    if targets:
+        results = {
+            result['InstanceId']: CommandResult.from_result(result)
+            for result in run_command_on_instances(targets, command, key_path, username=username,
+                                                   timeout=timeout, on_line=on_line)
+        }
+    return [results.get(instance_id) or skipped[instance_id] for instance_id in instance_ids]
+
+def condor_status(ec2, instance_ids, key_path, username=SSH_USERNAME, timeout=SSH_TIMEOUT, on_line=None):
+    # Runs condor_status on each given central manager. Returns (pools,
+    # results): a PoolStatus per instance where it succeeded, then one for
+    # all of them together (instance_id None) when there are several, and
+    # the CommandResults. Slot lines are parsed as they arrive; on_line only
+    # sees stderr.
+    slots = {instance_id: [] for instance_id in instance_ids}
+
+    def collect(instance_id, host, stream, line):
+        if stream == 'stdout':
+            slot = condor.parse_slot_line(line)
+            if slot:
+                slots[instance_id].append(slot)
+        elif on_line:
+            on_line(instance_id, host, stream, line)
+
+    results = run_command(ec2, instance_ids, condor.CONDOR_STATUS_COMMAND, key_path, username, timeout, collect)
+    pools = []
+    aggregates = []
+    for result in results:
+        if not result.ok:
+            continue
+        pool = condor.aggregate(slots[result.instance_id])
+        aggregates.append(pool)
+        change = condor.deltas(condor.record_snapshot(result.instance_id, pool), pool)
+        pools.append(PoolStatus(result.instance_id, result.host, pool, change))
+    if len(aggregates) > 1:
+        combined = condor.combine(aggregates)
+        # Keyed by the managers that answered, so a failing one does not
+        # compare this poll against a different set of pools
+        key = tuple(sorted(pool.instance_id for pool in pools))
+        pools.append(PoolStatus(None, None, combined, condor.deltas(condor.record_snapshot(key, combined), combined)))
+    return pools, results
+
+def ssh_command(ec2, instance_id, key_path, username=SSH_USERNAME, instance=None):
+    # The ssh command line for an interactive session on the instance.
+    # `instance` is its record when the caller has just described it.
+    inst = instance or get_instance(ec2, instance_id)
+    if inst.public_ip == NOT_AVAILABLE:
+        raise InvalidRequestError(f"Instance {instance_id} does not have a public IP address")
+    if not os.path.exists(key_path):
+        raise InvalidRequestError(f"Key file {key_path} does not exist")
+    return f"ssh -i {key_path} {username}@{inst.public_ip}"
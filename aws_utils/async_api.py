@@ -0,0 +1,118 @@
+import asyncio
+import functools
+import threading
+from aws_utils import api
+from aws_utils.session import DEFAULT_SETTINGS
+
+# aws_utils.api for asyncio services: every coroutine runs the blocking
+# boto3 / SSH work of the matching api function on a shared thread pool,
+# so many operations can be awaited concurrently from one event loop:
+#
+#   results = await asyncio.gather(
+#       async_api.stop_instances(ec2, ids),
+#       async_api.cpu_summaries(ec2, cloudwatch, other_ids, '1d'))
+#
+# Results and exceptions are those of aws_utils.api. boto3 clients are
+# thread-safe, so one client can serve all of them. The pool defaults to the
+# clients' connection pool size; more threads would only queue for a
+# connection.
+
+DEFAULT_WORKERS = DEFAULT_SETTINGS['max_pool_connections']
+
+_workers = DEFAULT_WORKERS
+_executor = None
+_executor_lock = threading.Lock()
+
+def set_max_workers(workers):
+    # Applies when the pool is created: before the first call or after shutdown()
+    global _workers
+    _workers = workers
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(max_workers=_workers, thread_name_prefix="aws-api")
+        return _executor
+
+def shutdown(wait=True):
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+async def _call(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+async def list_instances(ec2, query=None, refresh=False, on_page=None):
+    # on_page runs on a worker thread, like run_command's on_line
+    return await _call(api.list_instances, ec2, query, refresh, on_page)
+
+async def list_instances_all_regions(ec2, query=None):
+    return await _call(api.list_instances_all_regions, ec2, query)
+
+async def list_saved_instances(region, query=None, snapshot=None):
+    return await _call(api.list_saved_instances, region, query, snapshot)
+
+async def get_instance(ec2, instance_id):
+    return await _call(api.get_instance, ec2, instance_id)
+
+async def find_instances(ec2, text, limit=api.DEFAULT_LIMIT):
+    return await _call(api.find_instances, ec2, text, limit)
+
+async def select_instance_ids(ec2, selection, instances=None):
+    return await _call(api.select_instance_ids, ec2, selection, instances)
+
+async def change_state(ec2, action, instance_ids):
+    return await _call(api.change_state, ec2, action, instance_ids)
+
+async def start_instances(ec2, instance_ids):
+    return await change_state(ec2, 'start', instance_ids)
+
+async def stop_instances(ec2, instance_ids):
+    return await change_state(ec2, 'stop', instance_ids)
+
+async def reboot_instances(ec2, instance_ids):
+    return await change_state(ec2, 'reboot', instance_ids)
+
+async def terminate_instances(ec2, instance_ids):
+    return await change_state(ec2, 'terminate', instance_ids)
+
+async def launch(ec2, count, name, image_id=None, instance_type=None, subnet_ids=None, tags=None,
+                 launch_template=None):
+    return await _call(api.launch, ec2, count, name, image_id=image_id, instance_type=instance_type,
+                       subnet_ids=subnet_ids, tags=tags, launch_template=launch_template)
+
+async def rename_instance(ec2, instance_id, name):
+    return await _call(api.rename_instance, ec2, instance_id, name)
+
+async def list_zones(ec2):
+    return await _call(api.list_zones, ec2)
+
+async def list_saved_zones(region, snapshot=None):
+    return await _call(api.list_saved_zones, region, snapshot)
+
+async def list_regions(ec2):
+    return await _call(api.list_regions, ec2)
+
+async def list_images(ec2, search=None, refresh=False):
+    return await _call(api.list_images, ec2, search, refresh)
+
+async def cpu_summaries(ec2, cloudwatch, instance_ids, window='1h', end_time=None):
+    return await _call(api.cpu_summaries, ec2, cloudwatch, instance_ids, window, end_time)
+
+async def run_command(ec2, instance_ids, command, key_path, username=api.SSH_USERNAME, timeout=api.SSH_TIMEOUT,
+                      on_line=None):
+    # on_line is called from a worker thread; use loop.call_soon_threadsafe
+    # in it to hand lines to the event loop
+    return await _call(api.run_command, ec2, instance_ids, command, key_path, username, timeout, on_line)
+
+async def condor_status(ec2, instance_ids, key_path, username=api.SSH_USERNAME, timeout=api.SSH_TIMEOUT,
+                        on_line=None):
+    return await _call(api.condor_status, ec2, instance_ids, key_path, username, timeout, on_line)
+
+async def ssh_command(ec2, instance_id, key_path, username=api.SSH_USERNAME):
+    return await _call(api.ssh_command, ec2, instance_id, key_path, username)
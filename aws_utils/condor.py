@@ -0,0 +1,80 @@
+SLOT_ATTRIBUTES = ('Name', 'Machine', 'State', 'Activity', 'Cpus', 'Memory', 'SlotType')
+CONDOR_STATUS_COMMAND = "condor_status -af " + " ".join(SLOT_ATTRIBUTES)
+POOL_COUNTERS = ('Slots', 'Claimed', 'Unclaimed', 'Idle', 'Cpus', 'Memory')
+
+_snapshots = {}
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except ValueError:
+        return 0  # condor prints "undefined" for missing attributes
+
+def parse_slot_line(line):
+    # One line of `condor_status -af` output -> slot record, or None for
+    # anything that is not a slot line (blank lines, warnings)
+    fields = line.split()
+    if len(fields) != len(SLOT_ATTRIBUTES):
+        return None
+    name, machine, state, activity, cpus, memory, slot_type = fields
+    return {
+        'Name': name,
+        'Machine': machine,
+        'State': state,
+        'Activity': activity,
+        'Cpus': _to_int(cpus),
+        'Memory': _to_int(memory),
+        'SlotType': slot_type
+    }
+
+def aggregate(slots):
+    # Pool capacity totals plus the same counters per execute node
+    def counters():
+        return dict.fromkeys(POOL_COUNTERS, 0)
+
+    pool = counters()
+    nodes = {}
+    for slot in slots:
+        node = nodes.setdefault(slot['Machine'], counters())
+        for totals in (pool, node):
+            totals['Slots'] += 1
+            totals['Cpus'] += slot['Cpus']
+            totals['Memory'] += slot['Memory']
+            if slot['State'] == 'Claimed':
+                totals['Claimed'] += 1
+            elif slot['State'] == 'Unclaimed':
+                totals['Unclaimed'] += 1
+            if slot['Activity'] == 'Idle':
+                totals['Idle'] += 1
+    pool['Nodes'] = nodes
+    return pool
+
+def combine(pools):
+    # Merges several central managers' aggregates into one. A node reported
+    # by more than one manager is counted once, so the totals are summed from
+    # the merged nodes rather than from the pools.
+    nodes = {}
+    for pool in pools:
+        nodes.update(pool['Nodes'])
+    combined = dict.fromkeys(POOL_COUNTERS, 0)
+    for node in nodes.values():
+        for counter in POOL_COUNTERS:
+            combined[counter] += node[counter]
+    combined['Nodes'] = nodes
+    return combined
+
+def record_snapshot(key, pool):
+    # Stores the new snapshot and returns the previous one for `key`, if any
+    previous = _snapshots.get(key)
+    _snapshots[key] = pool
+    return previous
+
+def deltas(previous, current):
+    # Counter changes plus nodes that joined or left since the previous poll
+    if previous is None:
+        return None
+    return {
+        'Counters': {counter: current[counter] - previous[counter] for counter in POOL_COUNTERS},
+        'Added': sorted(set(current['Nodes']) - set(previous['Nodes'])),
+        'Removed': sorted(set(previous['Nodes']) - set(current['Nodes']))
+    }
@@ -2,23 +2,39 @@ import os
 import json
 import sys
 
-def load_credentials():
+CREDENTIALS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "credentials.json")
+DEFAULT_REGION = 'ap-northeast-2'
+
+_config = None
+
+def load_config():
+    # Reads credentials.json once per process. Besides the keys, the file may
+    # hold optional tuning settings (see aws_utils.session).
+    global _config
+    if _config is not None:
+        return _config
     try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        credentials_path = os.path.join(script_dir, "../credentials.json")
-        with open(credentials_path, 'r') as file:
-            credentials = json.load(file)
-        return (
-            credentials['aws_access_key_id'], 
-            credentials['aws_secret_access_key'], 
-            credentials.get('region', 'ap-northeast-2')
-        )
+        with open(CREDENTIALS_PATH, 'r') as file:
+            config = json.load(file)
+        if not config.get('aws_access_key_id') or not config.get('aws_secret_access_key'):
+            raise KeyError("AWS access key or secret key is missing in credentials.json.")
     except FileNotFoundError:
-        print(f"Error: Credentials file not found.")
+        print(f"Error: credentials.json file not found in {os.path.dirname(CREDENTIALS_PATH)}.")
         sys.exit(1)
     except KeyError as e:
-        print(f"Error: Missing key {str(e)} in credentials file.")
+        print(f"Error: Missing key {str(e)} in credentials.json.")
         sys.exit(1)
     except json.JSONDecodeError:
-        print("Error: Invalid JSON format in credentials file.")
+        print("Error: Invalid JSON format in credentials.json.")
         sys.exit(1)
+    config.setdefault('region', DEFAULT_REGION)
+    _config = config
+    return _config
+
+def load_credentials():
+    config = load_config()
+    return (
+        config['aws_access_key_id'],
+        config['aws_secret_access_key'],
+        config['region']
+    )
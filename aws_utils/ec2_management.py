@@ -1,209 +1,320 @@
-def list_instances_with_choice(ec2):
-    print("Listing instances...")
-    instances = []
-    try:
-        response = ec2.describe_instances()
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                name = "N/A"
-                if 'Tags' in instance:
-                    for tag in instance['Tags']:
-                        if tag['Key'] == 'Name':
-                            name = tag['Value']
-                            break
-                instance_details = {
-                    'InstanceId': instance['InstanceId'],
-                    'Name': name,
-                    'State': instance['State']['Name'],
-                    'Type': instance.get('InstanceType', 'N/A'),
-                    'PublicIP': instance.get('PublicIpAddress', 'N/A'),
-                    'PrivateIP': instance.get('PrivateIpAddress', 'N/A'),
-                    'Zone': instance['Placement']['AvailabilityZone']
-                }
-                instances.append(instance_details)
-        
-        if instances:
-            print(f"{'No.':<5}{'Instance ID':<20}{'Name':<20}{'State':<15}{'Type':<15}{'Public IP':<20}{'Private IP':<15}{'Zone'}")
-            print("-" * 115)
-            for idx, inst in enumerate(instances, 1):
-                print(f"{idx:<5}{inst['InstanceId']:<20}{inst['Name']:<20}{inst['State']:<15}{inst['Type']:<15}{inst['PublicIP']:<20}{inst['PrivateIP']:<15}{inst['Zone']}")
-            return instances
-        else:
-            print("No instances found.")
-            return None
-    except Exception as e:
-        print(f"Error listing instances: {str(e)}")
-        return None
+import re
+import threading
+import time
+from aws_utils import inventory
+from aws_utils.query import parse_query
+from aws_utils.instrumentation import get_stats, timed_iter
+from aws_utils.errors import error_code
+from aws_utils.records import InstanceRecord
 
-def select_instance(instances):
-    if not instances:
-        print("No instances to select.")
-        return None
-    try:
-        choice = int(input("Select an instance by number: "))
-        if 1 <= choice <= len(instances):
-            return instances[choice - 1]['InstanceId']
-        else:
-            print("Invalid selection.")
-            return None
-    except ValueError:
-        print("Invalid input. Please enter a number.")
-        return None
+DEFAULT_PAGE_SIZE = 100
+LIFECYCLE_BATCH_SIZE = 500
+REGION_WORKERS = 8
+FILTER_VALUES = 200  # values describe_instances accepts per filter
+# Lifecycle errors caused by a single instance of a batch (besides InvalidInstanceID.*)
+PER_INSTANCE_ERROR_CODES = frozenset(('IncorrectInstanceState', 'IncorrectState', 'UnsupportedOperation',
+                                      'OperationNotPermitted'))
+TAG_ATTEMPTS = 5  # create_tags right after run_instances may not see the instance yet
+TAG_RETRY_DELAY = 0.5  # seconds, grows linearly per attempt
+DEFAULT_INSTANCE_TYPE = 't2.micro'
+# 지정할 보안 그룹 ID
+DEFAULT_SECURITY_GROUP_ID = "sg-0d9d4b03a4fe1cd2b"
+# Row numbers and ranges; anything else is a query (which may start with a digit, e.g. "2a")
+ROW_SELECTION = re.compile(r"\d+(\s*-\s*\d+)?(\s*,\s*\d+(\s*-\s*\d+)?)*$")
 
-def list_and_select_ami(ec2):
-    try:
-        print("Fetching available AMIs...")
-        response = ec2.describe_images(Owners=['self'])
-        amis = [
-            {'ImageId': image['ImageId'], 'Name': image.get('Name', 'N/A')}
-            for image in response['Images']
+def iter_instance_pages(ec2, page_size=DEFAULT_PAGE_SIZE, filters=None):
+    # Follows NextToken and yields one list of InstanceRecords per API page,
+    # so callers can act on a page before the next one is requested.
+    paginator = ec2.get_paginator('describe_instances')
+    params = {'Filters': filters} if filters else {}
+    for page in paginator.paginate(PaginationConfig={'PageSize': page_size}, **params):
+        records = [
+            InstanceRecord.from_instance(instance)
+            for reservation in page['Reservations']
+            for instance in reservation['Instances']
         ]
-        if not amis:
-            print("No AMIs found.")
-            return None
+        yield records
 
-        for idx, ami in enumerate(amis, 1):
-            print(f"{idx}. [ImageId] {ami['ImageId']}, [Name] {ami['Name']}")
-        
-        while True:
-            try:
-                choice = int(input("Select an AMI by number: "))
-                if 1 <= choice <= len(amis):
-                    return amis[choice - 1]['ImageId']
-                else:
-                    print("Invalid choice. Please select a valid number.")
-            except ValueError:
-                print("Invalid input. Please enter a number.")
-    except Exception as e:
-        print(f"Error listing AMIs: {str(e)}")
+def describe_instances_by_id(ec2, instance_ids):
+    paginator = ec2.get_paginator('describe_instances')
+    return [
+        InstanceRecord.from_instance(instance)
+        for page in paginator.paginate(InstanceIds=list(instance_ids))
+        for reservation in page['Reservations']
+        for instance in reservation['Instances']
+    ]
+
+def describe_known_instances(ec2, instance_ids, page_size=DEFAULT_PAGE_SIZE):
+    # Like describe_instances_by_id, but IDs EC2 does not know are left out
+    # instead of failing the whole call, since they are matched by filter
+    instance_ids = list(dict.fromkeys(instance_ids))
+    return [
+        inst
+        for batch in _batches(instance_ids, FILTER_VALUES)
+        for page in iter_instance_pages(ec2, page_size, [{'Name': 'instance-id', 'Values': batch}])
+        for inst in page
+    ]
+
+def _refresh_cached_instances(ec2):
+    if inventory.cached_instances(ec2) is None:
         return None
+    instance_ids = inventory.pending_ids(ec2)
+    if instance_ids:
+        described_at = time.monotonic()
+        try:
+            refreshed = describe_instances_by_id(ec2, instance_ids)
+        except Exception:
+            # e.g. an ID that no longer exists; fall back to a full scan
+            return None
+        inventory.merge_instances(ec2, instance_ids, refreshed, described_at)
+    return inventory.cached_instances(ec2)
 
-def create_instance(ec2):
-    ami_id = list_and_select_ami(ec2)
-    if not ami_id:
-        print("No AMI selected. Instance creation canceled.")
+def _reconcile_inventory(ec2, page_size):
+    scan_started = time.monotonic()
+    try:
+        instances = [inst for page in iter_instance_pages(ec2, page_size) for inst in page]
+    except Exception:
+        # The next listing scans in the foreground instead
+        inventory.invalidate(ec2)
         return
+    # Instances started or stopped during the scan keep their invalidation
+    # and are described again right away
+    inventory.store_instances(ec2, instances, scan_started)
+    _refresh_cached_instances(ec2)
+    inventory.save_snapshot(ec2, instances)
 
-    instance_name = input("Enter a name for the instance: ").strip()
-    if not instance_name:
-        print("Invalid instance name. Operation canceled.")
-        return
+def preload_inventory(ec2, page_size=DEFAULT_PAGE_SIZE):
+    # Serves the inventory an earlier run saved (see inventory.attach_snapshot)
+    # and starts a full scan in the background that replaces it. Returns None
+    # when there is no snapshot to serve, without touching the network.
+    instances = inventory.load_snapshot(ec2)
+    if instances is not None:
+        thread = threading.Thread(target=_reconcile_inventory, args=(ec2, page_size),
+                                  name="inventory-reconcile", daemon=True)
+        inventory.track_reconcile(ec2, thread)
+        thread.start()
+    return instances
 
-    # 지정할 보안 그룹 ID
-    security_group_id = "sg-0d9d4b03a4fe1cd2b"
+def get_instances(ec2, page_size=DEFAULT_PAGE_SIZE, refresh=False, on_page=None, query=None):
+    # Serves the cached inventory when it is fresh, otherwise does a full
+    # paginated scan. on_page(instances) sees each page's matching instances
+    # as soon as it arrives (a cached inventory is one page), so callers can
+    # render before the scan finishes.
+    # A query (aws_utils.query) is evaluated locally against a fresh cache;
+    # otherwise its filters go to describe_instances and only the terms EC2
+    # cannot express are applied here. Filtered scans are not cached; full
+    # ones are also saved to the attached snapshot, if any.
+    # The 'list' phase covers the cache lookup and fetching pages, but not
+    # on_page (rendering) or reading a saved snapshot.
+    started = time.perf_counter()
+    instances = None if refresh else _refresh_cached_instances(ec2)
+    lookup = time.perf_counter() - started
+    if instances is None and not refresh:
+        instances = preload_inventory(ec2, page_size)
+    if instances is not None:
+        get_stats().record_phase('list', lookup)
+        if query:
+            instances = query.apply(instances)
+        if on_page and instances:
+            on_page(instances)
+        return instances
 
-    try:
-        print(f"Creating an instance with security group {security_group_id}...")
-        response = ec2.run_instances(
-            ImageId=ami_id,
-            InstanceType='t2.micro',
-            MinCount=1,
-            MaxCount=1,
-            SecurityGroupIds=[security_group_id],  # 보안 그룹 설정
-            TagSpecifications=[{
-                'ResourceType': 'instance',
-                'Tags': [{'Key': 'Name', 'Value': instance_name}]
-            }]
-        )
-        instance_id = response['Instances'][0]['InstanceId']
-        print(f"Successfully created instance {instance_id} with name '{instance_name}'.")
-    except Exception as e:
-        print(f"Error creating instance: {str(e)}")
-
-def start_instance(ec2):
-    instances = list_instances_with_choice(ec2)
-    if instances:
-        instance_id = select_instance(instances)
-        if instance_id:
-            print(f"Starting instance {instance_id}...")
-            try:
-                ec2.start_instances(InstanceIds=[instance_id])
-                print(f"Successfully started instance {instance_id}.")
-            except Exception as e:
-                print(f"Error starting instance {instance_id}: {str(e)}")
-
-def stop_instance(ec2):
-    instances = list_instances_with_choice(ec2)
-    if instances:
-        instance_id = select_instance(instances)
-        if instance_id:
-            print(f"Stopping instance {instance_id}...")
-            try:
-                ec2.stop_instances(InstanceIds=[instance_id])
-                print(f"Successfully stopped instance {instance_id}.")
-            except Exception as e:
-                print(f"Error stopping instance {instance_id}: {str(e)}")
-
-def reboot_instance(ec2):
-    instances = list_instances_with_choice(ec2)
-    if instances:
-        instance_id = select_instance(instances)
-        if instance_id:
-            print(f"Rebooting instance {instance_id}...")
+    instances = []
+    scan_started = time.monotonic()
+    pages = iter_instance_pages(ec2, page_size, query.filters if query else None)
+    for page in timed_iter('list', pages, lookup):
+        if query:
+            page = query.apply(page)
+        instances += page
+        if on_page and page:
+            on_page(page)
+    if not query:
+        # Instances changed while the scan ran keep their invalidation
+        inventory.store_instances(ec2, instances, scan_started)
+        inventory.save_snapshot(ec2, instances)
+    return instances
+
+def _list_region_instances(region, client, page_size, query=None):
+    instances = []
+    for page in iter_instance_pages(client, page_size, query.filters if query else None):
+        for inst in page:
+            if query and not query.matches(inst):
+                continue
+            inst.region = region
+            instances.append(inst)
+    return instances
+
+def get_instances_all_regions(ec2, max_workers=REGION_WORKERS, page_size=DEFAULT_PAGE_SIZE, query=None,
+                              client_factory=None):
+    # Returns (instances, errors) where errors maps region -> message.
+    # Per-region clients come from the shared factory unless one is given.
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    if client_factory is None:
+        from aws_utils.session import get_client as client_factory
+    regions = sorted(region['RegionName'] for region in ec2.describe_regions()['Regions'])
+    clients = {region: client_factory('ec2', region) for region in regions}
+    by_region = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_list_region_instances, region, client, page_size, query): region
+            for region, client in clients.items()
+        }
+        for future in as_completed(futures):
+            region = futures[future]
             try:
-                ec2.reboot_instances(InstanceIds=[instance_id])
-                print(f"Successfully rebooted instance {instance_id}.")
+                by_region[region] = future.result()
             except Exception as e:
-                print(f"Error rebooting instance {instance_id}: {str(e)}")
-
-def delete_instance(ec2):
-    instances = list_instances_with_choice(ec2)
-    if instances:
-        instance_id = select_instance(instances)
-        if instance_id:
-            print(f"Terminating instance {instance_id}...")
+                errors[region] = str(e)
+    instances = [inst for region in regions for inst in by_region.get(region, [])]
+    return instances, errors
+
+def selection_query(selection):
+    # The query a selection stands for, or None when it is row numbers.
+    # Selecting everything takes an explicit "all" (a query without terms);
+    # an empty selection is rejected rather than read as one.
+    selection = selection.strip()
+    if not selection:
+        raise ValueError("Empty selection; enter row numbers, a query or 'all'")
+    if ROW_SELECTION.match(selection):
+        return None
+    query = parse_query(selection)
+    if not query.terms and 'all' not in selection.split():
+        raise ValueError(f"Selection matches nothing specific: {selection} (use 'all' for every instance)")
+    return query
+
+def parse_selection(selection, instances):
+    # Accepts row numbers and ranges such as "1-5,8,10", or a query
+    # expression (see aws_utils.query) such as "all", "state:running" or
+    # "tag:Role=worker type=t3.*" matched against the listed instances.
+    query = selection_query(selection)
+    if query is not None:
+        return [inst.instance_id for inst in query.apply(instances)]
+
+    instance_ids = []
+    seen = set()
+    for part in selection.split(','):
+        start, is_range, end = part.strip().partition('-')
+        first = int(start)
+        last = int(end) if is_range else first
+        if not 1 <= first <= last <= len(instances):
+            raise ValueError(f"Selection out of range: {part.strip()}")
+        for idx in range(first, last + 1):
+            instance_id = instances[idx - 1].instance_id
+            if instance_id not in seen:
+                seen.add(instance_id)
+                instance_ids.append(instance_id)
+    return instance_ids
+
+def _split_count(count, parts):
+    base, extra = divmod(count, parts)
+    return [base + (1 if idx < extra else 0) for idx in range(parts)]
+
+def launch_instances(ec2, count, name, image_id=None, instance_type=DEFAULT_INSTANCE_TYPE,
+                     subnet_ids=None, tags=None, launch_template=None,
+                     security_group_ids=(DEFAULT_SECURITY_GROUP_ID,)):
+    # Starts `count` instances with one run_instances call per subnet (a single
+    # call without subnets). Returns (instance IDs in launch order, errors):
+    # a failing subnet or name tag is reported in errors and the instances
+    # that did start are still returned. Only when nothing started at all is
+    # the first error raised. With a launch template, only explicitly given
+    # image and type override it.
+    tag_list = [{'Key': 'Name', 'Value': name}]
+    tag_list += [{'Key': key, 'Value': value} for key, value in (tags or {}).items() if key != 'Name']
+    params = {'TagSpecifications': [{'ResourceType': 'instance', 'Tags': tag_list}]}
+    if launch_template:
+        params['LaunchTemplate'] = {'LaunchTemplateName': launch_template, 'Version': '$Default'}
+        if image_id:
+            params['ImageId'] = image_id
+        if instance_type:
+            params['InstanceType'] = instance_type
+    else:
+        params['ImageId'] = image_id
+        params['InstanceType'] = instance_type
+        params['SecurityGroupIds'] = list(security_group_ids)  # 보안 그룹 설정
+
+    placements = [{'SubnetId': subnet_id} for subnet_id in subnet_ids] if subnet_ids else [{}]
+    instance_ids = []
+    errors = []
+    failure = None
+    for placement, share in zip(placements, _split_count(count, len(placements))):
+        if share == 0:
+            continue
+        try:
+            # MinCount=1 keeps whatever capacity is available instead of failing outright
+            response = ec2.run_instances(MinCount=1, MaxCount=share, **placement, **params)
+        except Exception as e:
+            failure = failure or e
+            errors.append(f"{placement.get('SubnetId', 'launch')}: {e}")
+            continue
+        instance_ids += [instance['InstanceId'] for instance in response['Instances']]
+    if not instance_ids and failure:
+        raise failure
+    inventory.invalidate(ec2, instance_ids)
+
+    # run_instances applies the same tags to every instance, so per-index
+    # names (name-01, name-02, ...) need one create_tags call per instance
+    if len(instance_ids) > 1:
+        width = max(2, len(str(len(instance_ids))))
+        for idx, instance_id in enumerate(instance_ids, 1):
             try:
-                ec2.terminate_instances(InstanceIds=[instance_id])
-                print(f"Successfully terminated instance {instance_id}.")
+                _create_tags(ec2, instance_id, [{'Key': 'Name', 'Value': f"{name}-{idx:0{width}d}"}])
             except Exception as e:
-                print(f"Error terminating instance {instance_id}: {str(e)}")
-
-def update_instance_name(ec2):
-    instances = list_instances_with_choice(ec2)
-    if instances:
-        instance_id = select_instance(instances)
-        if instance_id:
-            new_name = input(f"Enter the new name for instance {instance_id}: ").strip()
-            if new_name:
-                print(f"Updating name tag of instance {instance_id} to '{new_name}'...")
-                try:
-                    ec2.create_tags(
-                        Resources=[instance_id],
-                        Tags=[{'Key': 'Name', 'Value': new_name}]
-                    )
-                    print(f"Successfully updated instance {instance_id} with new name '{new_name}'.")
-                except Exception as e:
-                    print(f"Error updating name tag for instance {instance_id}: {str(e)}")
-            else:
-                print("Invalid name. No changes made.")
+                errors.append(f"{instance_id}: naming failed: {e}")
+    return instance_ids, errors
 
-def available_zones(ec2):
-    print("Available zones...")
-    try:
-        response = ec2.describe_availability_zones()
-        for zone in response['AvailabilityZones']:
-            print(f"[ID] {zone['ZoneId']}, [Region] {zone['RegionName']}, [Zone] {zone['ZoneName']}")
-    except Exception as e:
-        print(f"Error listing availability zones: {str(e)}")
-
-def available_regions(ec2):
-    print("Available regions...")
-    try:
-        response = ec2.describe_regions()
-        for region in response['Regions']:
-            print(f"[Region] {region['RegionName']}, [Endpoint] {region['Endpoint']}")
-    except Exception as e:
-        print(f"Error listing regions: {str(e)}")
-
-def list_images(ec2):
-    print("Listing all images...")
-    try:
-        response = ec2.describe_images(Owners=['self'])
-        if not response['Images']:
-            print("No images found.")
+def _create_tags(ec2, instance_id, tags):
+    # New instances can be unknown to create_tags for a moment (eventual consistency)
+    for attempt in range(1, TAG_ATTEMPTS + 1):
+        try:
+            ec2.create_tags(Resources=[instance_id], Tags=tags)
             return
+        except Exception as e:
+            if error_code(e) != 'InvalidInstanceID.NotFound' or attempt == TAG_ATTEMPTS:
+                raise
+            time.sleep(TAG_RETRY_DELAY * attempt)
+
+def _is_per_instance_error(error):
+    code = error_code(error) or ''
+    return code.startswith('InvalidInstanceID.') or code in PER_INSTANCE_ERROR_CODES
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def run_batched_operation(ec2, operation, instance_ids, batch_size=LIFECYCLE_BATCH_SIZE):
+    # Sends the IDs in API-sized batches and returns {instance_id: error or None}.
+    # EC2 rejects a whole batch if one instance is invalid, so a batch that
+    # failed on a per-instance error is retried per instance to find out
+    # which ones actually failed. Any other error (throttling, permissions)
+    # would fail the same way per instance and is reported for the batch.
+    call = getattr(ec2, operation)
+    results = {}
+    for batch in _batches(list(instance_ids), batch_size):
+        try:
+            call(InstanceIds=batch)
+            results.update((instance_id, None) for instance_id in batch)
+        except Exception as e:
+            if len(batch) == 1 or not _is_per_instance_error(e):
+                results.update((instance_id, str(e)) for instance_id in batch)
+                continue
+            for instance_id in batch:
+                try:
+                    call(InstanceIds=[instance_id])
+                    results[instance_id] = None
+                except Exception as e:
+                    results[instance_id] = str(e)
+    inventory.invalidate(ec2, instance_ids)
+    return results
 
-        for image in response['Images']:
-            print(f"[ImageID] {image['ImageId']}, [Name] {image.get('Name', 'N/A')}, [Owner] {image['OwnerId']}")
-    except Exception as e:
-        print(f"Error listing images: {str(e)}")
+def get_zones(ec2):
+    # Also kept in the attached snapshot, for `zones --offline`
+    zones = ec2.describe_availability_zones()['AvailabilityZones']
+    attached = inventory.attached_snapshot(ec2)
+    if attached:
+        snapshot, region = attached
+        try:
+            snapshot.save_zones(region, zones)
+        except Exception:
+            pass
+    return zones
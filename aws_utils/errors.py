@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from aws_utils.instrumentation import THROTTLING_CODES
+
+NOT_FOUND_CODES = frozenset((
+    'InvalidInstanceID.NotFound', 'InvalidAMIID.NotFound', 'InvalidSubnetID.NotFound',
+    'InvalidGroup.NotFound', 'InvalidLaunchTemplateName.NotFoundException', 'InvalidKeyPair.NotFound'
+))
+INVALID_REQUEST_CODES = frozenset((
+    'InvalidParameter', 'InvalidParameterValue', 'InvalidParameterCombination', 'MissingParameter',
+    'InvalidInstanceID.Malformed', 'InvalidAMIID.Malformed', 'ValidationError', 'UnsupportedOperation'
+))
+STATE_CODES = frozenset(('IncorrectInstanceState', 'IncorrectState', 'InvalidInstanceState'))
+
+class ApiError(Exception):
+    # Base of everything aws_utils.api raises. `code` is the AWS error code
+    # when the failure came back from AWS, None otherwise.
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+class NotFoundError(ApiError, LookupError):
+    pass
+
+class InvalidRequestError(ApiError, ValueError):
+    pass
+
+class StateError(ApiError):
+    # The instance is not in a state that allows the operation
+    pass
+
+class ThrottledError(ApiError):
+    # Still throttled after the client's adaptive retries gave up
+    pass
+
+class AwsError(ApiError):
+    # Any other failure talking to AWS, including connection errors
+    pass
+
+def error_code(error):
+    # botocore's ClientError carries the parsed error in `response`; checked
+    # by shape so botocore is not imported here
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+    return None
+
+def translate(error):
+    # The ApiError subclass matching an exception from boto3 or aws_utils
+    if isinstance(error, ApiError):
+        return error
+    code = error_code(error)
+    if code in NOT_FOUND_CODES or (code and code.endswith('.NotFound')):
+        return NotFoundError(str(error), code)
+    if code in INVALID_REQUEST_CODES or (code and code.endswith('.Malformed')):
+        return InvalidRequestError(str(error), code)
+    if code in STATE_CODES:
+        return StateError(str(error), code)
+    if code in THROTTLING_CODES:
+        return ThrottledError(str(error), code)
+    if code is None and isinstance(error, ValueError):
+        return InvalidRequestError(str(error))  # e.g. a query that does not parse
+    return AwsError(str(error), code)
+
+@contextmanager
+def translated():
+    # Re-raises anything from the block as an ApiError, chained to the original
+    try:
+        yield
+    except Exception as e:
+        error = translate(e)
+        if error is e:
+            raise
+        raise error from e
@@ -0,0 +1,98 @@
+from bisect import bisect_left
+
+DEFAULT_LIMIT = 10
+PREFIX_SCAN = 1000  # sorted keys looked at past the first prefix match
+MAX_POSTING = 2000  # trigram postings read per lookup; very common trigrams are skipped
+MAX_CANDIDATES = 500  # fuzzy candidates scored exactly
+MIN_SIMILARITY = 0.3  # weaker fuzzy matches are dropped
+
+# Match kinds, best first
+EXACT, PREFIX, CONTAINS, FUZZY = 0, 1, 2, 3
+MATCH_NAMES = ('exact', 'prefix', 'contains', 'fuzzy')
+
+def _trigrams(text):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class InstanceIndex:
+    # Name / instance ID / IP lookup over InstanceRecords. Exact keys are a
+    # dict, prefixes come from a sorted key list (bisect, as in AmiCatalog),
+    # and typos or partial IDs are matched through a trigram index over
+    # names and IDs. Every lookup reads a bounded number of entries, so its
+    # cost does not grow with the fleet.
+
+    def __init__(self, instances):
+        self.instances = list(instances)
+        self._exact = {}
+        keys = []
+        self._fuzzy_keys = []
+        self._postings = {}
+        for idx, inst in enumerate(self.instances):
+            instance_id = inst.instance_id.lower()
+            name = inst.name.lower() if inst.name != 'N/A' else None
+            for key in (name, instance_id, instance_id[len('i-'):], inst.public_ip, inst.private_ip):
+                if key and key != 'N/A':
+                    keys.append((key, idx))
+                    self._exact.setdefault(key, []).append(idx)
+            for key in (name, instance_id):
+                if key:
+                    key_idx = len(self._fuzzy_keys)
+                    self._fuzzy_keys.append((key, idx))
+                    for gram in _trigrams(key):
+                        self._postings.setdefault(gram, []).append(key_idx)
+        keys.sort()
+        self._keys = keys
+
+    def __len__(self):
+        return len(self.instances)
+
+    def _prefix(self, text):
+        start = bisect_left(self._keys, (text,))
+        for key, idx in self._keys[start:start + PREFIX_SCAN]:
+            if not key.startswith(text):
+                break
+            yield key, idx
+
+    def _fuzzy(self, text):
+        # Rarest trigrams first; common ones only count while nothing rarer matched
+        grams = sorted(_trigrams(text), key=lambda gram: len(self._postings.get(gram, ())))
+        counts = {}
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if not posting:
+                continue
+            if len(posting) > MAX_POSTING and counts:
+                break
+            for key_idx in posting[:MAX_POSTING]:
+                counts[key_idx] = counts.get(key_idx, 0) + 1
+        best = sorted(counts, key=counts.get, reverse=True)[:MAX_CANDIDATES]
+        query = _trigrams(text)
+        for key_idx in best:
+            key, idx = self._fuzzy_keys[key_idx]
+            grams = _trigrams(key)
+            yield key, idx, 2 * len(query & grams) / (len(query) + len(grams))
+
+    def search(self, text, limit=DEFAULT_LIMIT):
+        # Returns up to `limit` (record, kind, score) tuples, best first.
+        # Score is in [0, 1]; kind is one of MATCH_NAMES.
+        text = text.strip().lower()
+        if not text:
+            return []
+        best = {}
+
+        def offer(idx, kind, score):
+            if idx not in best or (kind, -score) < (best[idx][0], -best[idx][1]):
+                best[idx] = (kind, score)
+
+        for idx in self._exact.get(text, ()):
+            offer(idx, EXACT, 1.0)
+        for key, idx in self._prefix(text):
+            offer(idx, PREFIX, len(text) / len(key))
+        for key, idx, similarity in self._fuzzy(text):
+            if text in key:
+                offer(idx, CONTAINS, len(text) / len(key))
+            elif similarity >= MIN_SIMILARITY:
+                offer(idx, FUZZY, similarity)
+
+        ranked = sorted(best.items(), key=lambda item: (item[1][0], -item[1][1], self.instances[item[0]].instance_id))
+        return [(self.instances[idx], MATCH_NAMES[kind], score) for idx, (kind, score) in ranked[:limit]]
@@ -0,0 +1,237 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+THROTTLING_CODES = frozenset((
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottled',
+    'RequestThrottledException', 'RequestLimitExceeded', 'TooManyRequestsException',
+    'ProvisionedThroughputExceededException', 'SlowDown'
+))
+
+_START_KEY = 'instrumentation_start'
+
+class ApiStats:
+    # Per (service, operation) counters filled from botocore's event hooks,
+    # plus wall time for local phases (listing, rendering) so a slow screen
+    # can be split into time spent waiting on AWS and time spent here.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+        self._phases = {}
+
+    def _entry(self, service, operation):
+        key = (service, operation)
+        entry = self._operations.get(key)
+        if entry is None:
+            entry = self._operations[key] = {
+                'calls': 0,
+                'errors': {},
+                'retries': 0,
+                'throttled': 0,
+                'response_bytes': 0,
+                'latency_sum_ms': 0.0,
+                'latency_max_ms': 0.0,
+                'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            }
+        return entry
+
+    def record_call(self, service, operation, latency_ms, retries=0, error_code=None, response_bytes=0):
+        bucket = next((idx for idx, bound in enumerate(LATENCY_BUCKETS_MS) if latency_ms <= bound),
+                      len(LATENCY_BUCKETS_MS))
+        with self._lock:
+            entry = self._entry(service, operation)
+            entry['calls'] += 1
+            entry['retries'] += retries
+            entry['response_bytes'] += response_bytes
+            entry['latency_sum_ms'] += latency_ms
+            entry['latency_max_ms'] = max(entry['latency_max_ms'], latency_ms)
+            entry['buckets'][bucket] += 1
+            if error_code:
+                entry['errors'][error_code] = entry['errors'].get(error_code, 0) + 1
+
+    def record_throttle(self, service, operation):
+        # Counted per attempt, so throttles that a retry later absorbed show up too
+        with self._lock:
+            self._entry(service, operation)['throttled'] += 1
+
+    def record_phase(self, name, seconds):
+        with self._lock:
+            count, total = self._phases.get(name, (0, 0.0))
+            self._phases[name] = (count + 1, total + seconds)
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self._phases.clear()
+
+    def snapshot(self):
+        with self._lock:
+            operations = {
+                f"{service}.{operation}": dict(entry, errors=dict(entry['errors']), buckets=list(entry['buckets']))
+                for (service, operation), entry in sorted(self._operations.items())
+            }
+            phases = {
+                name: {'count': count, 'seconds': round(total, 6)}
+                for name, (count, total) in sorted(self._phases.items())
+            }
+        return {'operations': operations, 'phases': phases}
+
+    def to_json(self):
+        data = self.snapshot()
+        for entry in data['operations'].values():
+            entry['buckets'] = {
+                str(bound): count for bound, count in zip(LATENCY_BUCKETS_MS + ('+Inf',), entry['buckets'])
+            }
+        return json.dumps(data, indent=2)
+
+    def to_prometheus(self):
+        data = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def labels(key, **extra):
+            service, operation = key.split('.', 1)
+            pairs = [('service', service), ('operation', operation)] + list(extra.items())
+            return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+        operations = data['operations']
+        for name, field, help_text in (
+            ('aws_api_calls_total', 'calls', "API calls made, after retries"),
+            ('aws_api_retries_total', 'retries', "Retry attempts reported in ResponseMetadata"),
+            ('aws_api_throttled_total', 'throttled', "Attempts rejected with a throttling error"),
+            ('aws_api_response_bytes_total', 'response_bytes', "Response body bytes received")
+        ):
+            metric(name, 'counter', help_text)
+            lines += [f"{name}{labels(key)} {entry[field]}" for key, entry in operations.items()]
+
+        metric('aws_api_errors_total', 'counter', "API calls that failed, by error code")
+        for key, entry in operations.items():
+            lines += [f"aws_api_errors_total{labels(key, code=code)} {count}"
+                      for code, count in sorted(entry['errors'].items())]
+
+        metric('aws_api_latency_seconds', 'histogram', "API call latency including retries")
+        for key, entry in operations.items():
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS_MS + (None,), entry['buckets']):
+                cumulative += count
+                le = '+Inf' if bound is None else f"{bound / 1000:g}"
+                lines.append(f"aws_api_latency_seconds_bucket{labels(key, le=le)} {cumulative}")
+            lines.append(f"aws_api_latency_seconds_sum{labels(key)} {entry['latency_sum_ms'] / 1000:.6f}")
+            lines.append(f"aws_api_latency_seconds_count{labels(key)} {entry['calls']}")
+
+        metric('app_phase_seconds_total', 'counter', "Wall time spent in local phases")
+        for name, phase in data['phases'].items():
+            lines.append(f'app_phase_seconds_total{{phase="{name}"}} {phase["seconds"]}')
+        metric('app_phase_runs_total', 'counter', "Times each local phase ran")
+        for name, phase in data['phases'].items():
+            lines.append(f'app_phase_runs_total{{phase="{name}"}} {phase["count"]}')
+        return "\n".join(lines) + "\n"
+
+_stats = ApiStats()
+
+def get_stats():
+    return _stats
+
+@contextmanager
+def timed(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stats.record_phase(phase, time.perf_counter() - start)
+
+def timed_iter(phase, iterable, elapsed=0.0):
+    # Yields from `iterable`, counting only the time spent producing items
+    # (not the caller's loop body) as one run of `phase`. `elapsed` is time
+    # already spent on the same run.
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        _stats.record_phase(phase, elapsed)
+
+def _service_name(model):
+    return model.service_model.service_name
+
+def _before_parameter_build(model, context, **kwargs):
+    # Earlier than before-call, whose handler chain stops at the first one
+    # that answers (stubs, cached responses) and could skip this timer
+    context[_START_KEY] = time.perf_counter()
+
+def _response_size(http_response):
+    length = http_response.headers.get('content-length')
+    if length is not None:
+        return int(length)
+    if http_response.raw is None:
+        return 0  # stubbed responses carry no body
+    return len(http_response.content)  # already read and cached by the parser
+
+def _after_call(http_response, parsed, model, context, **kwargs):
+    start = context.pop(_START_KEY, None)
+    if start is None:
+        return
+    metadata = parsed.get('ResponseMetadata', {})
+    error_code = parsed.get('Error', {}).get('Code') if http_response.status_code >= 300 else None
+    _stats.record_call(
+        _service_name(model), model.name,
+        (time.perf_counter() - start) * 1000,
+        retries=metadata.get('RetryAttempts', 0),
+        error_code=error_code,
+        response_bytes=_response_size(http_response)
+    )
+
+def _after_call_error(exception, model, context, **kwargs):
+    # Connection failures and timeouts never produce a parsed response
+    start = context.pop(_START_KEY, None)
+    if start is None:
+        return
+    _stats.record_call(_service_name(model), model.name, (time.perf_counter() - start) * 1000,
+                       error_code=type(exception).__name__)
+
+def _needs_retry(response, operation, **kwargs):
+    # Observes every attempt; returning None leaves the retry decision to botocore
+    if response is not None and response[1].get('Error', {}).get('Code') in THROTTLING_CODES:
+        _stats.record_throttle(_service_name(operation), operation.name)
+
+def instrument(client):
+    events = client.meta.events
+    events.register('before-parameter-build', _before_parameter_build,
+                    unique_id='instrumentation-before-parameter-build')
+    events.register('after-call', _after_call, unique_id='instrumentation-after-call')
+    events.register('after-call-error', _after_call_error, unique_id='instrumentation-after-call-error')
+    events.register('needs-retry', _needs_retry, unique_id='instrumentation-needs-retry')
+    return client
+
+def print_stats(stats=None, stream=None):
+    data = (stats or _stats).snapshot()
+    if not data['operations'] and not data['phases']:
+        print("No API calls recorded yet.", file=stream)
+        return
+    print(f"{'Operation':<40} {'Calls':>6} {'Avg ms':>8} {'Max ms':>8} {'Retries':>7} "
+          f"{'Throttled':>9} {'Errors':>6} {'KB':>8}", file=stream)
+    print("-" * 100, file=stream)
+    api_seconds = 0.0
+    for key, entry in data['operations'].items():
+        api_seconds += entry['latency_sum_ms'] / 1000
+        average = entry['latency_sum_ms'] / entry['calls'] if entry['calls'] else 0.0
+        print(f"{key:<40} {entry['calls']:>6} {average:>8.1f} {entry['latency_max_ms']:>8.1f} "
+              f"{entry['retries']:>7} {entry['throttled']:>9} {sum(entry['errors'].values()):>6} "
+              f"{entry['response_bytes'] / 1024:>8.1f}", file=stream)
+    print(f"\nTotal time waiting on AWS: {api_seconds:.3f}s", file=stream)
+    for name, phase in data['phases'].items():
+        print(f"  {name:<10} {phase['count']:>5} runs  {phase['seconds']:.3f}s wall", file=stream)
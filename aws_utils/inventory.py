@@ -0,0 +1,166 @@
+import threading
+import time
+from aws_utils.instance_index import InstanceIndex
+
+DEFAULT_TTL = 60  # seconds before a full describe_instances scan is required again
+TRANSITIONAL_STATES = {'pending', 'stopping', 'shutting-down'}
+
+_ttl = DEFAULT_TTL
+_caches = {}
+# The background reconcile (ec2_management.preload_inventory) writes the
+# cache while the menu reads and invalidates it
+_lock = threading.RLock()
+
+def set_ttl(seconds):
+    global _ttl
+    _ttl = seconds
+
+def _entry(ec2):
+    # 'stale' maps instance ID -> monotonic time of the invalidation
+    with _lock:
+        return _caches.setdefault(ec2, {'instances': None, 'fetched_at': 0.0, 'stale': {}, 'index': None,
+                                        'snapshot': None, 'preload': False, 'snapshot_at': None,
+                                        'reconcile': None})
+
+def cached_instances(ec2):
+    entry = _entry(ec2)
+    with _lock:
+        if entry['instances'] is None:
+            return None
+        if time.monotonic() - entry['fetched_at'] > _ttl:
+            return None
+        return list(entry['instances'].values())
+
+def store_instances(ec2, instances, scan_started=None):
+    # scan_started is the monotonic time the scan began. Instances
+    # invalidated after that may have changed since they were described and
+    # stay stale; without it the scan is taken as current.
+    entry = _entry(ec2)
+    with _lock:
+        entry['instances'] = {inst.instance_id: inst for inst in instances}
+        entry['fetched_at'] = time.monotonic()
+        if scan_started is None:
+            entry['stale'].clear()
+        else:
+            entry['stale'] = {
+                instance_id: invalidated_at for instance_id, invalidated_at in entry['stale'].items()
+                if invalidated_at >= scan_started
+            }
+        entry['index'] = None
+        entry['snapshot_at'] = None
+
+def invalidate(ec2, instance_ids=None):
+    # Without IDs the whole inventory is dropped; with IDs only those
+    # instances are re-described on the next listing.
+    entry = _entry(ec2)
+    with _lock:
+        entry['index'] = None
+        if instance_ids is None:
+            entry['instances'] = None
+            entry['stale'].clear()
+            entry['snapshot_at'] = None
+        else:
+            now = time.monotonic()
+            entry['stale'].update((instance_id, now) for instance_id in instance_ids)
+
+def pending_ids(ec2):
+    # Instances that were touched by a mutating call or are still in a
+    # transitional state may differ from what the cache holds.
+    entry = _entry(ec2)
+    with _lock:
+        if entry['instances'] is None:
+            return []
+        ids = set(entry['stale'])
+        if entry['snapshot_at'] is None:
+            # Saved states are brought up to date by the background reconcile
+            ids.update(
+                instance_id for instance_id, inst in entry['instances'].items()
+                if inst.state in TRANSITIONAL_STATES
+            )
+        return sorted(ids)
+
+def merge_instances(ec2, instance_ids, instances, described_at=None):
+    # described_at works like store_instances' scan_started
+    entry = _entry(ec2)
+    with _lock:
+        if entry['instances'] is None:
+            return
+        found = {inst.instance_id: inst for inst in instances}
+        for instance_id in instance_ids:
+            if instance_id in found:
+                entry['instances'][instance_id] = found[instance_id]
+            else:
+                entry['instances'].pop(instance_id, None)
+            invalidated_at = entry['stale'].get(instance_id)
+            if invalidated_at is not None and (described_at is None or invalidated_at < described_at):
+                del entry['stale'][instance_id]
+        entry['index'] = None
+
+def instance_index(ec2, instances):
+    # Lookup index over the cached inventory, rebuilt only after it changes.
+    # `instances` must be what get_instances() returned for the same client.
+    entry = _entry(ec2)
+    if entry['index'] is None or len(entry['index']) != len(instances):
+        entry['index'] = InstanceIndex(instances)
+    return entry['index']
+
+def attach_snapshot(ec2, snapshot, region, preload=False):
+    # Full scans of this client are saved to `snapshot` (aws_utils.snapshot)
+    # under `region`. With preload, the first listing in the process may be
+    # served from what an earlier run saved.
+    entry = _entry(ec2)
+    entry['snapshot'] = (snapshot, region)
+    entry['preload'] = preload
+
+def attached_snapshot(ec2):
+    # (snapshot, region) or None
+    return _entry(ec2)['snapshot']
+
+def load_snapshot(ec2):
+    # The saved inventory as the cache contents, at most once per process and
+    # only before anything was listed; None when there is nothing to serve
+    entry = _entry(ec2)
+    with _lock:
+        if entry['snapshot'] is None or not entry['preload'] or entry['instances'] is not None:
+            return None
+        entry['preload'] = False
+    snapshot, region = entry['snapshot']
+    try:
+        instances, fetched_at = snapshot.load_instances(region)
+    except Exception:
+        return None  # an unreadable snapshot must not get in the way of a live scan
+    if instances is None:
+        return None
+    with _lock:
+        # The saved scan is older than anything invalidated in this process,
+        # so those invalidations are kept
+        store_instances(ec2, instances, time.monotonic() - (time.time() - fetched_at))
+        entry['snapshot_at'] = fetched_at
+    return instances
+
+def track_reconcile(ec2, thread):
+    # The background scan that replaces a served snapshot
+    _entry(ec2)['reconcile'] = thread
+
+def wait_for_reconcile(ec2, timeout=None):
+    # Blocks until the cache no longer holds snapshot data (or `timeout`
+    # seconds pass); True when it is live
+    thread = _entry(ec2)['reconcile']
+    if thread is not None:
+        thread.join(timeout)
+    return snapshot_time(ec2) is None
+
+def save_snapshot(ec2, instances):
+    entry = _entry(ec2)
+    if entry['snapshot'] is None:
+        return
+    snapshot, region = entry['snapshot']
+    try:
+        snapshot.save_instances(region, instances)
+    except Exception:
+        pass  # e.g. a read-only cache directory; the in-memory inventory is unaffected
+
+def snapshot_time(ec2):
+    # Epoch seconds of the saved scan the cache currently holds, or None
+    # once it has been replaced by a live one
+    return _entry(ec2)['snapshot_at']
@@ -0,0 +1,503 @@
+import subprocess
+from datetime import datetime, timezone
+from aws_utils import api, inventory
+from aws_utils.errors import ApiError
+from aws_utils.records import NOT_AVAILABLE
+from aws_utils.query import parse_query
+from aws_utils.output import show_table, TableStream, INSTANCE_COLUMNS
+from aws_utils.monitoring import CPU_WINDOWS
+from aws_utils.ssh_utils import print_line_sink
+from aws_utils.watch import watch_instances
+from aws_utils.ec2_management import DEFAULT_INSTANCE_TYPE, DEFAULT_SECURITY_GROUP_ID
+
+# Interactive front end of the main.py menu: prompts, calls aws_utils.api
+# and prints what comes back. Nothing here talks to AWS directly.
+
+IMAGE_COLUMNS = [('ImageId', 'Image ID'), ('Name', 'Name'), ('CreationDate', 'Created')]
+ZONE_COLUMNS = [('ZoneId', 'ID'), ('RegionName', 'Region'), ('ZoneName', 'Zone')]
+REGION_COLUMNS = [('RegionName', 'Region'), ('Endpoint', 'Endpoint')]
+SUMMARY_COLUMNS = [
+    ('P50', 'p50 %', '.1f'),
+    ('P95', 'p95 %', '.1f'),
+    ('P99', 'p99 %', '.1f'),
+    ('Max', 'Max %', '.1f')
+]
+FLEET_COLUMNS = [('InstanceId', 'Instance ID'), ('Name', 'Name')] + SUMMARY_COLUMNS + [
+    ('PeakMean', 'Peak %', '.1f'),
+    ('Anomalies', 'Anomalies', 'd'),
+    ('Points', 'Points', 'd')
+]
+
+def snapshot_note(ec2):
+    fetched_at = inventory.snapshot_time(ec2)
+    if fetched_at is None:
+        return None
+    return (f"Showing the inventory saved at {datetime.fromtimestamp(fetched_at).strftime('%Y-%m-%d %H:%M')}; "
+            f"refreshing in the background.")
+
+def list_instances_with_choice(ec2, refresh=False, query=None, live=False):
+    # live: the rows will be acted on, so a list served from the saved
+    # inventory is not good enough; wait for the background scan instead
+    if live and inventory.snapshot_time(ec2) is not None:
+        print("Waiting for the live inventory...")
+        inventory.wait_for_reconcile(ec2)
+    print("Listing instances...")
+    # Rows are printed page by page as the scan returns them; long listings
+    # continue in the paged view
+    table = TableStream(INSTANCE_COLUMNS, numbered=True)
+    try:
+        instances = api.list_instances(ec2, query, refresh, on_page=table.add)
+    except ApiError as e:
+        print(f"Error listing instances: {str(e)}")
+        return None
+    if not instances:
+        print("No instances found.")
+        return None
+    table.close()
+    note = snapshot_note(ec2)
+    if note:
+        print(note)
+    return instances
+
+def prompt_query():
+    expression = input("Filter (e.g. state=running tag:Role=worker name=wk-*, empty for all): ").strip()
+    return parse_query(expression) if expression else None
+
+def list_filtered_instances(ec2):
+    try:
+        query = prompt_query()
+    except ValueError as e:
+        print(f"Invalid filter: {str(e)}")
+        return None
+    return list_instances_with_choice(ec2, query=query)
+
+def list_instances_all_regions(ec2):
+    print("Listing instances in all enabled regions...")
+    try:
+        instances, errors = api.list_instances_all_regions(ec2)
+    except ApiError as e:
+        print(f"Error listing instances: {str(e)}")
+        return None
+    for region, error in sorted(errors.items()):
+        print(f"Error listing instances in {region}: {error}")
+    if not instances:
+        print("No instances found.")
+        return None
+    show_table(instances, [('Region', 'Region')] + INSTANCE_COLUMNS, numbered=True)
+    regions = {inst.region for inst in instances}
+    print(f"{len(instances)} instance(s) in {len(regions)} region(s).")
+    return instances
+
+def _choose_row(rows, prompt):
+    # Empty input cancels; callers act on the chosen row right away (launch,
+    # rename, SSH), so a stray Enter must not pick row 1
+    text = input(prompt).strip()
+    if not text:
+        return None
+    try:
+        choice = int(text)
+    except ValueError:
+        print("Invalid input. Please enter a number.")
+        return None
+    if 1 <= choice <= len(rows):
+        return rows[choice - 1]
+    print("Invalid selection.")
+    return None
+
+def pick_instance(ec2):
+    # Looks one instance up by name, ID or IP (exact, prefix, then fuzzy)
+    # instead of making the user find it in a full listing. Enter shows the
+    # whole list and picks by row number.
+    try:
+        instances = api.list_instances(ec2)
+    except ApiError as e:
+        print(f"Error listing instances: {str(e)}")
+        return None
+    if not instances:
+        print("No instances found.")
+        return None
+    text = input("Instance name, ID or IP (Enter to list all): ").strip()
+    if not text:
+        show_table(instances, INSTANCE_COLUMNS, numbered=True)
+        inst = _choose_row(instances, "Select an instance by number (Enter to cancel): ")
+        return inst and inst.instance_id
+
+    try:
+        matches = api.find_instances(ec2, text)
+    except ApiError as e:
+        print(f"Error listing instances: {str(e)}")
+        return None
+    if not matches:
+        print(f"No instance matches '{text}'.")
+        return None
+    exact = [match.instance for match in matches if match.kind == 'exact']
+    if len(exact) == 1:
+        print(f"Selected {exact[0].instance_id} ({exact[0].name}).")
+        return exact[0].instance_id
+    show_table(matches, INSTANCE_COLUMNS + [('Match', 'Match')], numbered=True)
+    match = _choose_row(matches, "Select a match by number (Enter to cancel): ")
+    return match and match.instance.instance_id
+
+def select_instances(ec2, instances):
+    if not instances:
+        print("No instances to select.")
+        return []
+    selection = input("Select instances (e.g. 1-3,5 | all | state=running | tag:Key=Value name=wk-*): ").strip()
+    try:
+        instance_ids = api.select_instance_ids(ec2, selection, instances)
+    except ApiError as e:
+        print(f"Invalid selection: {str(e)}")
+        return []
+    if not instance_ids:
+        print("No instances matched the selection.")
+    return instance_ids
+
+def list_and_select_ami(ec2):
+    print("Fetching available AMIs...")
+    try:
+        images = api.list_images(ec2)
+        if not images:
+            print("No AMIs found.")
+            return None
+        search = input("Search AMIs by name (prefix or substring, empty for all): ").strip()
+        if search:
+            images = api.list_images(ec2, search)
+    except ApiError as e:
+        print(f"Error listing AMIs: {str(e)}")
+        return None
+    if not images:
+        print(f"No AMIs match '{search}'.")
+        return None
+
+    show_table(images, IMAGE_COLUMNS, numbered=True)
+    image = _choose_row(images, "Select an AMI by number (Enter to cancel): ")
+    return image and image.image_id
+
+def _parse_tags(text):
+    tags = {}
+    for pair in text.split(','):
+        key, _, value = pair.strip().partition('=')
+        if key:
+            tags[key] = value
+    return tags
+
+def create_instance(ec2):
+    launch_template = input("Launch template name (leave empty to pick an AMI): ").strip()
+    ami_id = None
+    if not launch_template:
+        ami_id = list_and_select_ami(ec2)
+        if not ami_id:
+            print("No AMI selected. Instance creation canceled.")
+            return
+
+    instance_name = input("Enter a name for the instance: ").strip()
+    if not instance_name:
+        print("Invalid instance name. Operation canceled.")
+        return
+
+    try:
+        count = int(input("Number of instances [1]: ").strip() or 1)
+    except ValueError:
+        print("Invalid number. Operation canceled.")
+        return
+    if count < 1:
+        print("Invalid number. Operation canceled.")
+        return
+
+    default_type = "" if launch_template else DEFAULT_INSTANCE_TYPE
+    instance_type = input(f"Instance type [{default_type or 'from template'}]: ").strip() or None
+    subnets = input("Subnet IDs to spread across (comma-separated, optional): ").strip()
+    subnet_ids = [subnet.strip() for subnet in subnets.split(',') if subnet.strip()]
+    tags = _parse_tags(input("Extra tags (Key=Value,..., optional): ").strip())
+
+    if launch_template:
+        print(f"Creating {count} instance(s) from launch template {launch_template}...")
+    else:
+        print(f"Creating {count} instance(s) with security group {DEFAULT_SECURITY_GROUP_ID}...")
+    try:
+        result = api.launch(ec2, count, instance_name, image_id=ami_id, instance_type=instance_type,
+                            subnet_ids=subnet_ids, tags=tags, launch_template=launch_template or None)
+    except ApiError as e:
+        print(f"Error creating instance: {str(e)}")
+        return
+    if len(result.instance_ids) == 1:
+        print(f"Successfully created instance {result.instance_ids[0]} with name '{instance_name}'.")
+    else:
+        print(f"Successfully created {len(result.instance_ids)} instances named '{instance_name}-NN': "
+              f"{', '.join(result.instance_ids)}")
+    if result.partial:
+        print(f"Only {len(result.instance_ids)} of {count} requested instances could be launched.")
+    for error in result.errors:
+        print(f"Error: {error}")
+
+def _lifecycle_action(ec2, action, verb, past, confirm=False):
+    try:
+        query = prompt_query()
+    except ValueError as e:
+        print(f"Invalid filter: {str(e)}")
+        return
+    instances = list_instances_with_choice(ec2, query=query, live=True)
+    if not instances:
+        return
+    instance_ids = select_instances(ec2, instances)
+    if not instance_ids:
+        return
+    if confirm and len(instance_ids) > 1:
+        answer = input(f"{verb} {len(instance_ids)} instances. Continue? (y/n): ").strip().lower()
+        if answer != "y":
+            print("Operation canceled.")
+            return
+    print(f"{verb} {len(instance_ids)} instance(s)...")
+    try:
+        results = api.change_state(ec2, action, instance_ids)
+    except ApiError as e:
+        print(f"Error {verb.lower()} instances: {str(e)}")
+        return
+    succeeded = [result.instance_id for result in results if result.ok]
+    if succeeded:
+        print(f"Successfully {past} {len(succeeded)} instance(s): {', '.join(succeeded)}")
+    for result in results:
+        if not result.ok:
+            print(f"Error {verb.lower()} instance {result.instance_id}: {result.error}")
+
+def start_instance(ec2):
+    _lifecycle_action(ec2, 'start', "Starting", "started")
+
+def stop_instance(ec2):
+    _lifecycle_action(ec2, 'stop', "Stopping", "stopped")
+
+def reboot_instance(ec2):
+    _lifecycle_action(ec2, 'reboot', "Rebooting", "rebooted")
+
+def delete_instance(ec2):
+    _lifecycle_action(ec2, 'terminate', "Terminating", "terminated", confirm=True)
+
+def update_instance_name(ec2):
+    instance_id = pick_instance(ec2)
+    if not instance_id:
+        return
+    new_name = input(f"Enter the new name for instance {instance_id}: ").strip()
+    if not new_name:
+        print("Invalid name. No changes made.")
+        return
+    print(f"Updating name tag of instance {instance_id} to '{new_name}'...")
+    try:
+        api.rename_instance(ec2, instance_id, new_name)
+        print(f"Successfully updated instance {instance_id} with new name '{new_name}'.")
+    except ApiError as e:
+        print(f"Error updating name tag for instance {instance_id}: {str(e)}")
+
+def available_zones(ec2):
+    print("Available zones...")
+    try:
+        show_table(api.list_zones(ec2), ZONE_COLUMNS)
+    except ApiError as e:
+        print(f"Error listing availability zones: {str(e)}")
+
+def available_regions(ec2):
+    print("Available regions...")
+    try:
+        show_table(api.list_regions(ec2), REGION_COLUMNS)
+    except ApiError as e:
+        print(f"Error listing regions: {str(e)}")
+
+def list_images(ec2, name_filter=None, refresh=False):
+    print("Listing all images...")
+    try:
+        images = api.list_images(ec2, name_filter, refresh)
+    except ApiError as e:
+        print(f"Error listing images: {str(e)}")
+        return
+    if not images:
+        print("No images found.")
+        return
+    for image in images:
+        print(f"[ImageID] {image.image_id}, [Name] {image.name}, [Owner] {image.owner_id}")
+
+def _select_window():
+    window = input("Time window (1h/1d/1w) [1h]: ").strip() or '1h'
+    if window not in CPU_WINDOWS:
+        print("Invalid window. Using 1h.")
+        window = '1h'
+    return window
+
+def _summary_row(summary, columns):
+    # Missing statistics read N/A rather than an empty cell
+    row = {key: summary.get(key) for key, *_ in columns}
+    return {key: NOT_AVAILABLE if value is None else value for key, value in row.items()}
+
+def get_cpu_usage(ec2, cloudwatch):
+    instance_id = pick_instance(ec2)
+    if not instance_id:
+        print("No instance selected. Operation canceled.")
+        return
+
+    window = _select_window()
+    try:
+        summary = api.cpu_summaries(ec2, cloudwatch, [instance_id], window)[0]
+    except ApiError as e:
+        print(f"Error fetching CPU usage data: {str(e)}")
+        return
+
+    print(f"CPU usage for instance {instance_id} in the last {window}:")
+    if not summary.history:
+        print("No CPU usage data available for the selected instance.")
+        return
+    from aws_utils.analytics import DEFAULT_WINDOW
+    show_table([_summary_row(summary, SUMMARY_COLUMNS)], SUMMARY_COLUMNS)
+    if summary.peak_start is not None:
+        print(f"Busiest {DEFAULT_WINDOW * 5} minutes: {summary.peak_mean:.1f}% "
+              f"from {datetime.fromtimestamp(summary.peak_start, timezone.utc)}")
+    anomalies = set(summary.anomalies)
+    # Raw datapoints for the short window, only the outliers for longer ones
+    points = [
+        {'Time': datetime.fromtimestamp(timestamp, timezone.utc), 'CPU': value,
+         'Flag': "anomaly" if timestamp in anomalies else ""}
+        for timestamp, value in summary.history
+        if window == '1h' or timestamp in anomalies
+    ]
+    if points:
+        show_table(points, [('Time', 'Time'), ('CPU', 'CPU %', '.2f'), ('Flag', '')])
+
+def get_fleet_cpu_usage(ec2, cloudwatch):
+    instances = list_instances_with_choice(ec2)
+    if not instances:
+        print("No instances available.")
+        return
+
+    instance_ids = select_instances(ec2, instances)
+    if not instance_ids:
+        print("No instances selected. Operation canceled.")
+        return
+
+    window = _select_window()
+    try:
+        summaries = api.cpu_summaries(ec2, cloudwatch, instance_ids, window)
+    except ApiError as e:
+        print(f"Error fetching CPU usage data: {str(e)}")
+        return
+    print(f"CPU usage for {len(instance_ids)} instance(s) in the last {window}, hottest first:")
+    show_table([_summary_row(summary, FLEET_COLUMNS) for summary in summaries], FLEET_COLUMNS)
+
+def ssh_to_instance(ec2):
+    instance_id = pick_instance(ec2)
+    if not instance_id:
+        print("No instance selected. Operation canceled.")
+        return
+
+    try:
+        inst = api.get_instance(ec2, instance_id)
+        if inst.public_ip == NOT_AVAILABLE:
+            print(f"Instance {instance_id} does not have a public IP address.")
+            return
+        print(f"Selected instance {instance_id} with public IP: {inst.public_ip}")
+        key_path = input("Enter the path to your private key file (.pem): ").strip()
+        ssh_command = api.ssh_command(ec2, instance_id, key_path, instance=inst)
+    except ApiError as e:
+        print(f"Error retrieving instance details: {str(e)}")
+        return
+    print("To SSH into the instance, the following command will be executed:")
+    print(ssh_command)
+
+    run_ssh = input("Do you want to execute this SSH command now? (y/n): ").strip().lower()
+    if run_ssh == "y":
+        try:
+            subprocess.run(ssh_command, shell=True, check=True)
+            print("SSH connection established successfully.")
+        except subprocess.CalledProcessError as e:
+            print(f"Error executing SSH command: {e}")
+
+def _select_ssh_targets(ec2):
+    # (instance IDs, key path) or (None, None) when the user backs out
+    instances = list_instances_with_choice(ec2, live=True)
+    if not instances:
+        print("No instances available.")
+        return None, None
+
+    instance_ids = select_instances(ec2, instances)
+    if not instance_ids:
+        print("No instances selected. Operation canceled.")
+        return None, None
+
+    key_path = input("Enter the path to your private key file (.pem): ").strip()
+    return instance_ids, key_path
+
+def _print_command_results(command, results):
+    print(f"\nSummary of {command}:")
+    for result in results:
+        if result.error:
+            print(f"  {result.instance_id} ({result.host or NOT_AVAILABLE}): {result.error}")
+        else:
+            print(f"  {result.instance_id} ({result.host}): exit code {result.exit_code}")
+    succeeded = sum(1 for result in results if result.ok)
+    print(f"{succeeded} of {len(results)} instance(s) completed successfully.")
+
+def execute_command_on_instances(ec2):
+    instance_ids, key_path = _select_ssh_targets(ec2)
+    if not instance_ids:
+        return
+
+    command = input("Enter the command to run: ").strip()
+    if not command:
+        print("No command entered. Operation canceled.")
+        return
+
+    print(f"Running '{command}' on {len(instance_ids)} instance(s)...")
+    try:
+        results = api.run_command(ec2, instance_ids, command, key_path, on_line=print_line_sink)
+    except ApiError as e:
+        print(f"Error: {str(e)}")
+        return
+    _print_command_results(command, results)
+
+def _print_pool(title, status):
+    counters, change = status.counters, status.change
+
+    def counter(name):
+        if change and change['Counters'][name]:
+            return f"{counters[name]} ({change['Counters'][name]:+})"
+        return f"{counters[name]}"
+
+    print(f"\n{title}: {counter('Slots')} slots, {counter('Claimed')} claimed, "
+          f"{counter('Unclaimed')} unclaimed, {counter('Idle')} idle, "
+          f"{counter('Cpus')} CPUs, {counter('Memory')} MB memory")
+    if change and change['Added']:
+        print(f"  Nodes joined: {', '.join(change['Added'])}")
+    if change and change['Removed']:
+        print(f"  Nodes left: {', '.join(change['Removed'])}")
+
+def _print_pool_nodes(status):
+    print(f"  {'Machine':<40}{'Slots':>7}{'Claimed':>9}{'Unclaimed':>11}{'Idle':>6}{'CPUs':>6}{'Memory':>9}")
+    for machine, node in sorted(status.nodes.items()):
+        print(f"  {machine:<40}{node['Slots']:>7}{node['Claimed']:>9}{node['Unclaimed']:>11}{node['Idle']:>6}{node['Cpus']:>6}{node['Memory']:>9}")
+
+def execute_condor_status_on_instances(ec2):
+    instance_ids, key_path = _select_ssh_targets(ec2)
+    if not instance_ids:
+        return
+
+    print(f"Executing condor_status on {len(instance_ids)} instance(s)...")
+    try:
+        pools, results = api.condor_status(ec2, instance_ids, key_path, on_line=print_line_sink)
+    except ApiError as e:
+        print(f"Error: {str(e)}")
+        return
+    for status in pools:
+        if status.instance_id is None:
+            _print_pool(f"All {len(pools) - 1} pools", status)
+        else:
+            _print_pool(f"Pool at {status.instance_id} ({status.host})", status)
+            _print_pool_nodes(status)
+    _print_command_results("condor_status", results)
+
+def watch_fleet(ec2, cloudwatch):
+    try:
+        query = prompt_query()
+    except ValueError as e:
+        print(f"Invalid filter: {str(e)}")
+        return
+    show_cpu = input("Show CPU usage? (y/N): ").strip().lower() == 'y'
+    try:
+        watch_instances(ec2, cloudwatch, query, show_cpu)
+    except Exception as e:
+        print(f"Error watching instances: {str(e)}")
@@ -0,0 +1,114 @@
+import os
+import threading
+from array import array
+from bisect import bisect_left
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "cloud-term-project", "metrics")
+DEFAULT_CAPACITY = 8 * 24 * 12  # a week of 5-minute datapoints per series, plus a day of slack
+REFETCH_PERIODS = 2  # the newest buckets may still be aggregating in CloudWatch
+
+class MetricStore:
+    # Each series (instance, metric, period) is kept as two array('d') columns
+    # of epoch timestamps and values, capped at `capacity` points, and written
+    # to disk as a flat file of doubles: [covered_from, covered_to, ts, value, ...].
+    # Reads and merges are serialized, so concurrent fetches (aws_utils.async_api)
+    # can share one store.
+
+    def __init__(self, directory=DEFAULT_STORE_DIR, capacity=DEFAULT_CAPACITY):
+        self.directory = directory
+        self.capacity = capacity
+        self._series = {}
+        self._lock = threading.RLock()
+
+    def _path(self, key):
+        instance_id, metric, period = key
+        return os.path.join(self.directory, f"{instance_id}.{metric}.{period}.bin")
+
+    def _load(self, key):
+        if key in self._series:
+            return self._series[key]
+        series = {'covered_from': None, 'covered_to': None,
+                  'timestamps': array('d'), 'values': array('d')}
+        path = self._path(key)
+        if os.path.exists(path):
+            data = array('d')
+            with open(path, 'rb') as file:
+                data.frombytes(file.read())
+            if len(data) >= 2:
+                series['covered_from'], series['covered_to'] = data[0], data[1]
+                series['timestamps'] = data[2::2]
+                series['values'] = data[3::2]
+        self._series[key] = series
+        return series
+
+    def _save(self, key, series):
+        os.makedirs(self.directory, exist_ok=True)
+        data = array('d', [series['covered_from'], series['covered_to']])
+        for timestamp, value in zip(series['timestamps'], series['values']):
+            data.append(timestamp)
+            data.append(value)
+        path = self._path(key)
+        with open(path + ".tmp", 'wb') as file:
+            data.tofile(file)
+        os.replace(path + ".tmp", path)
+
+    def missing_range(self, key, start, end):
+        # Returns the (start, end) epoch range that still has to be fetched to
+        # cover [start, end), or None if the store already covers it. The
+        # newest buckets are fetched again only together with newer data: a
+        # window ending inside the coverage is served as last fetched.
+        with self._lock:
+            series = self._load(key)
+            covered_from, covered_to = series['covered_from'], series['covered_to']
+        period = key[2]
+        if covered_from is None or start < covered_from - period:
+            return start, end
+        if end <= covered_to:
+            return None
+        return max(start, covered_to - REFETCH_PERIODS * period), end
+
+    def merge(self, key, fetched_from, fetched_to, timestamps, values):
+        with self._lock:
+            self._merge(key, fetched_from, fetched_to, timestamps, values)
+
+    def _merge(self, key, fetched_from, fetched_to, timestamps, values):
+        series = self._load(key)
+        points = {
+            timestamp: value
+            for timestamp, value in zip(series['timestamps'], series['values'])
+            if not fetched_from <= timestamp < fetched_to
+        }
+        points.update(zip(timestamps, values))
+        ordered = sorted(points.items())[-self.capacity:]
+        series['timestamps'] = array('d', (timestamp for timestamp, _ in ordered))
+        series['values'] = array('d', (value for _, value in ordered))
+
+        # Coverage is a single interval: a fetch that does not touch it starts
+        # a new one, so the hole in between is fetched again when asked for
+        if series['covered_from'] is None or not (series['covered_from'] <= fetched_to
+                                                  and fetched_from <= series['covered_to']):
+            covered_from, covered_to = fetched_from, fetched_to
+        else:
+            covered_from = min(series['covered_from'], fetched_from)
+            covered_to = max(series['covered_to'], fetched_to)
+        if len(points) > self.capacity:
+            covered_from = max(covered_from, series['timestamps'][0])
+        series['covered_from'] = covered_from
+        series['covered_to'] = covered_to
+        self._save(key, series)
+
+    def read(self, key, start, end):
+        with self._lock:
+            series = self._load(key)
+            timestamps, values = series['timestamps'], series['values']
+        first = bisect_left(timestamps, start)
+        last = bisect_left(timestamps, end)
+        return list(zip(timestamps[first:last], values[first:last]))
+
+_default_store = None
+
+def get_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = MetricStore()
+    return _default_store
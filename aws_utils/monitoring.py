@@ -1,47 +1,78 @@
-from datetime import datetime, timedelta
-from aws_utils.ec2_management import list_instances_with_choice, select_instance
+from datetime import datetime, timedelta, timezone
+from aws_utils.metric_store import get_store
 
-def get_cpu_usage(ec2, cloudwatch):
-    instances = list_instances_with_choice(ec2)
-    if not instances:
-        print("No instances available.")
-        return
+METRIC_QUERIES_PER_REQUEST = 500  # get_metric_data limit
+CPU_WINDOWS = {
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+    '1w': timedelta(weeks=1)
+}
 
-    instance_id = select_instance(instances)
-    if not instance_id:
-        print("No instance selected. Operation canceled.")
-        return
+def _cpu_query(query_id, instance_id, period=300):
+    return {
+        'Id': query_id,
+        'MetricStat': {
+            'Metric': {
+                'Namespace': 'AWS/EC2',
+                'MetricName': 'CPUUtilization',
+                'Dimensions': [
+                    {'Name': 'InstanceId', 'Value': instance_id}
+                ]
+            },
+            'Period': period,
+            'Stat': 'Average'
+        },
+        'ReturnData': True
+    }
 
-    try:
-        # Get CPU usage metrics from CloudWatch
-        response = cloudwatch.get_metric_data(
+def fetch_cpu_series(cloudwatch, instance_ids, start_time, end_time, period=300):
+    # Packs up to 500 instances into each get_metric_data request and follows
+    # NextToken. Returns {instance_id: (timestamps, values)} in ascending order.
+    series = {instance_id: ([], []) for instance_id in instance_ids}
+    paginator = cloudwatch.get_paginator('get_metric_data')
+    instance_ids = list(series)
+    for offset in range(0, len(instance_ids), METRIC_QUERIES_PER_REQUEST):
+        batch = instance_ids[offset:offset + METRIC_QUERIES_PER_REQUEST]
+        query_ids = {f"cpu{idx}": instance_id for idx, instance_id in enumerate(batch)}
+        pages = paginator.paginate(
             MetricDataQueries=[
-                {
-                    'Id': 'cpuUsage',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': 'AWS/EC2',
-                            'MetricName': 'CPUUtilization',
-                            'Dimensions': [
-                                {'Name': 'InstanceId', 'Value': instance_id}
-                            ]
-                        },
-                        'Period': 300,  # 5 minutes
-                        'Stat': 'Average'
-                    },
-                    'ReturnData': True
-                }
+                _cpu_query(query_id, instance_id, period)
+                for query_id, instance_id in query_ids.items()
             ],
-            StartTime=datetime.utcnow() - timedelta(hours=1),  # Last 1 hour
-            EndTime=datetime.utcnow()
+            StartTime=start_time,
+            EndTime=end_time,
+            ScanBy='TimestampAscending'
         )
+        for page in pages:
+            for result in page['MetricDataResults']:
+                timestamps, values = series[query_ids[result['Id']]]
+                timestamps.extend(result['Timestamps'])
+                values.extend(result['Values'])
+    return series
 
-        print(f"CPU usage for instance {instance_id} in the last hour:")
-        for result in response['MetricDataResults']:
-            if result['Values']:
-                for timestamp, value in zip(result['Timestamps'], result['Values']):
-                    print(f"Time: {timestamp}, CPU Utilization: {value}%")
-            else:
-                print("No CPU usage data available for the selected instance.")
-    except Exception as e:
-        print(f"Error fetching CPU usage data: {str(e)}")
+def fetch_cpu_history(cloudwatch, instance_ids, start_time, end_time, period=300, store=None):
+    # Serves the window from the local metric store and only asks CloudWatch
+    # for datapoints the store does not have yet. Instances needing the same
+    # range are fetched together. Returns {instance_id: [(epoch, value), ...]}.
+    store = store or get_store()
+    start, end = start_time.timestamp(), end_time.timestamp()
+    keys = {instance_id: (instance_id, 'CPUUtilization', period) for instance_id in instance_ids}
+
+    ranges = {}
+    for instance_id, key in keys.items():
+        missing = store.missing_range(key, start, end)
+        if missing:
+            ranges.setdefault(missing, []).append(instance_id)
+
+    for (fetch_from, fetch_to), ids in ranges.items():
+        series = fetch_cpu_series(
+            cloudwatch, ids,
+            datetime.fromtimestamp(fetch_from, timezone.utc),
+            datetime.fromtimestamp(fetch_to, timezone.utc),
+            period
+        )
+        for instance_id, (timestamps, values) in series.items():
+            store.merge(keys[instance_id], fetch_from, fetch_to,
+                        [timestamp.timestamp() for timestamp in timestamps], values)
+
+    return {instance_id: store.read(key, start, end) for instance_id, key in keys.items()}
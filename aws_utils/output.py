@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import sys
+from aws_utils.instrumentation import timed
+
+FORMATS = ('table', 'json', 'csv')
+DEFAULT_PAGE_ROWS = 50  # rows per screen in the paged view
+
+INSTANCE_COLUMNS = [
+    ('InstanceId', 'Instance ID'),
+    ('Name', 'Name'),
+    ('State', 'State'),
+    ('Type', 'Type'),
+    ('PublicIP', 'Public IP'),
+    ('PrivateIP', 'Private IP'),
+    ('Zone', 'Zone')
+]
+
+# Columns are (key, header) or (key, header, format spec). A column with a
+# format spec holds numbers: they are formatted with it and right-aligned.
+# Rows are dicts or anything else with a dict-style get(), such as
+# aws_utils.records.InstanceRecord.
+
+def _cells(values, spec):
+    if spec:
+        return ["" if value is None else value if isinstance(value, str) else format(value, spec)
+                for value in values]
+    return ["" if value is None else str(value) for value in values]
+
+def _render_table(rows, columns, numbered=False, start=0, stop=None, min_widths=None):
+    # Formats rows[start:stop] only and returns (text, widths). Widths fit the
+    # formatted rows and never shrink below min_widths, so a paged view keeps
+    # its columns steady while only formatting what is on screen. Work is done
+    # column by column, which keeps the per-cell overhead to a list comprehension.
+    stop = len(rows) if stop is None else min(stop, len(rows))
+    visible = rows[start:stop]
+    table = []  # (header, cells, right-aligned) per column
+    if numbered:
+        table.append(("No.", [str(number) for number in range(start + 1, stop + 1)], True))
+    for column in columns:
+        key, header = column[0], column[1]
+        spec = column[2] if len(column) > 2 else None
+        table.append((header, _cells([row.get(key) for row in visible], spec), spec is not None))
+
+    widths = []
+    padded = []
+    for idx, (header, cells, right) in enumerate(table):
+        width = max([len(header)] + [len(cell) for cell in cells])
+        if min_widths:
+            width = max(width, min_widths[idx])
+        widths.append(width)
+        pad = str.rjust if right else str.ljust
+        padded.append([pad(header, width)] + [pad(cell, width) for cell in cells])
+
+    lines = ["  ".join(line).rstrip() for line in zip(*padded)]
+    lines.insert(1, "-" * (sum(widths) + 2 * (len(widths) - 1)))
+    return "\n".join(lines) + "\n", widths
+
+def render_table(rows, columns, numbered=False, start=0, stop=None):
+    return _render_table(rows, columns, numbered, start, stop)[0]
+
+@timed('render')
+def write_rows(rows, columns, fmt='table', stream=None, numbered=False):
+    # The whole output is built in memory and written with a single call
+    stream = stream or sys.stdout
+    keys = [column[0] for column in columns]
+    if fmt == 'json':
+        stream.write(json.dumps([{key: row.get(key) for key in keys} for row in rows], indent=2, default=str) + "\n")
+    elif fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(keys)
+        writer.writerows(["" if row.get(key) is None else row.get(key) for key in keys] for row in rows)
+        stream.write(buffer.getvalue())
+    else:
+        stream.write(render_table(rows, columns, numbered))
+
+def page_table(rows, columns, numbered=False, page_rows=DEFAULT_PAGE_ROWS, stream=None, read=input,
+               start=0, widths=None):
+    # Paged view: only the screen being shown is formatted. start is the
+    # first row shown, widths the column widths to start from.
+    stream = stream or sys.stdout
+    while True:
+        stop = min(start + page_rows, len(rows))
+        with timed('render'):
+            text, widths = _render_table(rows, columns, numbered, start, stop, widths)
+        stream.write(text)
+        stream.flush()
+        answer = read(f"Rows {start + 1}-{stop} of {len(rows)}. "
+                      "Enter: next page, b: back, number: go to row, q: done ").strip().lower()
+        if answer == 'q':
+            return
+        if answer == 'b':
+            start = max(start - page_rows, 0)
+        elif answer.isdigit():
+            row = min(max(int(answer), 1), len(rows))
+            start = (row - 1) // page_rows * page_rows
+        elif stop >= len(rows):
+            return
+        else:
+            start = stop
+
+def show_table(rows, columns, numbered=False, page_rows=DEFAULT_PAGE_ROWS, stream=None):
+    # Interactive display: anything longer than a screen is paged when the
+    # output is a terminal, everything else is written in one go.
+    stream = stream or sys.stdout
+    if len(rows) > page_rows and stream.isatty():
+        page_table(rows, columns, numbered, page_rows, stream)
+    else:
+        write_rows(rows, columns, 'table', stream, numbered)
+
+class TableStream:
+    # Table drawn while its rows are still arriving, e.g. page by page from
+    # get_instances(on_page=...). Each add() prints just the new rows, with
+    # columns sized to what has been seen so far; when a later page needs
+    # wider columns the header is printed again at the new widths. Once the
+    # rows fill a screen on a terminal, printing stops and close() opens the
+    # paged view on the rest.
+
+    def __init__(self, columns, numbered=False, page_rows=DEFAULT_PAGE_ROWS, stream=None):
+        self.columns = columns
+        self.numbered = numbered
+        self.page_rows = page_rows
+        self.stream = stream or sys.stdout
+        self.rows = []
+        self.shown = 0
+        self.widths = None
+        self.paged = False
+
+    def add(self, rows):
+        self.rows.extend(rows)
+        if self.paged:
+            return
+        stop = len(self.rows)
+        if self.stream.isatty() and stop > self.page_rows:
+            self.paged = True
+            stop = self.page_rows
+            if stop <= self.shown:
+                return
+        with timed('render'):
+            text, widths = _render_table(self.rows, self.columns, self.numbered, self.shown, stop, self.widths)
+        if self.widths == widths:
+            text = text.split("\n", 2)[2]  # header and rule are already on screen
+        self.stream.write(text)
+        self.stream.flush()
+        self.widths = widths
+        self.shown = stop
+
+    def close(self, read=input):
+        # Pages through the rows that were not printed, if any
+        if self.paged and self.shown < len(self.rows):
+            answer = read(f"Rows 1-{self.shown} of {len(self.rows)}. Enter: next page, q: done ").strip().lower()
+            if answer != 'q':
+                page_table(self.rows, self.columns, self.numbered, self.page_rows, self.stream, read,
+                           start=self.shown, widths=self.widths)
@@ -0,0 +1,117 @@
+import re
+from fnmatch import fnmatchcase
+
+# Query terms are separated by spaces and combined with AND:
+#   state=running type=t3.* zone=ap-northeast-2a vpc=vpc-1234 name=condor-wk-*
+#   tag:Role=worker tag:Owner (tag present) id=i-0abc state!=terminated
+# Comma-separated values are alternatives (state=running,stopped) and values
+# may use * and ? wildcards. "all" matches everything, and "state:running"
+# is accepted as a shorthand for "state=running". Bare words are read as
+# shorthands too, so "all stopped t3.large in 2a" means
+# "state=stopped type=t3.large zone=*-2a": a state name, an instance type,
+# a zone or zone suffix, or an instance ID; "in" is ignored.
+FIELDS = {
+    'state': ('state', 'instance-state-name'),
+    'name': ('name', 'tag:Name'),
+    'type': ('type', 'instance-type'),
+    'zone': ('zone', 'availability-zone'),
+    'vpc': ('vpc_id', 'vpc-id'),
+    'id': ('instance_id', 'instance-id')
+}
+
+STATES = {'pending', 'running', 'shutting-down', 'terminated', 'stopping', 'stopped'}
+FILLER_WORDS = {'all', 'in'}
+SHORTHANDS = (
+    (re.compile(r'[a-z][a-z0-9-]*\d[a-z0-9-]*\.[a-z0-9*?]+'), 'type={}'),
+    (re.compile(r'[a-z]{2}(-[a-z]+)+-\d[a-z]'), 'zone={}'),
+    (re.compile(r'\d[a-z]'), 'zone=*-{}'),
+    (re.compile(r'i-[0-9a-f*?]+'), 'id={}')
+)
+
+def _expand_shorthand(token):
+    if token in STATES:
+        return 'state=' + token
+    for pattern, template in SHORTHANDS:
+        if pattern.fullmatch(token):
+            return template.format(token)
+    return token
+
+class InstanceQuery:
+    # `filters` is what describe_instances can evaluate server-side; every
+    # term is also kept in `terms` so the same query can run on cached records.
+
+    def __init__(self, terms, filters):
+        self.terms = terms
+        self.filters = filters
+
+    def __bool__(self):
+        # A query without terms ("all") selects everything, like no query
+        return bool(self.terms)
+
+    def matches(self, inst):
+        return all(_term_matches(term, inst) for term in self.terms)
+
+    def apply(self, instances):
+        return [inst for inst in instances if self.matches(inst)]
+
+def _record_value(key, inst):
+    if key.startswith('tag:'):
+        return inst.tag(key[len('tag:'):])
+    if key == 'name':
+        return inst.tag('Name')  # the record shows "N/A" for untagged instances
+    return getattr(inst, FIELDS[key][0])
+
+def _term_matches(term, inst):
+    key, negate, values = term
+    actual = _record_value(key, inst)
+    if values is None:
+        found = actual is not None
+    else:
+        found = actual is not None and any(fnmatchcase(actual, value) for value in values)
+    return found != negate
+
+def _server_filter(key, negate, values):
+    # EC2 filters cannot negate and only understand * and ? wildcards
+    if negate or (values and any('[' in value for value in values)):
+        return None
+    if key.startswith('tag:'):
+        if values is None:
+            return {'Name': 'tag-key', 'Values': [key[len('tag:'):]]}
+        return {'Name': key, 'Values': values}
+    return {'Name': FIELDS[key][1], 'Values': values}
+
+def parse_query(expression):
+    terms = []
+    filters = []
+    seen = set()
+    for token in expression.split():
+        if token in FILLER_WORDS:
+            continue
+        if token.startswith('state:'):
+            token = 'state=' + token[len('state:'):]
+        elif '=' not in token and not token.startswith('tag:'):
+            token = _expand_shorthand(token)
+
+        if '!=' in token:
+            key, _, value = token.partition('!=')
+            negate = True
+        else:
+            key, has_value, value = token.partition('=')
+            negate = False
+            if not has_value:
+                value = None
+        if key not in FIELDS and not (key.startswith('tag:') and len(key) > len('tag:')):
+            raise ValueError(f"Unknown query field: {key}")
+        if value is None and not key.startswith('tag:'):
+            raise ValueError(f"Missing value for {key}")
+        values = None if value is None else [item for item in value.split(',') if item]
+        if values == []:
+            raise ValueError(f"Missing value for {key}")
+
+        terms.append((key, negate, values))
+        server_filter = _server_filter(key, negate, values)
+        # A repeated field would be OR-ed by EC2, so later ones stay local
+        if server_filter and server_filter['Name'] not in seen:
+            seen.add(server_filter['Name'])
+            filters.append(server_filter)
+    return InstanceQuery(terms, filters)
@@ -0,0 +1,238 @@
+from sys import intern
+
+NOT_AVAILABLE = 'N/A'
+
+# Column key (as used by aws_utils.output and JSON/CSV output) -> attribute
+COLUMN_ATTRIBUTES = {
+    'InstanceId': 'instance_id',
+    'Name': 'name',
+    'State': 'state',
+    'Type': 'type',
+    'PublicIP': 'public_ip',
+    'PrivateIP': 'private_ip',
+    'Zone': 'zone',
+    'VpcId': 'vpc_id',
+    'Region': 'region'
+}
+
+class InstanceRecord:
+    # One row of the instance table. Slots instead of a per-instance dict, and
+    # the few distinct state/type/zone/VPC/region strings and tag keys are
+    # interned so 50k records share them. Tags are a tuple of (key, value).
+
+    __slots__ = ('instance_id', 'name', 'state', 'type', 'public_ip', 'private_ip',
+                 'zone', 'vpc_id', 'region', 'tags')
+
+    def __init__(self, instance_id, name, state, type, public_ip, private_ip, zone,
+                 vpc_id=None, tags=(), region=None):
+        self.instance_id = instance_id
+        self.name = name
+        self.state = intern(state)
+        self.type = intern(type)
+        self.public_ip = public_ip
+        self.private_ip = private_ip
+        self.zone = intern(zone)
+        self.vpc_id = vpc_id and intern(vpc_id)
+        self.region = region and intern(region)
+        self.tags = tags
+
+    @classmethod
+    def from_instance(cls, instance):
+        # Copies what the table needs out of a describe_instances instance
+        # dict, so the response itself can be released
+        tags = tuple((intern(tag['Key']), tag['Value']) for tag in instance.get('Tags', ()))
+        record = cls(
+            instance['InstanceId'],
+            NOT_AVAILABLE,
+            instance['State']['Name'],
+            instance.get('InstanceType', NOT_AVAILABLE),
+            instance.get('PublicIpAddress', NOT_AVAILABLE),
+            instance.get('PrivateIpAddress', NOT_AVAILABLE),
+            instance['Placement']['AvailabilityZone'],
+            instance.get('VpcId'),
+            tags
+        )
+        record.name = record.tag('Name', NOT_AVAILABLE)
+        return record
+
+    def tag(self, key, default=None):
+        for tag_key, value in self.tags:
+            if tag_key == key:
+                return value
+        return default
+
+    def get(self, key, default=None):
+        # Mapping-style read by column key, for the generic row writers
+        attribute = COLUMN_ATTRIBUTES.get(key)
+        return default if attribute is None else getattr(self, attribute)
+
+    def __repr__(self):
+        return f"InstanceRecord({self.instance_id!r}, {self.name!r}, {self.state!r})"
+
+class _Row:
+    # Base for the result records of aws_utils.api: slots, plus get() by
+    # column key through the subclass's COLUMNS so aws_utils.output can
+    # render them like InstanceRecords
+
+    __slots__ = ()
+    COLUMNS = {}
+
+    def get(self, key, default=None):
+        attribute = self.COLUMNS.get(key)
+        return default if attribute is None else getattr(self, attribute)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__[:3])
+        return f"{type(self).__name__}({fields})"
+
+class InstanceMatch(_Row):
+    # One hit of a name / ID / IP lookup; kind is exact, prefix, contains or fuzzy
+    __slots__ = ('instance', 'kind', 'score')
+
+    def __init__(self, instance, kind, score):
+        self.instance = instance
+        self.kind = kind
+        self.score = score
+
+    def get(self, key, default=None):
+        # The instance's columns plus Match
+        if key == 'Match':
+            return self.kind
+        return self.instance.get(key, default)
+
+class LifecycleResult(_Row):
+    __slots__ = ('instance_id', 'operation', 'error')
+    COLUMNS = {'InstanceId': 'instance_id', 'Result': 'result', 'Error': 'error'}
+
+    def __init__(self, instance_id, operation, error=None):
+        self.instance_id = instance_id
+        self.operation = operation
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def result(self):
+        return 'ok' if self.error is None else 'failed'
+
+class LaunchResult(_Row):
+    # run_instances may start fewer than requested (MinCount=1). errors holds
+    # the subnets that failed and the instances whose name tag could not be
+    # set; the instances in instance_ids are running either way.
+    __slots__ = ('instance_ids', 'requested', 'name', 'errors')
+
+    def __init__(self, instance_ids, requested, name, errors=()):
+        self.instance_ids = tuple(instance_ids)
+        self.requested = requested
+        self.name = name
+        self.errors = tuple(errors)
+
+    @property
+    def partial(self):
+        return len(self.instance_ids) < self.requested
+
+class Zone(_Row):
+    __slots__ = ('zone_id', 'zone_name', 'region', 'state')
+    COLUMNS = {'ZoneId': 'zone_id', 'ZoneName': 'zone_name', 'RegionName': 'region', 'State': 'state'}
+
+    def __init__(self, zone_id, zone_name, region, state=None):
+        self.zone_id = zone_id
+        self.zone_name = zone_name
+        self.region = region
+        self.state = state
+
+    @classmethod
+    def from_zone(cls, zone):
+        return cls(zone['ZoneId'], zone['ZoneName'], zone['RegionName'], zone.get('State'))
+
+class Region(_Row):
+    __slots__ = ('name', 'endpoint')
+    COLUMNS = {'RegionName': 'name', 'Endpoint': 'endpoint'}
+
+    def __init__(self, name, endpoint):
+        self.name = name
+        self.endpoint = endpoint
+
+class Image(_Row):
+    __slots__ = ('image_id', 'name', 'creation_date', 'owner_id', 'state', 'tags')
+    COLUMNS = {'ImageId': 'image_id', 'Name': 'name', 'CreationDate': 'creation_date',
+               'OwnerId': 'owner_id', 'State': 'state'}
+
+    def __init__(self, image_id, name, creation_date, owner_id, state, tags):
+        self.image_id = image_id
+        self.name = name
+        self.creation_date = creation_date
+        self.owner_id = owner_id
+        self.state = state
+        self.tags = tags
+
+    @classmethod
+    def from_catalog(cls, image):
+        # An entry of aws_utils.ami_catalog.AmiCatalog
+        return cls(image['ImageId'], image['Name'], image['CreationDate'], image['OwnerId'],
+                   image['State'], dict(image['Tags']))
+
+class CpuSummary(_Row):
+    # Statistics are None when the window has no datapoints. peak_start is
+    # the epoch of the busiest rolling window, anomalies the epochs of
+    # outlying datapoints and history the raw (epoch, value) series.
+    __slots__ = ('instance_id', 'name', 'p50', 'p95', 'p99', 'max', 'peak_start', 'peak_mean',
+                 'anomalies', 'points', 'history')
+    COLUMNS = {'InstanceId': 'instance_id', 'Name': 'name', 'P50': 'p50', 'P95': 'p95', 'P99': 'p99',
+               'Max': 'max', 'PeakMean': 'peak_mean', 'Anomalies': 'anomaly_count', 'Points': 'points'}
+
+    def __init__(self, instance_id, name, p50, p95, p99, max, peak_start, peak_mean, anomalies, points, history):
+        self.instance_id = instance_id
+        self.name = name
+        self.p50 = p50
+        self.p95 = p95
+        self.p99 = p99
+        self.max = max
+        self.peak_start = peak_start
+        self.peak_mean = peak_mean
+        self.anomalies = tuple(anomalies)
+        self.points = points
+        self.history = history
+
+    @property
+    def anomaly_count(self):
+        return len(self.anomalies)
+
+class CommandResult(_Row):
+    # exit_code is None when the command never ran or timed out; error says why
+    __slots__ = ('instance_id', 'host', 'exit_code', 'stdout', 'stderr', 'error')
+    COLUMNS = {'InstanceId': 'instance_id', 'Host': 'host', 'ExitCode': 'exit_code',
+               'Stdout': 'stdout', 'Stderr': 'stderr', 'Error': 'error'}
+
+    def __init__(self, instance_id, host, exit_code=None, stdout='', stderr='', error=None):
+        self.instance_id = instance_id
+        self.host = host
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.exit_code == 0
+
+    @classmethod
+    def from_result(cls, result):
+        # A result dict of aws_utils.ssh_utils.run_command_on_instances
+        return cls(result['InstanceId'], result['Host'], result['ExitCode'],
+                   result['Stdout'], result['Stderr'], result['Error'])
+
+class PoolStatus(_Row):
+    # condor_status aggregate (see aws_utils.condor) for one central manager,
+    # or for all of them when instance_id is None. change is the difference
+    # from the previous poll of the same source, None on the first one.
+    __slots__ = ('instance_id', 'host', 'counters', 'nodes', 'change')
+
+    def __init__(self, instance_id, host, pool, change=None):
+        self.instance_id = instance_id
+        self.host = host
+        self.counters = {key: value for key, value in pool.items() if key != 'Nodes'}
+        self.nodes = pool['Nodes']
+        self.change = change
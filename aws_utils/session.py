@@ -0,0 +1,72 @@
+import threading
+from aws_utils.credentials import load_config, load_credentials
+from aws_utils.instrumentation import instrument
+
+class LazyProxy:
+    # Stands in for a boto3 session or client and only builds the real object
+    # (importing boto3 on the way) the first time an attribute is used.
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+# Optional credentials.json settings and their defaults
+DEFAULT_SETTINGS = {
+    'max_pool_connections': 50,
+    'connect_timeout': 5,
+    'read_timeout': 30,
+    'max_attempts': 10
+}
+
+_session = None
+_clients = {}
+_factory_lock = threading.Lock()
+
+def client_config():
+    from botocore.config import Config
+    config = load_config()
+    settings = {name: config.get(name, default) for name, default in DEFAULT_SETTINGS.items()}
+    # Adaptive mode adds client-side rate limiting on top of retries, so
+    # bulk operations back off instead of failing on RequestLimitExceeded.
+    return Config(
+        max_pool_connections=settings['max_pool_connections'],
+        connect_timeout=settings['connect_timeout'],
+        read_timeout=settings['read_timeout'],
+        retries={'mode': 'adaptive', 'max_attempts': settings['max_attempts']}
+    )
+
+def get_session():
+    global _session
+    with _factory_lock:
+        if _session is None:
+            import boto3
+            aws_access_key_id, aws_secret_access_key, region = load_credentials()
+            _session = boto3.Session(
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                region_name=region
+            )
+        return _session
+
+def get_client(service, region=None):
+    # One shared client per (service, region). boto3 clients are thread-safe
+    # once built, but building them from a session is not, hence the lock.
+    session = get_session()
+    key = (service, region or session.region_name)
+    with _factory_lock:
+        if key not in _clients:
+            client = session.client(service, region_name=key[1], config=client_config())
+            # Every call through the factory feeds aws_utils.instrumentation
+            _clients[key] = instrument(client)
+        return _clients[key]
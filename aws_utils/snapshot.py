@@ -0,0 +1,337 @@
+import hashlib
+import os
+import threading
+import time
+from aws_utils.records import InstanceRecord
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser("~"), ".cache", "cloud-term-project", "inventory.sqlite3")
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    instance_id TEXT NOT NULL,
+    name TEXT,
+    state TEXT,
+    type TEXT,
+    public_ip TEXT,
+    private_ip TEXT,
+    zone TEXT,
+    vpc_id TEXT,
+    PRIMARY KEY (account, region, instance_id)
+);
+CREATE INDEX IF NOT EXISTS instances_state ON instances (account, region, state);
+CREATE INDEX IF NOT EXISTS instances_name ON instances (account, region, name);
+CREATE INDEX IF NOT EXISTS instances_type ON instances (account, region, type);
+CREATE INDEX IF NOT EXISTS instances_zone ON instances (account, region, zone);
+CREATE TABLE IF NOT EXISTS tags (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    instance_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (account, region, instance_id, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_key_value ON tags (account, region, key, value);
+CREATE TABLE IF NOT EXISTS images (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    owners TEXT NOT NULL,
+    image_id TEXT NOT NULL,
+    name TEXT,
+    creation_date TEXT,
+    owner_id TEXT,
+    state TEXT,
+    tags TEXT,
+    PRIMARY KEY (account, region, owners, image_id)
+);
+CREATE TABLE IF NOT EXISTS zones (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    zone_id TEXT NOT NULL,
+    zone_name TEXT,
+    state TEXT,
+    PRIMARY KEY (account, region, zone_id)
+);
+CREATE TABLE IF NOT EXISTS fetches (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (account, region, kind)
+);
+CREATE TABLE IF NOT EXISTS identities (
+    key_hash TEXT PRIMARY KEY,
+    account TEXT NOT NULL
+);
+"""
+
+# Query fields (aws_utils.query) that map onto an indexed instances column
+QUERY_COLUMNS = {
+    'state': 'i.state',
+    'name': 'i.name',
+    'type': 'i.type',
+    'zone': 'i.zone',
+    'vpc': 'i.vpc_id',
+    'id': 'i.instance_id'
+}
+
+INSTANCE_FIELDS = ('instance_id', 'name', 'state', 'type', 'public_ip', 'private_ip', 'zone', 'vpc_id')
+
+def _is_pattern(value):
+    return any(char in value for char in '*?[')
+
+def _value_clause(column, values):
+    # Exact values use = so the index applies; wildcards use GLOB, which has
+    # the same * and ? semantics (and case sensitivity) as fnmatchcase
+    clauses = [f"{column} GLOB ?" if _is_pattern(value) else f"{column} = ?" for value in values]
+    return "(" + " OR ".join(clauses) + ")", list(values)
+
+def _caller_account():
+    from aws_utils.session import get_client
+    return get_client('sts').get_caller_identity()['Account']
+
+class InventorySnapshot:
+    # Last known instances, tags, AMIs and zones per account and region in
+    # one SQLite file, so a new process can show the account before any API
+    # call and queries can run with no network at all.
+    #
+    # Rows are scoped to the account behind `access_key`. The account is
+    # looked up in the file by a hash of the key, and resolved with
+    # resolve_account() (sts:GetCallerIdentity by default) only when
+    # something is saved for a key seen for the first time, so reads stay
+    # offline. Without an access key the snapshot is unscoped.
+
+    def __init__(self, path=DEFAULT_DB_PATH, access_key=None, resolve_account=_caller_account):
+        self.path = os.path.expanduser(path)
+        self.access_key = access_key
+        self.resolve_account = resolve_account
+        self._account = None if access_key else ''
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        import sqlite3  # deferred: only needed once the snapshot is touched
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        with self._lock:
+            if not self._ready:
+                version = connection.execute("PRAGMA user_version").fetchone()[0]
+                if version != SCHEMA_VERSION:
+                    for table in ('instances', 'tags', 'images', 'zones', 'fetches', 'identities'):
+                        connection.execute(f"DROP TABLE IF EXISTS {table}")
+                    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                connection.execute("PRAGMA journal_mode = WAL")  # readers are not blocked by a reconcile
+                connection.executescript(SCHEMA)
+                self._ready = True
+        return connection
+
+    def account(self, connection, resolve=False):
+        # The account rows are scoped to, or None when it is not known yet
+        # and `resolve` is off. Cached for the life of the object.
+        if self._account is not None:
+            return self._account
+        key_hash = hashlib.sha256(self.access_key.encode()).hexdigest()
+        row = connection.execute("SELECT account FROM identities WHERE key_hash = ?", (key_hash,)).fetchone()
+        if row:
+            self._account = row[0]
+        elif resolve:
+            account = self.resolve_account()
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO identities VALUES (?, ?)", (key_hash, account))
+            self._account = account
+        return self._account
+
+    def _set_fetched(self, connection, account, region, kind, fetched_at):
+        connection.execute("INSERT OR REPLACE INTO fetches (account, region, kind, fetched_at) VALUES (?, ?, ?, ?)",
+                           (account, region, kind, fetched_at))
+
+    def _fetched(self, connection, account, region, kind):
+        row = connection.execute("SELECT fetched_at FROM fetches WHERE account = ? AND region = ? AND kind = ?",
+                                 (account, region, kind)).fetchone()
+        return row[0] if row else None
+
+    def fetched_at(self, region, kind='instances'):
+        connection = self._connect()
+        try:
+            account = self.account(connection)
+            return None if account is None else self._fetched(connection, account, region, kind)
+        finally:
+            connection.close()
+
+    def save_instances(self, region, instances, fetched_at=None):
+        # Replaces the region's instances and tags in one transaction
+        connection = self._connect()
+        try:
+            account = self.account(connection, resolve=True)
+            with connection:
+                connection.execute("DELETE FROM instances WHERE account = ? AND region = ?", (account, region))
+                connection.execute("DELETE FROM tags WHERE account = ? AND region = ?", (account, region))
+                connection.executemany(
+                    "INSERT INTO instances VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((account, region) + tuple(getattr(inst, field) for field in INSTANCE_FIELDS)
+                     for inst in instances)
+                )
+                connection.executemany(
+                    "INSERT INTO tags VALUES (?, ?, ?, ?, ?)",
+                    ((account, region, inst.instance_id, key, value) for inst in instances for key, value in inst.tags)
+                )
+                self._set_fetched(connection, account, region, 'instances', fetched_at or time.time())
+        finally:
+            connection.close()
+
+    def _records(self, connection, account, region, where="", params=()):
+        rows = connection.execute(
+            f"SELECT {', '.join('i.' + field for field in INSTANCE_FIELDS)} FROM instances i "
+            f"WHERE i.account = ? AND i.region = ?{where} ORDER BY i.rowid",
+            [account, region, *params]
+        ).fetchall()
+        if where:
+            # Only the tags of the selected rows
+            tag_rows = connection.execute(
+                "SELECT instance_id, key, value FROM tags WHERE account = ? AND region = ? AND instance_id IN "
+                f"(SELECT i.instance_id FROM instances i WHERE i.account = ? AND i.region = ?{where})",
+                [account, region, account, region, *params]
+            )
+        else:
+            tag_rows = connection.execute("SELECT instance_id, key, value FROM tags WHERE account = ? AND region = ?",
+                                          (account, region))
+        tags = {}
+        for instance_id, key, value in tag_rows:
+            tags.setdefault(instance_id, []).append((key, value))
+        return [InstanceRecord(*row, tags=tuple(tags.get(row[0], ()))) for row in rows]
+
+    def load_instances(self, region):
+        # (records, fetched_at), or (None, None) when the region was never saved
+        connection = self._connect()
+        try:
+            account = self.account(connection)
+            fetched_at = None if account is None else self._fetched(connection, account, region, 'instances')
+            if fetched_at is None:
+                return None, None
+            return self._records(connection, account, region), fetched_at
+        finally:
+            connection.close()
+
+    def query_instances(self, region, query=None):
+        # Terms SQLite can answer from its indexes narrow the rows first; the
+        # full query then runs on what is left, so results match a live scan
+        connection = self._connect()
+        try:
+            account = self.account(connection)
+            if account is None:
+                return []
+            clauses = []
+            params = []
+            for key, negate, values in (query.terms if query else ()):
+                if negate or (values and any('[' in value for value in values)):
+                    continue
+                if key.startswith('tag:'):
+                    # Evaluated once from tags_key_value, not per instance
+                    clause = ("i.instance_id IN (SELECT instance_id FROM tags "
+                              "WHERE account = ? AND region = ? AND key = ?")
+                    params += [account, region, key[len('tag:'):]]
+                    if values is not None:
+                        value_clause, value_params = _value_clause("value", values)
+                        clause += " AND " + value_clause
+                        params += value_params
+                    clauses.append(clause + ")")
+                else:
+                    value_clause, value_params = _value_clause(QUERY_COLUMNS[key], values)
+                    clauses.append(value_clause)
+                    params += value_params
+            where = "".join(" AND " + clause for clause in clauses)
+            instances = self._records(connection, account, region, where, params)
+        finally:
+            connection.close()
+        return query.apply(instances) if query else instances
+
+    def save_images(self, region, owners, images, fetched_at=None):
+        import json
+        owners = ",".join(owners)
+        connection = self._connect()
+        try:
+            account = self.account(connection, resolve=True)
+            with connection:
+                connection.execute("DELETE FROM images WHERE account = ? AND region = ? AND owners = ?",
+                                   (account, region, owners))
+                connection.executemany(
+                    "INSERT INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((account, region, owners, image['ImageId'], image['Name'], image['CreationDate'],
+                      image['OwnerId'], image['State'], json.dumps(image['Tags'])) for image in images)
+                )
+                self._set_fetched(connection, account, region, f"images:{owners}", fetched_at or time.time())
+        finally:
+            connection.close()
+
+    def load_images(self, region, owners):
+        # (image dicts as built by aws_utils.ami_catalog, fetched_at) or (None, None)
+        import json
+        owners = ",".join(owners)
+        connection = self._connect()
+        try:
+            account = self.account(connection)
+            fetched_at = None if account is None else self._fetched(connection, account, region, f"images:{owners}")
+            if fetched_at is None:
+                return None, None
+            rows = connection.execute(
+                "SELECT image_id, name, creation_date, owner_id, state, tags FROM images "
+                "WHERE account = ? AND region = ? AND owners = ?", (account, region, owners)
+            ).fetchall()
+        finally:
+            connection.close()
+        images = [
+            {'ImageId': image_id, 'Name': name, 'CreationDate': creation_date,
+             'OwnerId': owner_id, 'State': state, 'Tags': json.loads(tags)}
+            for image_id, name, creation_date, owner_id, state, tags in rows
+        ]
+        return images, fetched_at
+
+    def save_zones(self, region, zones, fetched_at=None):
+        connection = self._connect()
+        try:
+            account = self.account(connection, resolve=True)
+            with connection:
+                connection.execute("DELETE FROM zones WHERE account = ? AND region = ?", (account, region))
+                connection.executemany(
+                    "INSERT INTO zones VALUES (?, ?, ?, ?, ?)",
+                    ((account, region, zone['ZoneId'], zone['ZoneName'], zone.get('State')) for zone in zones)
+                )
+                self._set_fetched(connection, account, region, 'zones', fetched_at or time.time())
+        finally:
+            connection.close()
+
+    def load_zones(self, region):
+        # describe_availability_zones-shaped dicts, or None
+        connection = self._connect()
+        try:
+            account = self.account(connection)
+            if account is None or self._fetched(connection, account, region, 'zones') is None:
+                return None
+            rows = connection.execute(
+                "SELECT zone_id, zone_name, state FROM zones WHERE account = ? AND region = ? ORDER BY zone_name",
+                (account, region)
+            ).fetchall()
+        finally:
+            connection.close()
+        return [{'ZoneId': zone_id, 'RegionName': region, 'ZoneName': zone_name, 'State': state}
+                for zone_id, zone_name, state in rows]
+
+_default_path = DEFAULT_DB_PATH
+_default_snapshot = None
+
+def set_path(path):
+    # Where the shared snapshot lives; takes effect on the next get_snapshot()
+    global _default_path, _default_snapshot
+    _default_path = path
+    _default_snapshot = None
+
+def get_snapshot():
+    # Scoped to the account of the keys in credentials.json
+    global _default_snapshot
+    if _default_snapshot is None:
+        from aws_utils.credentials import load_config
+        _default_snapshot = InventorySnapshot(_default_path, load_config()['aws_access_key_id'])
+    return _default_snapshot
@@ -0,0 +1,126 @@
+import atexit
+import os
+import threading
+import time
+
+KEEPALIVE_INTERVAL = 30  # seconds between SSH keepalive packets
+IDLE_TIMEOUT = 300  # seconds before an unused connection is closed
+
+class SSHConnectionPool:
+    # Authenticated paramiko clients keyed by (host, username, key path), kept
+    # for the whole session so repeated commands open a new channel on an
+    # existing transport instead of doing a TCP + SSH handshake every time.
+
+    def __init__(self, keepalive=KEEPALIVE_INTERVAL, idle_timeout=IDLE_TIMEOUT):
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._key_locks = {}
+        self._retired = {}  # id(client) -> entry of discarded clients still running commands
+
+    def _key(self, host, username, key_path):
+        return host, username, os.path.abspath(key_path)
+
+    def _connect(self, host, username, key_path, timeout):
+        import paramiko
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            ssh.connect(
+                hostname=host,
+                username=username,
+                key_filename=key_path,
+                timeout=timeout,
+                banner_timeout=timeout,
+                auth_timeout=timeout
+            )
+        except Exception:
+            ssh.close()
+            raise
+        ssh.get_transport().set_keepalive(self.keepalive)
+        return ssh
+
+    def get_client(self, host, username, key_path, timeout=None):
+        # Returns (client, reused). A dead transport is replaced transparently.
+        # Every call must be paired with release(..., client) once the command
+        # is done.
+        self.evict_idle()
+        key = self._key(host, username, key_path)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._connections.get(key)
+            if entry:
+                transport = entry['client'].get_transport()
+                if transport is not None and transport.is_active():
+                    with self._lock:
+                        entry['active'] += 1
+                        entry['last_used'] = time.monotonic()
+                    return entry['client'], True
+                self._retire(key, entry['client'])
+            client = self._connect(host, username, key_path, timeout)
+            with self._lock:
+                self._connections[key] = {'client': client, 'last_used': time.monotonic(), 'active': 1}
+            return client, False
+
+    def release(self, host, username, key_path, client):
+        closing = None
+        with self._lock:
+            entry = self._connections.get(self._key(host, username, key_path))
+            if entry is None or entry['client'] is not client:
+                entry = self._retired.get(id(client))
+            if entry:
+                entry['active'] = max(entry['active'] - 1, 0)
+                entry['last_used'] = time.monotonic()
+                if not entry['active'] and self._retired.get(id(client)) is entry:
+                    closing = self._retired.pop(id(client))
+        if closing:
+            closing['client'].close()
+
+    def discard(self, host, username, key_path, client):
+        # Drops a broken client from the pool. Other threads may still be
+        # running commands on it, so it is closed when the last of them
+        # releases it; new get_client() calls connect afresh.
+        self._retire(self._key(host, username, key_path), client)
+
+    def _retire(self, key, client):
+        closing = None
+        with self._lock:
+            entry = self._connections.get(key)
+            if entry is None or entry['client'] is not client:
+                return
+            del self._connections[key]
+            if entry['active']:
+                self._retired[id(client)] = entry
+            else:
+                closing = entry
+        if closing:
+            closing['client'].close()
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, entry in self._connections.items()
+                    if not entry['active'] and now - entry['last_used'] > self.idle_timeout]
+            entries = [self._connections.pop(key) for key in idle]
+        for entry in entries:
+            entry['client'].close()
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._connections.values()) + list(self._retired.values())
+            self._connections.clear()
+            self._retired.clear()
+        for entry in entries:
+            entry['client'].close()
+
+_default_pool = None
+
+def get_pool():
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = SSHConnectionPool()
+        atexit.register(_default_pool.close_all)
+    return _default_pool
@@ -1,102 +1,132 @@
-import subprocess
-import paramiko
-import os
-from aws_utils.ec2_management import list_instances_with_choice, select_instance
+import select
+import threading
+import time
+from collections import deque
+from aws_utils.ssh_pool import get_pool
 
-def ssh_to_instance(ec2):
-    instances = list_instances_with_choice(ec2)
-    if not instances:
-        print("No instances available for SSH access.")
-        return
+SSH_USERNAME = "ec2-user"  # Update if using a different default username
+SSH_WORKERS = 16
+SSH_TIMEOUT = 30  # seconds, applied to connect, auth and each read
+OUTPUT_TAIL_LINES = 200  # lines of each stream kept in a command result
+MAX_LINE_BYTES = 64 * 1024  # longer lines are emitted in pieces
+READ_CHUNK = 32 * 1024
 
-    instance_id = select_instance(instances)
-    if not instance_id:
-        print("No instance selected. Operation canceled.")
-        return
+_print_lock = threading.Lock()
 
+def _open_command(pool, host, command, key_path, username, timeout):
+    import paramiko
+    ssh, reused = pool.get_client(host, username, key_path, timeout)
     try:
-        response = ec2.describe_instances(InstanceIds=[instance_id])
-        instance = response['Reservations'][0]['Instances'][0]
-        public_ip = instance.get('PublicIpAddress')
-
-        if not public_ip:
-            print(f"Instance {instance_id} does not have a public IP address.")
-            return
+        return ssh, ssh.exec_command(command, timeout=timeout)
+    except paramiko.SSHException:
+        pool.discard(host, username, key_path, ssh)
+        pool.release(host, username, key_path, ssh)
+        if not reused:
+            raise
+    # A pooled transport can die between keepalives; reconnect once.
+    # Only opening the channel is retried, never a command that started.
+    ssh, _ = pool.get_client(host, username, key_path, timeout)
+    try:
+        return ssh, ssh.exec_command(command, timeout=timeout)
+    except paramiko.SSHException:
+        pool.discard(host, username, key_path, ssh)
+        pool.release(host, username, key_path, ssh)
+        raise
 
-        print(f"Selected instance {instance_id} with public IP: {public_ip}")
-        key_path = input("Enter the path to your private key file (.pem): ").strip()
-        if not os.path.exists(key_path):
-            print(f"Key file {key_path} does not exist.")
-            return
+def print_line_sink(instance_id, host, stream, line):
+    with _print_lock:
+        marker = "!" if stream == 'stderr' else " "
+        print(f"[{instance_id}]{marker} {line}")
 
-        ssh_command = f"ssh -i {key_path} ec2-user@{public_ip}"
-        print(f"To SSH into the instance, the following command will be executed:")
-        print(ssh_command)
-        
-        run_ssh = input("Do you want to execute this SSH command now? (y/n): ").strip().lower()
-        if run_ssh == "y":
-            try:
-                subprocess.run(ssh_command, shell=True, check=True)
-                print("SSH connection established successfully.")
-            except subprocess.CalledProcessError as e:
-                print(f"Error executing SSH command: {e}")
-    except Exception as e:
-        print(f"Error retrieving instance details: {str(e)}")
+def _stream_channel(channel, on_line, timeout):
+    # Drains stdout and stderr as data arrives, so neither stream can stall
+    # the other, and hands complete lines to on_line(stream, line). Only the
+    # last OUTPUT_TAIL_LINES lines of each stream are kept.
+    tails = {'stdout': deque(maxlen=OUTPUT_TAIL_LINES), 'stderr': deque(maxlen=OUTPUT_TAIL_LINES)}
+    partial = {'stdout': b'', 'stderr': b''}
+    readers = {'stdout': (channel.recv_ready, channel.recv),
+               'stderr': (channel.recv_stderr_ready, channel.recv_stderr)}
 
-def execute_condor_status_on_instances(ec2):
-    instances = list_instances_with_choice(ec2)
-    if not instances:
-        print("No instances available.")
-        return
+    def emit(stream, data, final=False):
+        data = partial[stream] + data
+        *lines, rest = data.split(b'\n')
+        if final and rest:
+            lines.append(rest)
+            rest = b''
+        while len(rest) > MAX_LINE_BYTES:
+            lines.append(rest[:MAX_LINE_BYTES])
+            rest = rest[MAX_LINE_BYTES:]
+        partial[stream] = rest
+        for line in lines:
+            text = line.decode(errors='replace').rstrip('\r')
+            tails[stream].append(text)
+            if on_line:
+                on_line(stream, text)
 
-    instance_id = select_instance(instances)
-    if not instance_id:
-        print("No instance selected. Operation canceled.")
-        return
+    last_activity = time.monotonic()
+    while True:
+        received = False
+        for stream, (ready, recv) in readers.items():
+            if ready():
+                data = recv(READ_CHUNK)
+                if data:
+                    emit(stream, data)
+                    received = True
+        if received:
+            last_activity = time.monotonic()
+            continue
+        if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+            break
+        if timeout is not None and time.monotonic() - last_activity > timeout:
+            channel.close()
+            raise TimeoutError(f"No output for {timeout} seconds")
+        select.select([channel], [], [], 0.5)
 
-    try:
-        response = ec2.describe_instances(InstanceIds=[instance_id])
-        instance = response['Reservations'][0]['Instances'][0]
-        public_ip = instance.get('PublicIpAddress')
+    for stream in readers:
+        emit(stream, b'', final=True)
+    return '\n'.join(tails['stdout']), '\n'.join(tails['stderr']), channel.recv_exit_status()
 
-        if not public_ip:
-            print(f"Instance {instance_id} does not have a public IP address.")
-            return
+def _run_remote_command(instance_id, host, command, key_path, username, timeout, on_line):
+    import paramiko
+    result = {'Host': host, 'ExitCode': None, 'Stdout': '', 'Stderr': '', 'Error': None}
+    pool = get_pool()
 
-        print(f"Selected instance {instance_id} with public IP: {public_ip}")
-        key_path = input("Enter the path to your private key file (.pem): ").strip()
-        if not os.path.exists(key_path):
-            print(f"Key file {key_path} does not exist.")
-            return
+    def sink(stream, line):
+        on_line(instance_id, host, stream, line)
 
-        # SSH connection
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        ssh, (stdin, stdout, stderr) = _open_command(pool, host, command, key_path, username, timeout)
         try:
-            ssh.connect(
-                hostname=public_ip,
-                username="ec2-user",  # Update if using a different default username
-                key_filename=key_path
-            )
-            print("Connected successfully. Executing condor_status...")
-            
-            # Execute condor_status
-            stdin, stdout, stderr = ssh.exec_command("condor_status")
-            output = stdout.read().decode()
-            error = stderr.read().decode()
-            
-            if output:
-                print("\nOutput of condor_status command:\n")
-                print(output)
-            if error:
-                print("\nError output of condor_status command:\n")
-                print(error)
-
-        except paramiko.AuthenticationException:
-            print("Authentication failed. Please check your private key and username.")
-        except paramiko.SSHException as e:
-            print(f"SSH connection error: {e}")
+            result['Stdout'], result['Stderr'], result['ExitCode'] = _stream_channel(
+                stdout.channel, sink if on_line else None, timeout)
+        except TimeoutError as e:
+            result['Error'] = str(e)
+        except (paramiko.SSHException, OSError):
+            pool.discard(host, username, key_path, ssh)
+            raise
         finally:
-            ssh.close()
-    except Exception as e:
-        print(f"Error retrieving instance details or executing command: {str(e)}")
+            pool.release(host, username, key_path, ssh)
+    except paramiko.AuthenticationException:
+        result['Error'] = "Authentication failed. Please check your private key and username."
+    except (paramiko.SSHException, OSError) as e:
+        result['Error'] = f"SSH connection error: {e}"
+    return result
+
+def run_command_on_instances(targets, command, key_path, username=SSH_USERNAME,
+                             max_workers=SSH_WORKERS, timeout=SSH_TIMEOUT, on_line=None):
+    # targets maps instance ID -> host. Commands run concurrently on a bounded
+    # pool; one result dict per instance is returned in the order of targets.
+    # Output lines are passed to on_line(instance_id, host, stream, line) as
+    # they arrive; results keep only the tail of each stream.
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_run_remote_command, instance_id, host, command, key_path, username, timeout, on_line): instance_id
+            for instance_id, host in targets.items()
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            result['InstanceId'] = futures[future]
+            results[futures[future]] = result
+    return [results[instance_id] for instance_id in targets]
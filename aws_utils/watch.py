@@ -0,0 +1,233 @@
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from aws_utils import inventory
+from aws_utils.ec2_management import get_instances
+from aws_utils.monitoring import fetch_cpu_series
+
+MIN_INTERVAL = 2  # seconds between polls while something is changing
+MAX_INTERVAL = 30  # seconds between polls once the fleet is quiet
+BACKOFF = 1.5  # interval growth per poll without changes
+CPU_REFRESH = 60  # CloudWatch publishes 5-minute datapoints; no point asking more often
+CPU_LOOKBACK = timedelta(minutes=15)
+
+def fetch_status(ec2):
+    # {instance_id: (state, system status, instance status)} for every
+    # instance, stopped ones included, from paginated describe_instance_status
+    paginator = ec2.get_paginator('describe_instance_status')
+    snapshot = {}
+    for page in paginator.paginate(IncludeAllInstances=True, PaginationConfig={'PageSize': 1000}):
+        for status in page['InstanceStatuses']:
+            snapshot[status['InstanceId']] = (
+                status['InstanceState']['Name'],
+                status.get('SystemStatus', {}).get('Status', '-'),
+                status.get('InstanceStatus', {}).get('Status', '-')
+            )
+    return snapshot
+
+def diff_snapshots(previous, current):
+    # Instance IDs whose status changed, appeared or disappeared
+    return {
+        'changed': sorted(instance_id for instance_id in current.keys() & previous.keys()
+                          if current[instance_id] != previous[instance_id]),
+        'added': sorted(current.keys() - previous.keys()),
+        'removed': sorted(previous.keys() - current.keys())
+    }
+
+def next_interval(interval, changed, pending):
+    # Poll fast while anything moves or is mid-transition, back off otherwise
+    if changed or pending:
+        return MIN_INTERVAL
+    return min(interval * BACKOFF, MAX_INTERVAL)
+
+class FleetWatch:
+    # Poll state shared by the curses and the line-mode views
+
+    def __init__(self, ec2, cloudwatch=None, query=None, show_cpu=False):
+        self.ec2 = ec2
+        self.cloudwatch = cloudwatch
+        self.query = query
+        self.show_cpu = show_cpu and cloudwatch is not None
+        self.snapshot = {}
+        self.names = {}
+        self.watched = None
+        self.cpu = {}
+        self.order = []
+        self.recent = set()
+        self.interval = MIN_INTERVAL
+        self.polls = 0
+        self.polled_at = 0.0
+        self.cpu_at = 0.0
+        self.error = None
+
+    def _refresh_names(self, refresh=False):
+        instances = get_instances(self.ec2, refresh=refresh)
+        self.names = {inst.instance_id: inst.name for inst in instances}
+        self.watched = None if self.query is None else {
+            inst.instance_id for inst in self.query.apply(instances)
+        }
+
+    def _refresh_cpu(self):
+        running = [instance_id for instance_id, status in self.snapshot.items() if status[0] == 'running']
+        end_time = datetime.now(timezone.utc)
+        series = fetch_cpu_series(self.cloudwatch, running, end_time - CPU_LOOKBACK, end_time) if running else {}
+        self.cpu = {instance_id: values[-1] for instance_id, (_, values) in series.items() if values}
+        self.cpu_at = time.monotonic()
+
+    def poll(self):
+        # Returns the diff against the previous snapshot
+        if not self.names:
+            self._refresh_names()
+        try:
+            current = fetch_status(self.ec2)
+            self.error = None
+        except Exception as e:
+            self.error = str(e)
+            self.polled_at = time.monotonic()
+            self.interval = MAX_INTERVAL
+            return {'changed': [], 'added': [], 'removed': []}
+        if current.keys() - self.names.keys():
+            self._refresh_names(refresh=True)  # launched since the last listing
+        if self.watched is not None:
+            current = {instance_id: status for instance_id, status in current.items() if instance_id in self.watched}
+
+        changes = diff_snapshots(self.snapshot, current) if self.polls else {
+            'changed': [], 'added': sorted(current), 'removed': []
+        }
+        self.polls += 1
+        self.snapshot = current
+        if changes['added'] or changes['removed'] or not self.order:
+            self.order = sorted(current, key=lambda instance_id: (self.names.get(instance_id, ''), instance_id))
+        self.recent = set(changes['changed']) | (set(changes['added']) if self.polls > 1 else set())
+        if changes['changed']:
+            # Listings elsewhere re-describe these instead of trusting the cache
+            inventory.invalidate(self.ec2, changes['changed'])
+
+        pending = any(status[0] in inventory.TRANSITIONAL_STATES for status in current.values())
+        # The first poll's "added" is the whole fleet, not a change
+        moved = changes['changed'] or (self.polls > 1 and changes['added'])
+        self.interval = next_interval(self.interval, moved, pending)
+        self.polled_at = time.monotonic()
+        if self.show_cpu and time.monotonic() - self.cpu_at >= CPU_REFRESH:
+            try:
+                self._refresh_cpu()
+            except Exception as e:
+                self.error = f"CPU: {str(e)}"
+        return changes
+
+    def poll_now(self):
+        self.polled_at = 0.0
+
+    def due(self):
+        return time.monotonic() - self.polled_at >= self.interval
+
+    def row(self, instance_id, name_width=24):
+        state, system, status = self.snapshot.get(instance_id, ('gone', '-', '-'))
+        marker = "*" if instance_id in self.recent else " "
+        line = f"{marker}{instance_id:<20} {self.names.get(instance_id, '?')[:name_width]:<{name_width}} {state:<14}"
+        if self.show_cpu:
+            cpu = self.cpu.get(instance_id)
+            line += f" {'-' if cpu is None else f'{cpu:.1f}':>6}"
+        return line + f" {system:<17} {status}"
+
+    def header(self, name_width=24):
+        line = f" {'Instance ID':<20} {'Name':<{name_width}} {'State':<14}"
+        if self.show_cpu:
+            line += f" {'CPU %':>6}"
+        return line + f" {'System':<17} {'Status'}"
+
+    def status_line(self):
+        counts = {}
+        for state, _, _ in self.snapshot.values():
+            counts[state] = counts.get(state, 0) + 1
+        summary = ", ".join(f"{count} {state}" for state, count in sorted(counts.items()))
+        line = (f"{datetime.now().strftime('%H:%M:%S')}  {len(self.snapshot)} instance(s): {summary or 'none'}"
+                f"  next poll in {max(self.interval - (time.monotonic() - self.polled_at), 0):.0f}s")
+        return line + (f"  error: {self.error}" if self.error else "")
+
+def _run_curses(watch):
+    import curses
+
+    def view(screen):
+        curses.curs_set(0)
+        screen.timeout(250)  # getch() wait, so the clock and countdown keep moving
+        drawn = {}
+        top = 0
+        while True:
+            if watch.due():
+                watch.poll()
+            height, width = screen.getmaxyx()
+            body = max(height - 4, 1)
+            top = max(0, min(top, len(watch.order) - body))
+            lines = [watch.status_line(), "q: quit  c: CPU  r: poll now  arrows/PgUp/PgDn: scroll",
+                     watch.header(), "-" * (width - 1)]
+            lines += [watch.row(instance_id) for instance_id in watch.order[top:top + body]]
+            lines += [""] * (height - len(lines))
+            # Only rows whose text differs from what is on screen are rewritten
+            for y, text in enumerate(lines[:height]):
+                text = text[:width - 1]
+                if drawn.get(y) != text:
+                    screen.move(y, 0)
+                    screen.clrtoeol()
+                    screen.addstr(y, 0, text, curses.A_BOLD if text.startswith("*") else curses.A_NORMAL)
+                    drawn[y] = text
+            screen.refresh()
+
+            key = screen.getch()
+            if key in (ord('q'), 27):
+                return
+            if key == ord('r'):
+                watch.poll_now()
+            elif key == ord('c') and watch.cloudwatch is not None:
+                watch.show_cpu = not watch.show_cpu
+                watch.cpu_at = 0.0
+                watch.poll_now()
+            elif key == curses.KEY_DOWN:
+                top += 1
+            elif key == curses.KEY_UP:
+                top -= 1
+            elif key == curses.KEY_NPAGE:
+                top += body
+            elif key == curses.KEY_PPAGE:
+                top -= body
+            elif key == curses.KEY_RESIZE:
+                drawn.clear()
+                screen.clear()
+
+    curses.wrapper(view)
+
+def _run_lines(watch, stream=None, max_polls=None):
+    # For pipes and terminals without curses: the full table once, then only
+    # the rows that changed on each poll
+    stream = stream or sys.stdout
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        if polls:
+            time.sleep(max(watch.interval - (time.monotonic() - watch.polled_at), 0))
+        changes = watch.poll()
+        polls += 1
+        if polls == 1:
+            lines = [watch.status_line(), watch.header()] + [watch.row(instance_id) for instance_id in watch.order]
+        else:
+            ids = changes['changed'] + changes['added'] + changes['removed']
+            if not ids and not watch.error:
+                continue
+            lines = [watch.status_line()] + [watch.row(instance_id) for instance_id in ids]
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+
+def watch_instances(ec2, cloudwatch=None, query=None, show_cpu=False, max_polls=None):
+    # Curses view on a terminal, line mode otherwise. Ctrl+C stops either.
+    watch = FleetWatch(ec2, cloudwatch, query, show_cpu)
+    try:
+        if sys.stdout.isatty() and max_polls is None:
+            try:
+                import curses  # noqa: F401  (missing on Windows without windows-curses)
+            except ImportError:
+                _run_lines(watch)
+            else:
+                _run_curses(watch)
+        else:
+            _run_lines(watch, max_polls=max_polls)
+    except KeyboardInterrupt:
+        pass
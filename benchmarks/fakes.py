@@ -0,0 +1,206 @@
+# In-memory stand-ins for the boto3 ec2 and cloudwatch clients, shaped like
+# the real responses closely enough for aws_utils to run against them offline.
+# Only the operations and paginators aws_utils calls are implemented.
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from fnmatch import fnmatchcase
+
+ZONES = ('ap-northeast-2a', 'ap-northeast-2b', 'ap-northeast-2c', 'ap-northeast-2d')
+TYPES = ('t2.micro', 't3.small', 't3.large', 'm5.xlarge', 'c5.2xlarge')
+STATES = ('running',) * 6 + ('stopped',) * 3 + ('pending', 'stopping')
+ROLES = ('master', 'worker', 'submit')
+MAX_RESULTS = 1000  # describe_instances page size cap
+MAX_DATAPOINTS = 100800  # get_metric_data datapoints per page
+
+class FakeClientError(Exception):
+    # Carries `response` like botocore's ClientError, so error codes are read the same way
+    def __init__(self, code, message=""):
+        super().__init__(f"{code}: {message}" if message else code)
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+class _Meta:
+    def __init__(self, region_name):
+        self.region_name = region_name
+
+class _Paginator:
+    def __init__(self, pages):
+        self._pages = pages
+
+    def paginate(self, **kwargs):
+        return self._pages(**kwargs)
+
+class _FakeClient:
+    def __init__(self, region_name, latency_ms):
+        self.meta = _Meta(region_name)
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def _call(self):
+        # Simulated round trip per request, so page counts show up in timings
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_paginator(self, operation):
+        return _Paginator(getattr(self, f"_paginate_{operation}"))
+
+def make_fleet(size, seed=0):
+    # Raw describe_instances instance dicts for a synthetic account
+    rng = random.Random(seed)
+    fleet = []
+    for idx in range(size):
+        role = ROLES[idx % len(ROLES)]
+        instance = {
+            'InstanceId': f"i-{idx:017x}",
+            'InstanceType': rng.choice(TYPES),
+            'State': {'Name': rng.choice(STATES)},
+            'Placement': {'AvailabilityZone': rng.choice(ZONES)},
+            'PrivateIpAddress': f"10.{idx >> 16 & 255}.{idx >> 8 & 255}.{idx & 255}",
+            'VpcId': f"vpc-{idx % 4:08x}",
+            'Tags': [{'Key': 'Name', 'Value': f"condor-{role}-{idx}"}, {'Key': 'Role', 'Value': role}]
+        }
+        if instance['State']['Name'] == 'running':
+            instance['PublicIpAddress'] = f"3.{idx >> 16 & 255}.{idx >> 8 & 255}.{idx & 255}"
+        fleet.append(instance)
+    return fleet
+
+def _filter_value(instance, name):
+    if name == 'instance-state-name':
+        return [instance['State']['Name']]
+    if name == 'instance-type':
+        return [instance['InstanceType']]
+    if name == 'availability-zone':
+        return [instance['Placement']['AvailabilityZone']]
+    if name == 'vpc-id':
+        return [instance.get('VpcId')]
+    if name == 'instance-id':
+        return [instance['InstanceId']]
+    if name == 'tag-key':
+        return [tag['Key'] for tag in instance.get('Tags', [])]
+    if name.startswith('tag:'):
+        return [tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == name[len('tag:'):]]
+    raise FakeClientError("InvalidParameterValue", f"Unsupported filter: {name}")
+
+def _matches(instance, filters):
+    return all(
+        any(value is not None and fnmatchcase(value, pattern)
+            for value in _filter_value(instance, flt['Name']) for pattern in flt['Values'])
+        for flt in filters
+    )
+
+class FakeEC2(_FakeClient):
+    def __init__(self, fleet, region_name='ap-northeast-2', latency_ms=0):
+        super().__init__(region_name, latency_ms)
+        self.instances = {instance['InstanceId']: instance for instance in fleet}
+
+    def _select(self, InstanceIds=None, Filters=None):
+        if InstanceIds:
+            missing = [instance_id for instance_id in InstanceIds if instance_id not in self.instances]
+            if missing:
+                raise FakeClientError("InvalidInstanceID.NotFound", ", ".join(missing))
+            instances = [self.instances[instance_id] for instance_id in InstanceIds]
+        else:
+            instances = list(self.instances.values())
+        return [instance for instance in instances if _matches(instance, Filters or [])]
+
+    def _paginate_describe_instances(self, InstanceIds=None, Filters=None, PaginationConfig=None):
+        page_size = min((PaginationConfig or {}).get('PageSize') or MAX_RESULTS, MAX_RESULTS)
+        instances = self._select(InstanceIds, Filters)
+        for offset in range(0, max(len(instances), 1), page_size):
+            self._call()
+            # One instance per reservation, as with individual run_instances calls
+            yield {'Reservations': [{'Instances': [instance]} for instance in instances[offset:offset + page_size]]}
+
+    def _paginate_describe_instance_status(self, InstanceIds=None, IncludeAllInstances=False, PaginationConfig=None):
+        page_size = min((PaginationConfig or {}).get('PageSize') or MAX_RESULTS, MAX_RESULTS)
+        instances = [instance for instance in self._select(InstanceIds)
+                     if IncludeAllInstances or instance['State']['Name'] == 'running']
+        for offset in range(0, max(len(instances), 1), page_size):
+            self._call()
+            yield {'InstanceStatuses': [
+                {'InstanceId': instance['InstanceId'],
+                 'AvailabilityZone': instance['Placement']['AvailabilityZone'],
+                 'InstanceState': instance['State'],
+                 'SystemStatus': {'Status': 'ok' if instance['State']['Name'] == 'running' else 'not-applicable'},
+                 'InstanceStatus': {'Status': 'ok' if instance['State']['Name'] == 'running' else 'not-applicable'}}
+                for instance in instances[offset:offset + page_size]
+            ]}
+
+    def describe_instances(self, **kwargs):
+        return next(self._paginate_describe_instances(**kwargs))
+
+    def _transition(self, InstanceIds, state):
+        self._call()
+        if len(InstanceIds) > MAX_RESULTS:
+            raise FakeClientError("InvalidParameterValue", "Too many instance IDs in one request")
+        for instance in self._select(InstanceIds):
+            instance['State'] = {'Name': state}
+        return {}
+
+    def start_instances(self, InstanceIds):
+        return self._transition(InstanceIds, 'pending')
+
+    def stop_instances(self, InstanceIds):
+        return self._transition(InstanceIds, 'stopping')
+
+    def reboot_instances(self, InstanceIds):
+        return self._transition(InstanceIds, 'running')
+
+    def terminate_instances(self, InstanceIds):
+        return self._transition(InstanceIds, 'shutting-down')
+
+class FakeCloudWatch(_FakeClient):
+    # CPUUtilization for every instance is a deterministic wave with a spike,
+    # so repeated runs fetch identical series.
+
+    def __init__(self, region_name='ap-northeast-2', latency_ms=0):
+        super().__init__(region_name, latency_ms)
+
+    def _series(self, instance_id, start_time, end_time, period):
+        seed = int(instance_id[2:], 16)
+        first = math.ceil(start_time.timestamp() / period) * period
+        timestamps, values = [], []
+        for epoch in range(first, int(end_time.timestamp()), period):
+            value = 40 + 30 * math.sin(epoch / 3600 + seed)
+            if (epoch // period + seed) % 97 == 0:
+                value = 99.0
+            timestamps.append(datetime.fromtimestamp(epoch, timezone.utc))
+            values.append(round(value, 2))
+        return timestamps, values
+
+    def _paginate_get_metric_data(self, MetricDataQueries, StartTime, EndTime, ScanBy='TimestampDescending'):
+        results = []
+        for query in MetricDataQueries:
+            stat = query['MetricStat']
+            instance_id = stat['Metric']['Dimensions'][0]['Value']
+            timestamps, values = self._series(instance_id, StartTime, EndTime, stat['Period'])
+            if ScanBy == 'TimestampDescending':
+                timestamps.reverse()
+                values.reverse()
+            results.append((query['Id'], timestamps, values))
+
+        # Pages hold at most MAX_DATAPOINTS; a series may continue on the next page
+        page, budget = [], MAX_DATAPOINTS
+        for query_id, timestamps, values in results:
+            offset = 0
+            while True:
+                take = min(budget, len(timestamps) - offset)
+                page.append({'Id': query_id, 'Label': 'CPUUtilization', 'StatusCode': 'Complete',
+                             'Timestamps': timestamps[offset:offset + take], 'Values': values[offset:offset + take]})
+                offset += take
+                budget -= take
+                if budget == 0:
+                    self._call()
+                    yield {'MetricDataResults': page}
+                    page, budget = [], MAX_DATAPOINTS
+                if offset >= len(timestamps):
+                    break
+        if page:
+            self._call()
+            yield {'MetricDataResults': page}
+
+def window(hours, now=None):
+    end_time = (now or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+    return end_time - timedelta(hours=hours), end_time
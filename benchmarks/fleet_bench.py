@@ -0,0 +1,210 @@
+# Offline benchmarks for listing, selection, bulk lifecycle calls, metric
+# fetches and rendering against synthetic fleets (see benchmarks/fakes.py).
+# No network or credentials are needed. Every run appends one JSON line with
+# the git commit to the results file and is compared with the previous run
+# recorded for a different commit.
+#
+#   python benchmarks/fleet_bench.py [--sizes 10 1000 10000 50000] [--repeat 3]
+#                                    [--latency-ms 0] [--output benchmarks/results.jsonl]
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.fakes import FakeEC2, FakeCloudWatch, make_fleet, window  # noqa: E402
+from aws_utils.ec2_management import get_instances, parse_selection, run_batched_operation  # noqa: E402
+from aws_utils.menu import list_instances_with_choice  # noqa: E402
+from aws_utils.monitoring import fetch_cpu_history  # noqa: E402
+from aws_utils.metric_store import MetricStore  # noqa: E402
+from aws_utils.output import write_rows, INSTANCE_COLUMNS  # noqa: E402
+from aws_utils.query import parse_query  # noqa: E402
+from aws_utils.instance_index import InstanceIndex  # noqa: E402
+from aws_utils.snapshot import InventorySnapshot  # noqa: E402
+
+DEFAULT_SIZES = (10, 1000, 10000, 50000)
+DEFAULT_REPEAT = 3
+DEFAULT_OUTPUT = os.path.join(REPO_DIR, "benchmarks", "results.jsonl")
+
+def git_revision():
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+    return commit, dirty
+
+def build_cases(size, latency_ms, store_dir):
+    # (name, setup() -> state, run(state)) in execution order; setup is not timed
+    ec2 = FakeEC2(make_fleet(size), latency_ms=latency_ms)
+    cloudwatch = FakeCloudWatch(latency_ms=latency_ms)
+    quiet = io.StringIO
+    start_time, end_time = window(hours=1)
+    worker_query = parse_query("state=running tag:Role=worker")
+    adhoc_query = parse_query("all stopped t3.large in 2a")
+
+    def listed():
+        with redirect_stdout(quiet()):
+            return list_instances_with_choice(ec2)
+
+    def fresh_store():
+        return MetricStore(tempfile.mkdtemp(dir=store_dir))
+
+    def warm_store():
+        store = fresh_store()
+        fetch_cpu_history(cloudwatch, list(ec2.instances), start_time, end_time, store=store)
+        return store
+
+    def fresh_snapshot():
+        return InventorySnapshot(os.path.join(tempfile.mkdtemp(dir=store_dir), "inventory.sqlite3"))
+
+    def saved_snapshot():
+        snapshot = fresh_snapshot()
+        snapshot.save_instances(ec2.meta.region_name, listed())
+        return snapshot
+
+    def summarize(history):
+        from aws_utils import analytics
+        return analytics.summarize(history)
+
+    def run_silently(func):
+        def run(state):
+            with redirect_stdout(quiet()):
+                return func(state)
+        return run
+
+    return [
+        ('list.scan', lambda: None,
+         run_silently(lambda _: list_instances_with_choice(ec2, refresh=True))),
+        ('list.cached', listed,
+         run_silently(lambda _: list_instances_with_choice(ec2))),
+        ('list.server_filter', lambda: None,
+         lambda _: get_instances(ec2, refresh=True, query=worker_query)),
+        ('select.range', listed,
+         lambda instances: parse_selection(f"1-{max(len(instances) // 2, 1)},{len(instances)}", instances)),
+        ('select.query', listed,
+         lambda instances: parse_selection("state=running type=t3.* name=condor-worker-*", instances)),
+        ('select.index_build', listed, InstanceIndex),
+        ('select.lookup', lambda: InstanceIndex(listed()),
+         lambda index: [index.search(text) for text in ("condor-worker-4", "condr-wrker-17", "0000abc", "10.0.1")]),
+        ('snapshot.save', lambda: (fresh_snapshot(), listed()),
+         lambda state: state[0].save_instances(ec2.meta.region_name, state[1])),
+        ('snapshot.load', saved_snapshot,
+         lambda snapshot: snapshot.load_instances(ec2.meta.region_name)),
+        ('snapshot.query', saved_snapshot,
+         lambda snapshot: snapshot.query_instances(ec2.meta.region_name, adhoc_query)),
+        ('lifecycle.stop', lambda: list(ec2.instances),
+         lambda ids: run_batched_operation(ec2, 'stop_instances', ids)),
+        ('lifecycle.start', lambda: list(ec2.instances),
+         lambda ids: run_batched_operation(ec2, 'start_instances', ids)),
+        ('metrics.fetch_cold_1h', fresh_store,
+         lambda store: fetch_cpu_history(cloudwatch, list(ec2.instances), start_time, end_time, store=store)),
+        ('metrics.fetch_warm_1h', warm_store,
+         lambda store: fetch_cpu_history(cloudwatch, list(ec2.instances), start_time, end_time, store=store)),
+        ('metrics.summarize_1h',
+         lambda: fetch_cpu_history(cloudwatch, list(ec2.instances), start_time, end_time, store=fresh_store()),
+         summarize),
+        ('render.table', listed, lambda instances: write_rows(instances, INSTANCE_COLUMNS, 'table', quiet())),
+        ('render.json', listed, lambda instances: write_rows(instances, INSTANCE_COLUMNS, 'json', quiet())),
+        ('render.csv', listed, lambda instances: write_rows(instances, INSTANCE_COLUMNS, 'csv', quiet()))
+    ], (ec2, cloudwatch)
+
+def run_size(size, repeat, latency_ms, store_dir, only=None):
+    cases, clients = build_cases(size, latency_ms, store_dir)
+    results = {}
+    for name, setup, run in cases:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        timings = []
+        calls = 0
+        for _ in range(repeat):
+            state = setup()
+            before = sum(client.calls for client in clients)
+            start = time.perf_counter()
+            run(state)
+            timings.append((time.perf_counter() - start) * 1000)
+            calls = sum(client.calls for client in clients) - before
+        results[name] = {
+            'median_ms': round(statistics.median(timings), 3),
+            'min_ms': round(min(timings), 3),
+            'api_calls': calls
+        }
+    return results
+
+def load_baseline(path, commit):
+    # The most recent recorded run from another commit, or None
+    if not os.path.exists(path):
+        return None
+    baseline = None
+    with open(path, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('commit') != commit:
+                baseline = record
+    return baseline
+
+def print_results(record, baseline):
+    print(f"commit {record['commit']}{' (dirty)' if record['dirty'] else ''}, "
+          f"simulated latency {record['latency_ms']} ms, {record['repeat']} run(s) per case")
+    if baseline:
+        print(f"compared with {baseline['commit']} from {baseline['timestamp']}")
+    print(f"{'Size':>7}  {'Case':<24}{'Median ms':>12}{'Min ms':>12}{'API calls':>11}{'Change':>10}")
+    print("-" * 78)
+    for size, cases in record['results'].items():
+        previous = (baseline or {}).get('results', {}).get(size, {})
+        for name, result in cases.items():
+            change = ""
+            if name in previous and previous[name]['median_ms']:
+                change = f"{(result['median_ms'] / previous[name]['median_ms'] - 1) * 100:+.0f}%"
+            print(f"{size:>7}  {name:<24}{result['median_ms']:>12.2f}{result['min_ms']:>12.2f}"
+                  f"{result['api_calls']:>11}{change:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark aws_utils against synthetic fleets, offline.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help="simulated round trip added to every fake API request")
+    parser.add_argument('--only', nargs='+', metavar='PREFIX', help="run only cases starting with PREFIX")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="results file, one JSON record per run")
+    args = parser.parse_args()
+
+    commit, dirty = git_revision()
+    record = {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latency_ms': args.latency_ms,
+        'repeat': args.repeat,
+        'results': {}
+    }
+    with tempfile.TemporaryDirectory() as store_dir:
+        for size in args.sizes:
+            print(f"Running {size} instances...", file=sys.stderr)
+            record['results'][str(size)] = run_size(size, args.repeat, args.latency_ms, store_dir, args.only)
+
+    baseline = load_baseline(args.output, commit)
+    print_results(record, baseline)
+    with open(args.output, 'a') as file:
+        file.write(json.dumps(record) + "\n")
+    print(f"Results appended to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
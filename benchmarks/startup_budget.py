@@ -0,0 +1,59 @@
+# Startup-time budget for main.py and awsTest.py, measured with `python -X importtime`.
+# Fails (exit 1) when the median cumulative import time goes over the budget or
+# when a heavy dependency is imported at startup instead of on first use.
+#
+#   python benchmarks/startup_budget.py [--budget-ms 100] [--runs 7]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 100
+DEFAULT_RUNS = 7
+MODULES = ('main', 'awsTest')
+DEFERRED_MODULES = ('boto3', 'botocore', 'paramiko', 'numpy', 'sqlite3')
+
+def measure(module):
+    # Returns (cumulative microseconds for `module`, names of all imported modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True
+    )
+    cumulative = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            cumulative = int(cumulative_us)
+    return cumulative, imported
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import-time budget of the entry points.")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        timings = []
+        imported = set()
+        for _ in range(args.runs):
+            cumulative, imported = measure(module)
+            timings.append(cumulative / 1000)
+        median = statistics.median(timings)
+        eager = sorted(name for name in imported if name.split('.')[0] in DEFERRED_MODULES)
+        status = "ok" if median <= args.budget_ms and not eager else "FAIL"
+        print(f"{module:<10} median {median:7.1f} ms (budget {args.budget_ms:.0f} ms) {status}")
+        if eager:
+            print(f"  imported at startup: {', '.join(eager)}")
+        failed = failed or status != "ok"
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
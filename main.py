@@ -1,57 +1,280 @@
 import sys
-import json
-import os
-import boto3
-from aws_utils.ec2_management import (
-    list_instances_with_choice, create_instance, start_instance,
+import argparse
+from aws_utils.menu import (
+    create_instance, start_instance,
     stop_instance, reboot_instance, delete_instance, update_instance_name,
-    available_zones, available_regions
+    available_zones, available_regions, list_instances_all_regions, list_filtered_instances,
+    get_cpu_usage, get_fleet_cpu_usage, ssh_to_instance, execute_condor_status_on_instances,
+    execute_command_on_instances, watch_fleet, snapshot_note, REGION_COLUMNS, ZONE_COLUMNS
 )
-from aws_utils.monitoring import get_cpu_usage
-from aws_utils.ssh_utils import ssh_to_instance, execute_condor_status_on_instances
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from aws_utils.ec2_management import preload_inventory
+from aws_utils.monitoring import CPU_WINDOWS
+from aws_utils.ssh_utils import print_line_sink, SSH_USERNAME, SSH_TIMEOUT
+from aws_utils.output import write_rows, FORMATS, INSTANCE_COLUMNS
+from aws_utils.session import LazyProxy, get_client
+from aws_utils.credentials import load_config
+from aws_utils import api, inventory, snapshot
+from aws_utils.errors import ApiError, InvalidRequestError
+from aws_utils.query import parse_query
+from aws_utils.instrumentation import get_stats, print_stats
+from aws_utils.watch import watch_instances
 
-def load_credentials():
-    try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        credentials_path = os.path.join(script_dir, "credentials.json")
-        with open(credentials_path, 'r') as file:
-            credentials = json.load(file)
-        aws_access_key_id = credentials.get('aws_access_key_id')
-        aws_secret_access_key = credentials.get('aws_secret_access_key')
-        region = credentials.get('region', 'ap-northeast-2')  # Default region
-
-        if not aws_access_key_id or not aws_secret_access_key:
-            raise KeyError("AWS access key or secret key is missing in credentials.json.")
-
-        return aws_access_key_id, aws_secret_access_key, region
-    except FileNotFoundError:
-        print(f"Error: credentials.json file not found in {script_dir}.")
-        sys.exit(1)
-    except KeyError as e:
-        print(f"Error: Missing key {str(e)} in credentials.json.")
-        sys.exit(1)
-    except json.JSONDecodeError:
-        print("Error: Invalid JSON format in credentials.json.")
-        sys.exit(1)
-
-def init():
-    aws_access_key_id, aws_secret_access_key, region = load_credentials()
+def init(preload=False):
+    config = load_config()  # fail fast on a missing or broken credentials.json
+    inventory.set_ttl(config.get('inventory_ttl', inventory.DEFAULT_TTL))
+    snapshot.set_path(config.get('inventory_snapshot', snapshot.DEFAULT_DB_PATH))
+
+    # boto3 is imported and clients are built on first use only; every
+    # client comes from the shared factory in aws_utils.session
+    ec2 = LazyProxy(lambda: get_client('ec2'))
+    cloudwatch = LazyProxy(lambda: get_client('cloudwatch'))
+    # Full listings are saved locally; the menu starts from the last one
+    inventory.attach_snapshot(ec2, snapshot.get_snapshot(), config['region'], preload=preload)
+    return ec2, cloudwatch
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NO_MATCH = 3
+
+STATS_FORMATS = ('table', 'json', 'prom')
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Amazon AWS Control Panel using SDK. Without a subcommand the interactive menu is started.",
+        epilog="Exit status: 0 success, 1 AWS error or failure on some instance, 2 usage error, 3 no instances matched."
+    )
+    parser.add_argument('--stats', choices=STATS_FORMATS,
+                        help="print per-operation API call statistics to stderr when the command finishes")
+    subparsers = parser.add_subparsers(dest='command')
+
+    def add_format(subparser):
+        subparser.add_argument('--format', choices=FORMATS, default='table', help="output format (default: table)")
+
+    def add_offline(subparser):
+        subparser.add_argument('--offline', action='store_true',
+                               help="answer from the inventory saved by the last full listing, without calling AWS")
+
+    def add_selection(subparser, ids=True):
+        if ids:
+            subparser.add_argument('--ids', nargs='+', metavar='ID', help="instance IDs")
+        subparser.add_argument('--filter', metavar='EXPR',
+                               help="query such as 'state=running tag:Role=worker name=wk-*' or 'all'")
+
+    list_parser = subparsers.add_parser('list', help="list instances")
+    add_selection(list_parser, ids=False)
+    list_parser.add_argument('--all-regions', action='store_true', help="list every enabled region")
+    add_offline(list_parser)
+    add_format(list_parser)
+
+    for name in api.LIFECYCLE_OPERATIONS:
+        lifecycle_parser = subparsers.add_parser(name, help=f"{name} instances")
+        add_selection(lifecycle_parser)
+        add_format(lifecycle_parser)
+        if name == 'terminate':
+            lifecycle_parser.add_argument('--yes', action='store_true', help="confirm termination")
+
+    cpu_parser = subparsers.add_parser('cpu', help="CPU utilization summary")
+    add_selection(cpu_parser)
+    cpu_parser.add_argument('--window', choices=sorted(CPU_WINDOWS), default='1h')
+    add_format(cpu_parser)
+
+    exec_parser = subparsers.add_parser('exec', help="run a command on instances over SSH")
+    add_selection(exec_parser)
+    exec_parser.add_argument('--key', required=True, help="path to the private key file (.pem)")
+    exec_parser.add_argument('--user', default=SSH_USERNAME)
+    exec_parser.add_argument('--timeout', type=int, default=SSH_TIMEOUT)
+    exec_parser.add_argument('--command', dest='remote_command', required=True, help="command to run")
+    add_format(exec_parser)
+
+    watch_parser = subparsers.add_parser('watch', help="follow instance state changes until Ctrl+C")
+    add_selection(watch_parser, ids=False)
+    watch_parser.add_argument('--cpu', action='store_true', help="show the latest CPU utilization per instance")
+    watch_parser.add_argument('--polls', type=int, metavar='N', help="stop after N polls (line output)")
+
+    add_format(subparsers.add_parser('regions', help="list available regions"))
+    zones_parser = subparsers.add_parser('zones', help="list available zones")
+    add_offline(zones_parser)
+    add_format(zones_parser)
+    return parser
+
+def _select_instance_ids(ec2, args):
+    if getattr(args, 'ids', None):
+        return args.ids
+    return api.select_instance_ids(ec2, args.filter)
+
+def _cli_list(ec2, cloudwatch, args):
+    if args.offline:
+        if args.all_regions:
+            raise InvalidRequestError("--offline covers the configured region only")
+        instances, errors = api.list_saved_instances(load_config()['region'], args.filter), {}
+        columns = INSTANCE_COLUMNS
+    elif args.all_regions:
+        instances, errors = api.list_instances_all_regions(ec2, args.filter)
+        for region, error in sorted(errors.items()):
+            print(f"Error listing instances in {region}: {error}", file=sys.stderr)
+        columns = [('Region', 'Region')] + INSTANCE_COLUMNS
+    else:
+        instances, errors = api.list_instances(ec2, args.filter), {}
+        columns = INSTANCE_COLUMNS
+    write_rows(instances, columns, args.format)
+    return EXIT_FAILED if errors else EXIT_OK
+
+def _cli_lifecycle(ec2, cloudwatch, args):
+    if args.command == 'terminate' and not args.yes:
+        print("Refusing to terminate without --yes.", file=sys.stderr)
+        return EXIT_USAGE
+    instance_ids = _select_instance_ids(ec2, args)
+    if not instance_ids:
+        return EXIT_NO_MATCH
+    results = api.change_state(ec2, args.command, instance_ids)
+    write_rows(results, [('InstanceId', 'Instance ID'), ('Result', 'Result'), ('Error', 'Error')], args.format)
+    return EXIT_OK if all(result.ok for result in results) else EXIT_FAILED
+
+def _cli_cpu(ec2, cloudwatch, args):
+    instance_ids = _select_instance_ids(ec2, args)
+    if not instance_ids:
+        return EXIT_NO_MATCH
+    summaries = api.cpu_summaries(ec2, cloudwatch, instance_ids, args.window)
+
+    def number(value):
+        return None if value is None else round(value, 1)
+
+    rows = [
+        {'InstanceId': summary.instance_id, 'P50': number(summary.p50), 'P95': number(summary.p95),
+         'P99': number(summary.p99), 'Max': number(summary.max), 'Anomalies': summary.anomaly_count,
+         'Points': summary.points}
+        for summary in summaries
+    ]
+    columns = [('InstanceId', 'Instance ID'), ('P50', 'p50 %'), ('P95', 'p95 %'), ('P99', 'p99 %'),
+               ('Max', 'Max %'), ('Anomalies', 'Anomalies'), ('Points', 'Points')]
+    write_rows(rows, columns, args.format)
+    return EXIT_OK
+
+def _cli_exec(ec2, cloudwatch, args):
+    instance_ids = _select_instance_ids(ec2, args)
+    if not instance_ids:
+        return EXIT_NO_MATCH
+    # Table output streams lines as they arrive; JSON/CSV carry them in the results
+    on_line = print_line_sink if args.format == 'table' else None
+    results = api.run_command(ec2, instance_ids, args.remote_command, args.key, username=args.user,
+                              timeout=args.timeout, on_line=on_line)
+    for result in results:
+        if result.host is None:
+            print(f"Instance {result.instance_id}: {result.error}. Skipping.", file=sys.stderr)
+    results = [result for result in results if result.host is not None]
+    if not results:
+        return EXIT_NO_MATCH
+    columns = [('InstanceId', 'Instance ID'), ('Host', 'Host'), ('ExitCode', 'Exit code'), ('Error', 'Error')]
+    if args.format != 'table':
+        columns += [('Stdout', 'Stdout'), ('Stderr', 'Stderr')]
+    write_rows(results, columns, args.format)
+    return EXIT_OK if all(result.ok for result in results) else EXIT_FAILED
+
+def _cli_watch(ec2, cloudwatch, args):
+    query = parse_query(args.filter) if args.filter else None
+    watch_instances(ec2, cloudwatch, query, show_cpu=args.cpu, max_polls=args.polls)
+    return EXIT_OK
+
+def _cli_regions(ec2, cloudwatch, args):
+    write_rows(api.list_regions(ec2), REGION_COLUMNS, args.format)
+    return EXIT_OK
+
+def _cli_zones(ec2, cloudwatch, args):
+    if args.offline:
+        zones = api.list_saved_zones(load_config()['region'])
+    else:
+        zones = api.list_zones(ec2)
+    write_rows(zones, ZONE_COLUMNS, args.format)
+    return EXIT_OK
+
+CLI_HANDLERS = {
+    'list': _cli_list,
+    'start': _cli_lifecycle,
+    'stop': _cli_lifecycle,
+    'reboot': _cli_lifecycle,
+    'terminate': _cli_lifecycle,
+    'cpu': _cli_cpu,
+    'exec': _cli_exec,
+    'watch': _cli_watch,
+    'regions': _cli_regions,
+    'zones': _cli_zones
+}
+
+def write_stats(fmt, stream=None):
+    stream = stream or sys.stdout
+    if fmt == 'json':
+        stream.write(get_stats().to_json() + "\n")
+    elif fmt == 'prom':
+        stream.write(get_stats().to_prometheus())
+    else:
+        print_stats(stream=stream)
+
+def show_api_stats():
+    print_stats()
+    fmt = input("Export as (json/prom, empty to skip): ").strip().lower()
+    if not fmt:
+        return
+    if fmt not in ('json', 'prom'):
+        print("Unknown format.")
+        return
+    path = input("Output file (empty to print): ").strip()
+    if not path:
+        write_stats(fmt)
+        return
     try:
-        session = boto3.Session(
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=region
-        )
-        ec2 = session.client('ec2')
-        cloudwatch = session.client('cloudwatch')
-        return ec2, cloudwatch
-    except (NoCredentialsError, PartialCredentialsError) as e:
-        print(f"Error: {str(e)}")
-        sys.exit(1)
-
-def main():
+        with open(path, 'w') as file:
+            write_stats(fmt, file)
+        print(f"API statistics written to {path}")
+    except OSError as e:
+        print(f"Error writing {path}: {str(e)}")
+
+def run_cli(args):
+    if args.command in ('start', 'stop', 'reboot', 'terminate', 'cpu', 'exec') and not (args.ids or args.filter):
+        print("Either --ids or --filter is required.", file=sys.stderr)
+        return EXIT_USAGE
     ec2, cloudwatch = init()
+    try:
+        return CLI_HANDLERS[args.command](ec2, cloudwatch, args)
+    except InvalidRequestError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return EXIT_USAGE
+    except ApiError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return EXIT_FAILED
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return EXIT_USAGE
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return EXIT_FAILED
+    finally:
+        # stderr keeps stdout parseable for --format json/csv
+        if args.stats:
+            write_stats(args.stats, sys.stderr)
+
+def show_inventory_summary(ec2):
+    # Drawn from the saved inventory before any API call; a background scan
+    # brings it up to date while the menu is in use
+    instances = preload_inventory(ec2)
+    if instances is None:
+        return
+    counts = {}
+    for inst in instances:
+        counts[inst.state] = counts.get(inst.state, 0) + 1
+    summary = ", ".join(f"{count} {state}" for state, count in sorted(counts.items()))
+    print(f"{len(instances)} instance(s): {summary or 'none'}")
+    note = snapshot_note(ec2)
+    if note:
+        print(note)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command:
+        sys.exit(run_cli(args))
+
+    ec2, cloudwatch = init(preload=True)
+    show_inventory_summary(ec2)
 
     while True:
         print("\n------------------------------------------------------------")
@@ -61,13 +284,16 @@ def main():
         print("  1. List instances              2. Create instance          ")
         print("  3. Start instance              4. Stop instance            ")
         print("  5. Reboot instance             6. Delete instance          ")
-        print("  7. Update name tag                                        ")
+        print("  7. Update name tag             13. List all-region instances")
         print("  8. Available zones             9. Available regions        ")
         print("  Monitoring:")
-        print("  10. View CPU usage                                        ")
+        print("  10. View CPU usage              14. Fleet CPU summary      ")
+        print("  17. Watch instances                                        ")
         print("  SSH and Custom Commands:")
         print("  11. SSH to instance             12. Execute condor_status  ")
-        print("                                  99. Quit                   ")
+        print("  15. Run command on instances                               ")
+        print("  Diagnostics:")
+        print("  16. API call statistics         99. Quit                   ")
         print("------------------------------------------------------------")
         
         choice = input("Enter an integer: ")
@@ -77,7 +303,7 @@ def main():
 
         choice = int(choice)
         if choice == 1:
-            list_instances_with_choice(ec2)
+            list_filtered_instances(ec2)
         elif choice == 2:
             create_instance(ec2)
         elif choice == 3:
@@ -100,6 +326,16 @@ def main():
             ssh_to_instance(ec2)
         elif choice == 12:
             execute_condor_status_on_instances(ec2)
+        elif choice == 13:
+            list_instances_all_regions(ec2)
+        elif choice == 14:
+            get_fleet_cpu_usage(ec2, cloudwatch)
+        elif choice == 15:
+            execute_command_on_instances(ec2)
+        elif choice == 16:
+            show_api_stats()
+        elif choice == 17:
+            watch_fleet(ec2, cloudwatch)
         elif choice == 99:
             print("Goodbye!")
             break
@@ -0,0 +1,7 @@
+from aws_utils.records import InstanceRecord
+
+def record(instance_id, name, state='running', type='t3.small', zone='ap-northeast-2a', public_ip='N/A',
+           private_ip='N/A', vpc_id='vpc-00000001', tags=()):
+    # An InstanceRecord as describe_instances would produce it, Name tag included
+    tags = (('Name', name),) + tuple(tags)
+    return InstanceRecord(instance_id, name, state, type, public_ip, private_ip, zone, vpc_id, tags)
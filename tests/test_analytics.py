@@ -0,0 +1,37 @@
+import math
+import pytest
+
+np = pytest.importorskip('numpy')
+from aws_utils import analytics  # noqa: E402
+
+def test_fewer_points_than_window():
+    [row] = analytics.summarize({'i-01': [(0, 10.0), (300, 20.0)]}, window=3)
+    assert row['Points'] == 2
+    assert row['P50'] == pytest.approx(15.0)
+    assert row['Max'] == 20.0
+    assert math.isnan(row['PeakStart']) and math.isnan(row['PeakMean'])
+    assert row['Anomalies'] == []
+
+def test_window_counts_only_present_points():
+    history = {
+        'i-01': [(0, 50.0), (300, 60.0), (600, 70.0), (900, 80.0)],
+        'i-02': [(0, 10.0), (900, 20.0)]
+    }
+    rows = {row['InstanceId']: row for row in analytics.summarize(history, window=3)}
+    assert rows['i-01']['PeakStart'] == 300.0 and rows['i-01']['PeakMean'] == pytest.approx(70.0)
+    assert rows['i-02']['PeakMean'] == pytest.approx(20.0)
+    assert rows['i-02']['Points'] == 2
+
+def test_instance_without_data_ranks_last():
+    rows = analytics.summarize({'i-01': [], 'i-02': [(0, 5.0)], 'i-03': [(0, 90.0)]})
+    assert [row['InstanceId'] for row in rows] == ['i-03', 'i-02', 'i-01']
+    assert rows[-1]['Points'] == 0
+    assert all(math.isnan(rows[-1][key]) for key in ('P50', 'P95', 'P99', 'Max', 'PeakMean'))
+
+def test_empty_history():
+    assert analytics.summarize({}) == []
+
+def test_spike_is_an_anomaly():
+    points = [(idx * 300, 10.0) for idx in range(30)] + [(9000, 99.0)]
+    [row] = analytics.summarize({'i-01': points})
+    assert row['Anomalies'] == [9000.0]
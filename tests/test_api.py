@@ -0,0 +1,34 @@
+import pytest
+from aws_utils import api
+from aws_utils.errors import InvalidRequestError
+from aws_utils.query import parse_query
+from benchmarks.fakes import FakeEC2, make_fleet
+from tests.helpers import record
+
+INSTANCES = [record('i-01', 'a'), record('i-02', 'b', state='stopped'), record('i-03', 'c')]
+
+def _stopped_id(fleet):
+    return next(instance['InstanceId'] for instance in fleet if instance['State']['Name'] == 'stopped')
+
+def test_run_command_describes_only_the_given_instances(tmp_path):
+    fleet = make_fleet(5000)
+    ec2 = FakeEC2(fleet)
+    key_path = tmp_path / "key.pem"
+    key_path.write_text("")
+    instance_id = _stopped_id(fleet)
+    results = api.run_command(ec2, [instance_id, 'i-ffffffffffffffff'], 'uptime', str(key_path))
+    assert ec2.calls == 1
+    assert [(result.instance_id, result.error) for result in results] == [
+        (instance_id, "No public IP address"), ('i-ffffffffffffffff', "Instance not found")
+    ]
+
+@pytest.mark.parametrize('selection', ['', '  ', 'in', None])
+def test_selection_needs_rows_or_terms(selection):
+    with pytest.raises(InvalidRequestError):
+        api.select_instance_ids(None, selection, INSTANCES)
+
+def test_selection_rows_and_queries():
+    assert api.select_instance_ids(None, ' 2-3 ', INSTANCES) == ['i-02', 'i-03']
+    assert api.select_instance_ids(None, 'all', INSTANCES) == ['i-01', 'i-02', 'i-03']
+    assert api.select_instance_ids(None, 'stopped', INSTANCES) == ['i-02']
+    assert api.select_instance_ids(None, parse_query('name=c*'), INSTANCES) == ['i-03']
@@ -0,0 +1,35 @@
+from aws_utils import api
+from aws_utils.records import CommandResult
+
+SLOTS = {
+    'i-cm1': ["slot1@n1 n1 Claimed Busy 4 8000 Dynamic"],
+    'i-cm2': ["slot1@n2 n2 Unclaimed Idle 2 4000 Partitionable"],
+    'i-cm3': ["slot1@n3 n3 Claimed Busy 8 16000 Dynamic"]
+}
+
+def _poll(monkeypatch, failing=()):
+    # condor_status over stub SSH results; managers in `failing` time out
+    def run_command(ec2, instance_ids, command, key_path, username, timeout, on_line):
+        results = []
+        for instance_id in instance_ids:
+            host = f"{instance_id}.example"
+            if instance_id in failing:
+                results.append(CommandResult(instance_id, host, error="timed out"))
+                continue
+            for line in SLOTS[instance_id]:
+                on_line(instance_id, host, 'stdout', line)
+            results.append(CommandResult(instance_id, host, exit_code=0))
+        return results
+
+    monkeypatch.setattr(api, 'run_command', run_command)
+    pools, _ = api.condor_status(None, list(SLOTS), "key.pem")
+    return pools[-1]
+
+def test_combined_row_is_keyed_by_the_managers_that_answered(monkeypatch):
+    first = _poll(monkeypatch)
+    assert first.instance_id is None and first.counters['Cpus'] == 14
+    # A different set of pools starts over instead of reporting n3 as gone
+    second = _poll(monkeypatch, failing={'i-cm3'})
+    assert second.counters['Cpus'] == 6 and second.change is None
+    third = _poll(monkeypatch, failing={'i-cm3'})
+    assert third.change['Counters']['Cpus'] == 0 and third.change['Removed'] == []
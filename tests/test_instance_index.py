@@ -0,0 +1,41 @@
+from aws_utils.instance_index import InstanceIndex
+from tests.helpers import record
+
+INSTANCES = [
+    record('i-0000000000000001', 'web-1', public_ip='3.0.0.1', private_ip='10.0.0.1'),
+    record('i-0000000000000002', 'web-10', private_ip='10.0.0.2'),
+    record('i-0000000000000003', 'myweb-1', private_ip='10.0.0.3'),
+    record('i-0000000000000004', 'db-1', private_ip='10.0.0.4')
+]
+
+def _search(text, **kwargs):
+    return [(inst.name, kind) for inst, kind, _ in InstanceIndex(INSTANCES).search(text, **kwargs)]
+
+def test_ranking_by_match_kind():
+    assert _search('web-1') == [('web-1', 'exact'), ('web-10', 'prefix'), ('myweb-1', 'contains'),
+                                ('db-1', 'fuzzy')]
+
+def test_shorter_keys_rank_first_within_a_kind():
+    results = InstanceIndex(INSTANCES).search('web')
+    assert [(inst.name, kind) for inst, kind, _ in results] == [('web-1', 'prefix'), ('web-10', 'prefix'),
+                                                                ('myweb-1', 'contains')]
+    assert results[0][2] > results[1][2]
+
+def test_exact_ids_and_addresses():
+    assert _search('i-0000000000000004')[0] == ('db-1', 'exact')
+    assert _search('0000000000000003')[0] == ('myweb-1', 'exact')
+    assert _search('3.0.0.1') == [('web-1', 'exact')]
+    assert _search('10.0.0.2')[0] == ('web-10', 'exact')
+
+def test_case_and_whitespace_are_ignored():
+    assert _search('  WEB-1 ')[0] == ('web-1', 'exact')
+
+def test_typo_matches_fuzzily():
+    assert _search('wen-10')[0] == ('web-10', 'fuzzy')
+
+def test_no_match_and_empty_text():
+    assert _search('zzz') == []
+    assert _search('') == []
+
+def test_limit():
+    assert _search('web-1', limit=2) == [('web-1', 'exact'), ('web-10', 'prefix')]
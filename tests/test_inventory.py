@@ -0,0 +1,94 @@
+import time
+import pytest
+from aws_utils import inventory
+from aws_utils.ec2_management import get_instances
+from aws_utils.snapshot import InventorySnapshot
+from benchmarks.fakes import FakeEC2, make_fleet
+from tests.helpers import record
+
+@pytest.fixture
+def ec2():
+    # Any hashable object keys the cache; a fresh one per test keeps them apart
+    return object()
+
+def _ids(instances):
+    return sorted(inst.instance_id for inst in instances)
+
+def test_store_and_ttl(ec2):
+    assert inventory.cached_instances(ec2) is None
+    inventory.store_instances(ec2, [record('i-01', 'a'), record('i-02', 'b')])
+    assert _ids(inventory.cached_instances(ec2)) == ['i-01', 'i-02']
+    inventory.set_ttl(-1)
+    try:
+        assert inventory.cached_instances(ec2) is None
+    finally:
+        inventory.set_ttl(inventory.DEFAULT_TTL)
+
+def test_invalidated_ids_are_pending(ec2):
+    inventory.store_instances(ec2, [record('i-01', 'a'), record('i-02', 'b')])
+    inventory.invalidate(ec2, ['i-02'])
+    assert inventory.pending_ids(ec2) == ['i-02']
+    assert inventory.cached_instances(ec2) is not None
+
+def test_transitional_states_are_pending(ec2):
+    inventory.store_instances(ec2, [record('i-01', 'a', state='pending'), record('i-02', 'b')])
+    assert inventory.pending_ids(ec2) == ['i-01']
+
+def test_invalidate_all(ec2):
+    inventory.store_instances(ec2, [record('i-01', 'a')])
+    inventory.invalidate(ec2, ['i-01'])
+    inventory.invalidate(ec2)
+    assert inventory.cached_instances(ec2) is None
+    assert inventory.pending_ids(ec2) == []
+
+def test_store_without_scan_start_clears_stale(ec2):
+    inventory.store_instances(ec2, [record('i-01', 'a')])
+    inventory.invalidate(ec2, ['i-01'])
+    inventory.store_instances(ec2, [record('i-01', 'a')])
+    assert inventory.pending_ids(ec2) == []
+
+def test_store_keeps_ids_invalidated_during_the_scan(ec2):
+    inventory.store_instances(ec2, [record('i-01', 'a'), record('i-02', 'b')])
+    inventory.invalidate(ec2, ['i-01'])
+    scan_started = time.monotonic()
+    inventory.invalidate(ec2, ['i-02'])  # e.g. stopped while the scan was running
+    inventory.store_instances(ec2, [record('i-01', 'a'), record('i-02', 'b')], scan_started)
+    assert inventory.pending_ids(ec2) == ['i-02']
+
+def test_merge_replaces_and_drops(ec2):
+    inventory.store_instances(ec2, [record('i-01', 'a'), record('i-02', 'b')])
+    inventory.invalidate(ec2, ['i-01', 'i-02'])
+    inventory.merge_instances(ec2, ['i-01', 'i-02'], [record('i-01', 'a', state='stopped')])
+    assert [(inst.instance_id, inst.state) for inst in inventory.cached_instances(ec2)] == [('i-01', 'stopped')]
+    assert inventory.pending_ids(ec2) == []
+
+def test_merge_keeps_ids_invalidated_after_the_describe(ec2):
+    inventory.store_instances(ec2, [record('i-01', 'a')])
+    described_at = time.monotonic()
+    inventory.invalidate(ec2, ['i-01'])
+    inventory.merge_instances(ec2, ['i-01'], [record('i-01', 'a')], described_at)
+    assert inventory.pending_ids(ec2) == ['i-01']
+
+def test_merge_into_empty_cache_is_ignored(ec2):
+    inventory.merge_instances(ec2, ['i-01'], [record('i-01', 'a')])
+    assert inventory.cached_instances(ec2) is None
+
+def test_listing_keeps_ids_invalidated_during_the_scan():
+    ec2 = FakeEC2(make_fleet(300))
+    stopped = []
+
+    def stop_during_scan(page):
+        if not stopped:
+            stopped.append(page[0].instance_id)
+            inventory.invalidate(ec2, stopped)
+
+    get_instances(ec2, page_size=100, refresh=True, on_page=stop_during_scan)
+    assert stopped[0] in inventory.pending_ids(ec2)
+
+def test_snapshot_keeps_ids_invalidated_before_loading(ec2, tmp_path):
+    snapshot = InventorySnapshot(tmp_path / "inventory.sqlite3")
+    snapshot.save_instances('ap-northeast-2', [record('i-01', 'a'), record('i-02', 'b')])
+    inventory.attach_snapshot(ec2, snapshot, 'ap-northeast-2', preload=True)
+    inventory.invalidate(ec2, ['i-02'])
+    assert _ids(inventory.load_snapshot(ec2)) == ['i-01', 'i-02']
+    assert inventory.pending_ids(ec2) == ['i-02']
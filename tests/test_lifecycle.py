@@ -0,0 +1,43 @@
+import pytest
+from aws_utils.ec2_management import run_batched_operation
+
+class StubClientError(Exception):
+    # Shaped like botocore's ClientError
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code, 'Message': code}}
+
+class StubEC2:
+    # stop_instances fails the whole call when any ID is unknown, like EC2
+    def __init__(self, known, error=None):
+        self.known = set(known)
+        self.error = error
+        self.calls = []
+
+    def stop_instances(self, InstanceIds):
+        self.calls.append(list(InstanceIds))
+        if self.error:
+            raise StubClientError(self.error)
+        if any(instance_id not in self.known for instance_id in InstanceIds):
+            raise StubClientError('InvalidInstanceID.NotFound')
+        return {}
+
+def test_batches():
+    ec2 = StubEC2(['i-01', 'i-02', 'i-03'])
+    results = run_batched_operation(ec2, 'stop_instances', ['i-01', 'i-02', 'i-03'], batch_size=2)
+    assert results == {'i-01': None, 'i-02': None, 'i-03': None}
+    assert ec2.calls == [['i-01', 'i-02'], ['i-03']]
+
+def test_failed_batch_is_retried_per_instance():
+    ec2 = StubEC2(['i-01', 'i-03'])
+    results = run_batched_operation(ec2, 'stop_instances', ['i-01', 'i-02', 'i-03'])
+    assert results['i-01'] is None and results['i-03'] is None
+    assert 'InvalidInstanceID.NotFound' in results['i-02']
+    assert ec2.calls == [['i-01', 'i-02', 'i-03'], ['i-01'], ['i-02'], ['i-03']]
+
+@pytest.mark.parametrize('code', ['RequestLimitExceeded', 'UnauthorizedOperation'])
+def test_batch_wide_error_is_not_split(code):
+    ec2 = StubEC2(['i-01', 'i-02'], error=code)
+    results = run_batched_operation(ec2, 'stop_instances', ['i-01', 'i-02'])
+    assert all(code in error for error in results.values())
+    assert ec2.calls == [['i-01', 'i-02']]
@@ -0,0 +1,35 @@
+import pytest
+from aws_utils import api, menu
+from aws_utils.records import Image
+from tests.helpers import record
+
+IMAGES = [Image('ami-02', 'newest', '2026-02-01', 'self', 'available', ()),
+          Image('ami-01', 'older', '2026-01-01', 'self', 'available', ())]
+
+@pytest.fixture
+def answers(monkeypatch):
+    # Feeds the prompts in order
+    replies = []
+    monkeypatch.setattr('builtins.input', lambda prompt: replies.pop(0))
+    return replies
+
+@pytest.mark.parametrize('reply, expected', [('', None), ('2', 'ami-01'), ('x', None), ('3', None)])
+def test_ami_choice(monkeypatch, answers, reply, expected):
+    monkeypatch.setattr(api, 'list_images', lambda ec2, search=None: IMAGES)
+    answers += ['', reply]
+    assert menu.list_and_select_ami(None) == expected
+
+def test_ssh_describes_the_instance_once(monkeypatch, answers, tmp_path):
+    key_path = tmp_path / "key.pem"
+    key_path.write_text("")
+    described = []
+
+    def get_instance(ec2, instance_id):
+        described.append(instance_id)
+        return record(instance_id, 'web-1', public_ip='3.0.0.1')
+
+    monkeypatch.setattr(menu, 'pick_instance', lambda ec2: 'i-01')
+    monkeypatch.setattr(api, 'get_instance', get_instance)
+    answers += [str(key_path), 'n']
+    menu.ssh_to_instance(None)
+    assert described == ['i-01']
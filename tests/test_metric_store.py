@@ -0,0 +1,74 @@
+from aws_utils.metric_store import REFETCH_PERIODS, MetricStore
+
+PERIOD = 300
+KEY = ('i-01', 'CPUUtilization', PERIOD)
+
+def _points(start, end):
+    timestamps = list(range(start, end, PERIOD))
+    return timestamps, [float(timestamp // PERIOD) for timestamp in timestamps]
+
+def _merge(store, start, end):
+    store.merge(KEY, start, end, *_points(start, end))
+
+def test_empty_store_misses_everything(tmp_path):
+    store = MetricStore(tmp_path)
+    assert store.missing_range(KEY, 0, 3000) == (0, 3000)
+
+def test_covered_range_is_not_fetched_again(tmp_path):
+    store = MetricStore(tmp_path)
+    _merge(store, 0, 3000)
+    assert store.missing_range(KEY, 0, 3000) is None
+    assert store.missing_range(KEY, 600, 1800) is None
+
+def test_newer_data_refetches_the_newest_periods(tmp_path):
+    store = MetricStore(tmp_path)
+    _merge(store, 0, 3000)
+    assert store.missing_range(KEY, 0, 3300) == (3000 - REFETCH_PERIODS * PERIOD, 3300)
+    assert store.missing_range(KEY, 0, 6000) == (3000 - REFETCH_PERIODS * PERIOD, 6000)
+
+def test_start_before_coverage_fetches_whole_range(tmp_path):
+    store = MetricStore(tmp_path)
+    _merge(store, 3000, 6000)
+    assert store.missing_range(KEY, 0, 6000) == (0, 6000)
+
+def test_disjoint_fetch_does_not_cover_the_gap(tmp_path):
+    store = MetricStore(tmp_path)
+    _merge(store, 0, 3000)
+    _merge(store, 6000, 9000)
+    # The hole between the two fetches must be fetched again
+    assert store.missing_range(KEY, 0, 9000) == (0, 9000)
+    assert len(store.read(KEY, 0, 9000)) == 20
+
+def test_adjacent_fetches_extend_coverage(tmp_path):
+    store = MetricStore(tmp_path)
+    _merge(store, 0, 3000)
+    _merge(store, 3000, 6000)
+    assert store.missing_range(KEY, 0, 4800) is None
+    assert [timestamp for timestamp, _ in store.read(KEY, 0, 6000)] == list(range(0, 6000, PERIOD))
+
+def test_merge_replaces_points_in_fetched_range(tmp_path):
+    store = MetricStore(tmp_path)
+    _merge(store, 0, 3000)
+    # The refetched range came back without its last bucket, so it is dropped
+    store.merge(KEY, 2400, 3000, [2400.0], [-1.0])
+    assert store.read(KEY, 2100, 3000) == [(2100.0, 7.0), (2400.0, -1.0)]
+
+def test_capacity_trims_oldest_points_and_coverage(tmp_path):
+    store = MetricStore(tmp_path, capacity=4)
+    _merge(store, 0, 3000)
+    assert [timestamp for timestamp, _ in store.read(KEY, 0, 3000)] == [1800.0, 2100.0, 2400.0, 2700.0]
+    assert store.missing_range(KEY, 0, 3000) == (0, 3000)
+    assert store.missing_range(KEY, 1800, 2400) is None
+
+def test_reload_from_disk(tmp_path):
+    store = MetricStore(tmp_path)
+    _merge(store, 0, 3000)
+    reloaded = MetricStore(tmp_path)
+    assert reloaded.read(KEY, 0, 3000) == store.read(KEY, 0, 3000)
+    assert reloaded.missing_range(KEY, 600, 1800) is None
+    assert reloaded.missing_range(('i-02', 'CPUUtilization', PERIOD), 0, 3000) == (0, 3000)
+
+def test_read_is_half_open(tmp_path):
+    store = MetricStore(tmp_path)
+    _merge(store, 0, 3000)
+    assert [timestamp for timestamp, _ in store.read(KEY, 600, 1200)] == [600.0, 900.0]
@@ -0,0 +1,22 @@
+from datetime import timedelta
+from aws_utils.metric_store import MetricStore
+from aws_utils.monitoring import fetch_cpu_history, METRIC_QUERIES_PER_REQUEST
+from benchmarks.fakes import FakeCloudWatch, window
+
+INSTANCE_IDS = [f"i-{idx:017x}" for idx in range(METRIC_QUERIES_PER_REQUEST + 1)]
+
+def test_warm_fetch_only_asks_for_the_uncovered_tail(tmp_path):
+    cloudwatch = FakeCloudWatch()
+    store = MetricStore(tmp_path)
+    start_time, end_time = window(hours=1)
+    cold = fetch_cpu_history(cloudwatch, INSTANCE_IDS, start_time, end_time, store=store)
+    assert cloudwatch.calls == 2  # two batches of instances
+
+    cloudwatch.calls = 0
+    assert fetch_cpu_history(cloudwatch, INSTANCE_IDS, start_time, end_time, store=store) == cold
+    assert cloudwatch.calls == 0
+
+    later = end_time + timedelta(minutes=5)
+    history = fetch_cpu_history(cloudwatch, INSTANCE_IDS, start_time + timedelta(minutes=5), later, store=store)
+    assert cloudwatch.calls == 2
+    assert all(history[instance_id][-1][0] == cold[instance_id][-1][0] + 300 for instance_id in INSTANCE_IDS)
@@ -0,0 +1,83 @@
+import pytest
+from aws_utils.ec2_management import parse_selection, selection_query
+from aws_utils.query import parse_query
+from tests.helpers import record
+
+INSTANCES = [
+    record('i-01', 'master', tags=(('Role', 'master'),)),
+    record('i-02', 'worker-1', state='stopped', zone='ap-northeast-2b', tags=(('Role', 'worker'),)),
+    record('i-03', 'worker-2', type='t3.large', tags=(('Role', 'worker'),)),
+    record('i-04', 'submit', state='stopped', zone='ap-northeast-2b')
+]
+
+def test_rows_and_ranges():
+    assert parse_selection('1-2,4', INSTANCES) == ['i-01', 'i-02', 'i-04']
+    assert parse_selection('3 - 4 , 1', INSTANCES) == ['i-03', 'i-04', 'i-01']
+
+def test_overlapping_ranges_select_once():
+    assert parse_selection('1-3,2', INSTANCES) == ['i-01', 'i-02', 'i-03']
+
+@pytest.mark.parametrize('selection', ['0', '5', '3-2', '2-9', 'x'])
+def test_invalid_rows(selection):
+    with pytest.raises(ValueError):
+        parse_selection(selection, INSTANCES)
+
+def test_query_selection():
+    assert parse_selection('all', INSTANCES) == ['i-01', 'i-02', 'i-03', 'i-04']
+    assert parse_selection('state:stopped', INSTANCES) == ['i-02', 'i-04']
+    assert parse_selection('tag:Role', INSTANCES) == ['i-01', 'i-02', 'i-03']
+    assert parse_selection('tag:Role=worker type=t3.*', INSTANCES) == ['i-02', 'i-03']
+
+def test_server_side_filters():
+    query = parse_query('state=running,stopped tag:Role=worker tag:Owner name=wk-*')
+    assert query.filters == [
+        {'Name': 'instance-state-name', 'Values': ['running', 'stopped']},
+        {'Name': 'tag:Role', 'Values': ['worker']},
+        {'Name': 'tag-key', 'Values': ['Owner']},
+        {'Name': 'tag:Name', 'Values': ['wk-*']}
+    ]
+
+def test_terms_ec2_cannot_express_stay_local():
+    query = parse_query('state!=terminated name=wk-[12] type=t3.small type=t3.large')
+    # Negation and [] classes are not EC2 filters; a repeated field would be OR-ed
+    assert query.filters == [{'Name': 'instance-type', 'Values': ['t3.small']}]
+    assert len(query.terms) == 4
+
+def test_local_terms_are_applied():
+    query = parse_query('state!=stopped name=worker-[0-9]')
+    assert [inst.instance_id for inst in query.apply(INSTANCES)] == ['i-03']
+
+@pytest.mark.parametrize('expression', ['color=red', 'state', 'state=', 'tag:'])
+def test_invalid_queries(expression):
+    with pytest.raises(ValueError):
+        parse_query(expression)
+
+def test_shorthands_expand():
+    query = parse_query('all stopped t3.large in 2a i-0abc')
+    assert query.terms == [('state', False, ['stopped']), ('type', False, ['t3.large']),
+                           ('zone', False, ['*-2a']), ('id', False, ['i-0abc'])]
+    assert parse_selection('all stopped in 2b', INSTANCES) == ['i-02', 'i-04']
+
+def test_selection_starting_with_digit_is_a_query():
+    assert parse_selection('2b', INSTANCES) == ['i-02', 'i-04']
+
+@pytest.mark.parametrize('selection', ['', '   '])
+def test_empty_selection_is_rejected(selection):
+    with pytest.raises(ValueError):
+        parse_selection(selection, INSTANCES)
+
+def test_selection_without_terms_needs_all():
+    with pytest.raises(ValueError):
+        parse_selection('in', INSTANCES)
+    assert parse_selection(' all ', INSTANCES) == ['i-01', 'i-02', 'i-03', 'i-04']
+    assert parse_selection(' 3 - 4 , 1 ', INSTANCES) == ['i-03', 'i-04', 'i-01']
+
+def test_query_without_terms_is_falsy():
+    assert not parse_query('')
+    assert not parse_query('all')
+    assert parse_query('state=running')
+
+def test_selection_query():
+    assert selection_query(' 1-2, 4 ') is None
+    assert selection_query('all').terms == []
+    assert selection_query('2b').terms == [('zone', False, ['*-2b'])]
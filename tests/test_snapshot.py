@@ -0,0 +1,86 @@
+import pytest
+from aws_utils.query import parse_query
+from aws_utils.snapshot import InventorySnapshot
+from tests.helpers import record
+
+REGION = 'ap-northeast-2'
+INSTANCES = [
+    record('i-01', 'master', public_ip='3.0.0.1', private_ip='10.0.0.1', tags=(('Role', 'master'),)),
+    record('i-02', 'worker-1', state='stopped', zone='ap-northeast-2b', tags=(('Role', 'worker'),)),
+    record('i-03', 'worker-2', type='t3.large', tags=(('Role', 'worker'), ('Owner', 'kim'))),
+    record('i-04', 'submit', state='stopped', vpc_id=None)
+]
+FIELDS = ('instance_id', 'name', 'state', 'type', 'public_ip', 'private_ip', 'zone', 'vpc_id')
+
+def _fields(instances):
+    # Tag order is not part of the record (EC2 does not keep one either)
+    return [tuple(getattr(inst, field) for field in FIELDS) + (sorted(inst.tags),) for inst in instances]
+
+def _ids(instances):
+    return [inst.instance_id for inst in instances]
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return InventorySnapshot(tmp_path / "inventory.sqlite3")
+
+def test_round_trip(snapshot):
+    snapshot.save_instances(REGION, INSTANCES, fetched_at=1000.0)
+    instances, fetched_at = snapshot.load_instances(REGION)
+    assert fetched_at == 1000.0
+    assert _fields(instances) == _fields(INSTANCES)
+    assert snapshot.fetched_at(REGION) == 1000.0
+
+def test_unsaved_region(snapshot):
+    snapshot.save_instances(REGION, INSTANCES)
+    assert snapshot.load_instances('us-east-1') == (None, None)
+    assert snapshot.query_instances('us-east-1') == []
+
+def test_save_replaces_the_region(snapshot):
+    snapshot.save_instances(REGION, INSTANCES)
+    snapshot.save_instances(REGION, INSTANCES[2:])
+    snapshot.save_instances('us-east-1', INSTANCES[:1])
+    instances, _ = snapshot.load_instances(REGION)
+    assert _fields(instances) == _fields(INSTANCES[2:])
+
+def test_empty_scan_is_saved(snapshot):
+    snapshot.save_instances(REGION, [])
+    instances, fetched_at = snapshot.load_instances(REGION)
+    assert instances == [] and fetched_at is not None
+
+@pytest.mark.parametrize('expression', [
+    'state=stopped', 'tag:Role=worker', 'tag:Owner', 'name=worker-*', 'type=t3.large state=running',
+    'state!=stopped', 'name=worker-[2]', 'tag:Role=m* zone=*-2a', 'id=i-01,i-04', 'all'
+])
+def test_query_matches_a_live_scan(snapshot, expression):
+    snapshot.save_instances(REGION, INSTANCES)
+    query = parse_query(expression)
+    assert _ids(snapshot.query_instances(REGION, query)) == _ids(query.apply(INSTANCES))
+
+def test_query_keeps_tags_of_matched_rows(snapshot):
+    snapshot.save_instances(REGION, INSTANCES)
+    [inst] = snapshot.query_instances(REGION, parse_query('tag:Owner=kim'))
+    assert sorted(inst.tags) == sorted(INSTANCES[2].tags)
+
+def test_rows_are_scoped_by_account(tmp_path):
+    path = tmp_path / "inventory.sqlite3"
+    accounts = {'AKIA1': '111111111111', 'AKIA2': '222222222222'}
+    first = InventorySnapshot(path, 'AKIA1', lambda: accounts['AKIA1'])
+    second = InventorySnapshot(path, 'AKIA2', lambda: accounts['AKIA2'])
+    first.save_instances(REGION, INSTANCES[:2])
+    second.save_instances(REGION, INSTANCES[2:])
+    assert _ids(first.load_instances(REGION)[0]) == ['i-01', 'i-02']
+    assert _ids(second.load_instances(REGION)[0]) == ['i-03', 'i-04']
+
+def test_reads_for_a_new_key_stay_offline(tmp_path):
+    path = tmp_path / "inventory.sqlite3"
+    InventorySnapshot(path, 'AKIA1', lambda: '111111111111').save_instances(REGION, INSTANCES)
+
+    def resolve():
+        raise AssertionError("account resolved on a read")
+
+    unknown = InventorySnapshot(path, 'AKIA2', resolve)
+    assert unknown.load_instances(REGION) == (None, None)
+    assert unknown.query_instances(REGION, parse_query('state=running')) == []
+    # A key seen before needs no lookup either
+    known = InventorySnapshot(path, 'AKIA1', resolve)
+    assert _ids(known.load_instances(REGION)[0]) == _ids(INSTANCES)